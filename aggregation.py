@@ -0,0 +1,149 @@
+# aggregation.py
+"""Gedeelde, gevectoriseerde aggregaties voor de stem- en groepspagina's (11–13)."""
+import numpy as np
+import pandas as pd
+
+POSNEG_VALUES = (-1, 0, 1)
+
+
+# =======================
+# Normalisatie
+# =======================
+def norm_text(s):
+    """Lowercase, strip en spaties condenseren; niet-strings worden ''.
+
+    Werkt op een Series (gevectoriseerd via .str) of op één losse waarde.
+    """
+    if not isinstance(s, (pd.Series, pd.Index, list, tuple, np.ndarray)):
+        return norm_text(pd.Series([s], dtype=object)).iloc[0]
+    s = pd.Series(s)
+    try:
+        # .str geeft NaN voor niet-strings; die worden hieronder ''.
+        out = s.str.strip().str.lower().str.replace(r"\s+", " ", regex=True)
+    except AttributeError:
+        # Geen enkele string in de kolom (bijv. alleen getallen of None)
+        return pd.Series("", index=s.index, dtype=object)
+    return out.fillna("").astype(object)
+
+
+# Namen worden op dezelfde manier genormaliseerd als teksten.
+normalize_name = norm_text
+
+
+# =======================
+# Polariteit
+# =======================
+def _posneg_numeric(values) -> pd.Series:
+    """Zelfde parsing als int(float(v)): numeriek maken en afkappen richting nul."""
+    v = pd.to_numeric(pd.Series(values), errors="coerce")
+    return pd.Series(np.trunc(v.to_numpy(dtype="float64")), index=v.index)
+
+
+def _posneg_counts(values, by, allowed) -> pd.DataFrame:
+    """Aantal geldige posneg-waarden per groep; kolommen = toegestane waarden."""
+    v = _posneg_numeric(values)
+    keys = pd.Series(by, index=v.index) if by is not None else pd.Series(0, index=v.index)
+    valid = v.isin(allowed)
+    counts = (
+        pd.DataFrame({"key": keys[valid], "val": v[valid].astype(int)})
+        .groupby(["key", "val"], dropna=False)
+        .size()
+        .unstack(fill_value=0)
+        .reindex(columns=list(allowed), fill_value=0)
+    )
+    all_keys = pd.Index(keys.unique())
+    return counts.reindex(all_keys, fill_value=0)
+
+
+def majority_posneg(values, by=None):
+    """
+    Meerderheid van {-1, 0, 1} per groep; bij gelijkstand of geen waarden -> 0.
+
+    Zonder `by` wordt één int teruggegeven, anders een Series per groep.
+    """
+    if by is None and len(pd.Series(values)) == 0:
+        return 0
+    counts = _posneg_counts(values, by, POSNEG_VALUES)
+    top = counts.max(axis=1)
+    tie = counts.eq(top, axis=0).sum(axis=1) > 1
+    winner = counts.to_numpy().argmax(axis=1) - 1  # kolomvolgorde is -1, 0, 1
+    result = pd.Series(np.where(tie | (top == 0), 0, winner), index=counts.index, dtype=int)
+    return int(result.iloc[0]) if by is None else result
+
+
+def majority_sign(values, by=None):
+    """
+    Meerderheid van {-1, 1} via de tekensom; bij gelijkstand of geen waarden -> NA.
+
+    Zonder `by` wordt één waarde (int of None) teruggegeven, anders een Int64-Series.
+    """
+    if by is None and len(pd.Series(values)) == 0:
+        return None
+    counts = _posneg_counts(values, by, (-1, 1))
+    total = counts[1] - counts[-1]
+    result = pd.Series(np.sign(total), index=counts.index).astype("Int64").mask(total == 0)
+    if by is None:
+        val = result.iloc[0]
+        return None if pd.isna(val) else int(val)
+    return result
+
+
+def as_posneg(values) -> pd.Series:
+    """Vectorvariant van as_posneg_int: alleen -1 of 1, al het andere -> NA."""
+    v = _posneg_numeric(values)
+    return v.where(v.isin([-1, 1])).astype("Int64")
+
+
+def text_polarity(texts, values, majority=majority_posneg) -> dict:
+    """Genormaliseerde tekst -> meerderheidspolariteit; lege teksten vallen weg."""
+    text_norm = norm_text(pd.Series(texts))
+    per_text = majority(pd.Series(values, index=text_norm.index), by=text_norm)
+    per_text = per_text[per_text.index != ""].dropna()
+    return {k: int(v) for k, v in per_text.items()}
+
+
+# =======================
+# Stemmen
+# =======================
+def vote_sums(df_votes: pd.DataFrame, key: str = "group_id") -> pd.Series:
+    """Som van de stemmen per effectgroep (niet-numeriek telt als 0)."""
+    if df_votes.empty or key not in df_votes.columns:
+        return pd.Series(dtype=int)
+    votes = pd.to_numeric(df_votes.get("votes", 0), errors="coerce").fillna(0).astype(int)
+    return votes.groupby(df_votes[key], dropna=False).sum()
+
+
+def aggregate_votes(df_votes: pd.DataFrame, posneg_from_sub: dict | None = None) -> pd.DataFrame:
+    """
+    Aggregeer stemmen per effectgroep met opgeloste polariteit.
+
+    Polariteit komt eerst uit `posneg_from_sub` (genormaliseerde tekst -> -1/1),
+    anders uit de meerderheid van de posneg-waarden op de stemmen zelf.
+    """
+    df = df_votes.copy()
+    df["votes"] = pd.to_numeric(df.get("votes", 0), errors="coerce").fillna(0).astype(int)
+    if "domein" not in df.columns:
+        df["domein"] = ""
+    if "posneg" not in df.columns:
+        df["posneg"] = pd.NA
+
+    grouped = df.groupby("group_id", dropna=False)
+    agg = grouped.agg(votes=("votes", "sum"), text=("text", "first"), domein=("domein", "first"))
+    agg["posneg_votes"] = majority_sign(df["posneg"], by=df["group_id"]).reindex(agg.index)
+    agg = agg.reset_index()
+
+    agg["text_norm"] = norm_text(agg["text"])
+    agg["posneg_from_sub"] = agg["text_norm"].map(posneg_from_sub or {})
+    agg["posneg_resolved"] = as_posneg(agg["posneg_from_sub"]).combine_first(as_posneg(agg["posneg_votes"]))
+    return agg
+
+
+def top_by_polarity(agg: pd.DataFrame, n: int, col: str = "posneg_resolved"):
+    """Top-n effectgroepen met de meeste stemmen per polariteit: (positief, negatief, onbekend)."""
+    def _top(mask, limit=None):
+        out = agg[mask].sort_values("votes", ascending=False)
+        if limit is not None:
+            out = out.head(limit)
+        return out.reset_index(drop=True)
+
+    return _top(agg[col] == 1, n), _top(agg[col] == -1, n), _top(agg[col].isna())
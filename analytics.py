@@ -0,0 +1,247 @@
+# analytics.py
+"""
+Vergelijkingen over sessies heen, per provincie en periode.
+
+Werkt op de export van columnar_export.py, met ook de gearchiveerde sessies.
+Per sessie wordt één keer een samenvatting per domein berekend (som en aantal
+van score * posneg, positief, negatief, deelnemers) plus de best gestemde
+effecten; vragen als "gemiddelde
+gewogen score per domein voor alle DR-sessies van dit jaar" lezen daarna alleen
+die samenvattingen en niet de ruwe inzendingen.
+
+Voorbeelden:
+    python analytics.py build --export export
+    python analytics.py query --export export --prov DR --year 2026
+    python analytics.py query --export export --from 2025-09-01 --to 2026-01-01 --top 5
+"""
+import argparse
+import sys
+from pathlib import Path
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+import columnar_export
+import database
+
+SUMMARY_DIR = "_analytics"
+TOP_PER_SESSION = 20  # aantal effecten per sessie dat in de samenvatting bewaard wordt
+
+DOMAIN_COLUMNS = ["session", "prov", "created_at", "domain", "score_sum", "score_count",
+                  "positive", "negative", "participants", "source_mtime"]
+TOP_COLUMNS = ["session", "prov", "created_at", "domein", "text", "posneg", "votes"]
+
+
+def _summary_path(out_dir, name: str) -> Path:
+    return Path(out_dir) / SUMMARY_DIR / f"{name}.parquet"
+
+
+def exported_sessions(out_dir, table: str = "submissions") -> dict:
+    """Sessies in de export met de wijzigingstijd van hun partitie: {sessie: mtime}."""
+    root = Path(out_dir) / table
+    if not root.exists():
+        return {}
+    return {
+        unquote(p.name.split("=", 1)[1]): max(f.stat().st_mtime for f in p.iterdir())
+        for p in root.iterdir()
+        if p.is_dir() and p.name.startswith("session=") and any(p.iterdir())
+    }
+
+
+def summarize_domains(df_sub: pd.DataFrame) -> pd.DataFrame:
+    """Som/aantal van de gewogen score, positief/negatief en deelnemers per (sessie, domein)."""
+    df = df_sub.assign(
+        session=df_sub["session"].astype(str),
+        domain=df_sub["domain"].astype(str),
+        signed=pd.to_numeric(df_sub["score"], errors="coerce") * pd.to_numeric(df_sub["posneg"], errors="coerce"),
+        positive=pd.to_numeric(df_sub["posneg"], errors="coerce") > 0,
+        negative=pd.to_numeric(df_sub["posneg"], errors="coerce") < 0,
+    )
+    return df.groupby(["session", "domain"], observed=True).agg(
+        score_sum=("signed", "sum"),
+        score_count=("signed", "count"),
+        positive=("positive", "sum"),
+        negative=("negative", "sum"),
+        participants=("name", "nunique"),
+    ).reset_index()
+
+
+def summarize_top_effects(df_votes: pd.DataFrame, df_effects: pd.DataFrame | None = None,
+                          n: int = TOP_PER_SESSION) -> pd.DataFrame:
+    """
+    De `n` effectgroepen met de meeste stemmen per sessie.
+
+    Tekst, domein en polariteit komen uit `effect_groups` (gekoppeld op group_id);
+    stemmen van vóór die tabel hebben ze zelf, die kopieën zijn de terugval.
+    """
+    df = df_votes.assign(
+        session=df_votes["session"].astype(str),
+        group_id=df_votes["group_id"].astype(str),
+        votes=pd.to_numeric(df_votes["votes"], errors="coerce").fillna(0),
+    )
+    for col in ("text", "domein", "posneg"):
+        if col not in df.columns:
+            df[col] = None
+    per_group = (
+        df.groupby(["session", "group_id"], observed=True)
+        .agg(votes=("votes", "sum"), text=("text", "first"), domein=("domein", "first"), posneg=("posneg", "first"))
+    )
+    if df_effects is not None and not df_effects.empty:
+        canon = (
+            df_effects.assign(session=df_effects["session"].astype(str), group_id=df_effects["id"].astype(str))
+            .rename(columns={"domain": "domein"})
+            .drop_duplicates(["session", "group_id"])
+            .set_index(["session", "group_id"])
+            .reindex(per_group.index)
+        )
+        for col in ("text", "domein", "posneg"):
+            ours = canon[col].astype(object)
+            per_group[col] = ours.where(ours.notna(), per_group[col].astype(object))
+    per_group = per_group.reset_index()
+    per_group = per_group[per_group["votes"] > 0].sort_values(["session", "votes"], ascending=[True, False])
+    return per_group.groupby("session", observed=True).head(n)[["session", "domein", "text", "posneg", "votes"]]
+
+
+def _read_existing(out_dir, name: str, columns: list) -> pd.DataFrame:
+    path = _summary_path(out_dir, name)
+    return pd.read_parquet(path) if path.exists() else pd.DataFrame(columns=columns)
+
+
+def _write(df: pd.DataFrame, out_dir, name: str) -> None:
+    path = _summary_path(out_dir, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Gesorteerd op (provincie, datum): de row-group-statistieken werken dan als index
+    df.sort_values(["prov", "created_at", "session"]).to_parquet(path, index=False, compression="zstd")
+
+
+def build(out_dir, *, fmt: str = "parquet", refresh: bool = False) -> list:
+    """
+    Werk de samenvattingen bij voor nieuwe of opnieuw geëxporteerde sessies.
+
+    Geeft de lijst van (her)berekende sessies terug; ongewijzigde sessies worden niet opnieuw gelezen.
+    """
+    existing_domains = _read_existing(out_dir, "domain_summary", DOMAIN_COLUMNS)
+    existing_top = _read_existing(out_dir, "top_effects", TOP_COLUMNS)
+    known = {} if refresh else existing_domains.groupby("session")["source_mtime"].max().to_dict()
+
+    sessions = exported_sessions(out_dir)
+    todo = [s for s, mtime in sessions.items() if known.get(s) != mtime]
+    if not todo:
+        return []
+
+    meta = pd.DataFrame(
+        database.fetch_session_meta(todo, select="access_code,prov,created_at"),
+        columns=["access_code", "prov", "created_at"],
+    ).set_index("access_code")
+
+    def with_meta(df: pd.DataFrame) -> pd.DataFrame:
+        codes = df["session"]
+        return df.assign(
+            prov=codes.map(meta["prov"]).fillna("?").astype(str),
+            created_at=pd.to_datetime(codes.map(meta["created_at"]), errors="coerce", utc=True),
+        )
+
+    df_sub = columnar_export.load_table(out_dir, "submissions", todo, fmt=fmt).to_pandas()
+    domains = with_meta(summarize_domains(df_sub)).assign(source_mtime=lambda d: d["session"].map(sessions))
+
+    top = pd.DataFrame(columns=TOP_COLUMNS)
+    if (Path(out_dir) / "effect_votes").exists():
+        df_votes = columnar_export.load_table(out_dir, "effect_votes", todo, fmt=fmt).to_pandas()
+        df_effects = None
+        if (Path(out_dir) / "effect_groups").exists():
+            df_effects = columnar_export.load_table(out_dir, "effect_groups", todo, fmt=fmt).to_pandas()
+        if not df_votes.empty:
+            top = with_meta(summarize_top_effects(df_votes, df_effects))
+
+    keep_domains = existing_domains[~existing_domains["session"].isin(todo)]
+    keep_top = existing_top[~existing_top["session"].isin(todo)]
+    _write(pd.concat([keep_domains, domains[DOMAIN_COLUMNS]], ignore_index=True), out_dir, "domain_summary")
+    _write(pd.concat([keep_top, top[TOP_COLUMNS]], ignore_index=True), out_dir, "top_effects")
+    return todo
+
+
+def _select(df: pd.DataFrame, prov: str | None, date_from: str | None, date_to: str | None) -> pd.DataFrame:
+    """Filter via de index (prov, created_at) in plaats van een scan over alle kolommen."""
+    if df.empty:
+        return df
+    indexed = df.set_index(["prov", "created_at"]).sort_index()
+    if prov:
+        if prov not in indexed.index.get_level_values(0):
+            return indexed.iloc[0:0]
+        indexed = indexed.xs(prov, level="prov", drop_level=False)
+    dates = indexed.index.get_level_values("created_at")
+    keep = np.ones(len(indexed), dtype=bool)
+    if date_from:
+        keep &= dates >= pd.Timestamp(date_from, tz="UTC")
+    if date_to:
+        keep &= dates < pd.Timestamp(date_to, tz="UTC")
+    return indexed[keep]
+
+
+def domain_scores(out_dir, *, prov: str | None = None, date_from: str | None = None,
+                  date_to: str | None = None) -> pd.DataFrame:
+    """Gemiddelde gewogen score per domein over alle geselecteerde sessies (gewogen naar inzendingen)."""
+    selected = _select(_read_existing(out_dir, "domain_summary", DOMAIN_COLUMNS), prov, date_from, date_to)
+    if selected.empty:
+        return pd.DataFrame(columns=["gemiddelde", "inzendingen", "positief", "negatief", "sessies"])
+    per_domain = selected.groupby("domain").agg(
+        score_sum=("score_sum", "sum"), score_count=("score_count", "sum"),
+        positief=("positive", "sum"), negatief=("negative", "sum"), sessies=("session", "nunique"),
+    )
+    per_domain["gemiddelde"] = per_domain["score_sum"] / per_domain["score_count"].where(per_domain["score_count"] > 0)
+    per_domain = per_domain.rename(columns={"score_count": "inzendingen"})
+    return per_domain[["gemiddelde", "inzendingen", "positief", "negatief", "sessies"]].sort_index()
+
+
+def top_effects(out_dir, *, prov: str | None = None, date_from: str | None = None,
+                date_to: str | None = None, n: int = 10, domain: str | None = None) -> pd.DataFrame:
+    """De best gestemde effecten over alle geselecteerde sessies."""
+    selected = _select(_read_existing(out_dir, "top_effects", TOP_COLUMNS), prov, date_from, date_to)
+    if domain and not selected.empty:
+        selected = selected[selected["domein"] == domain]
+    return selected.reset_index().sort_values("votes", ascending=False).head(n)[
+        ["session", "prov", "domein", "text", "posneg", "votes"]
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Analyses over sessies heen op basis van de columnar export.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="samenvattingen per sessie bijwerken")
+    p_build.add_argument("--export", default="export", help="map van columnar_export.py")
+    p_build.add_argument("--format", choices=list(columnar_export.FORMATS), default="parquet")
+    p_build.add_argument("--refresh", action="store_true", help="alle sessies opnieuw samenvatten")
+
+    p_query = sub.add_parser("query", help="scores per domein en topeffecten opvragen")
+    p_query.add_argument("--export", default="export", help="map van columnar_export.py")
+    p_query.add_argument("--prov", help="provincie, bijv. DR of GR")
+    p_query.add_argument("--year", type=int, help="kalenderjaar (in plaats van --from/--to)")
+    p_query.add_argument("--from", dest="date_from", help="sessies aangemaakt vanaf (YYYY-MM-DD)")
+    p_query.add_argument("--to", dest="date_to", help="sessies aangemaakt vóór (YYYY-MM-DD)")
+    p_query.add_argument("--top", type=int, default=10, help="aantal topeffecten")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        done = build(args.export, fmt=args.format, refresh=args.refresh)
+        print(f"{len(done)} sessie(s) samengevat." if done else "Samenvattingen zijn al actueel.")
+        return 0
+
+    date_from, date_to = args.date_from, args.date_to
+    if args.year:
+        date_from, date_to = f"{args.year}-01-01", f"{args.year + 1}-01-01"
+    scores = domain_scores(args.export, prov=args.prov, date_from=date_from, date_to=date_to)
+    if scores.empty:
+        print("Geen sessies in deze selectie. Draai eerst `python analytics.py build`.")
+        return 1
+    print(scores.round(2).to_string())
+    top = top_effects(args.export, prov=args.prov, date_from=date_from, date_to=date_to, n=args.top)
+    if not top.empty:
+        print()
+        print(top.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
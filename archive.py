@@ -0,0 +1,317 @@
+# archive.py
+"""
+Afgeronde sessies uit de "hete" tabellen halen.
+
+`submissions`, `effect_votes`, `groups`, `group_results` en `effect_groups`
+groeien anders eindeloos, en ook gefilterde queries worden trager naarmate de
+tabellen groeien. Dit script verplaatst sessies die ouder zijn dan een
+instelbare leeftijd naar de archieftabellen (migrations/0004_archief.sql) en
+verwijdert ze daarna uit de hete tabellen, zodat die alleen de lopende
+workshops bevatten.
+
+    python archive.py --dry-run                 # wat zou er gebeuren (standaard 90 dagen)
+    python archive.py --older-than 180
+    python archive.py ABC123 DEF456              # alleen deze sessies
+
+Per sessie:
+1. alle rijen (select=*) ophalen en als verliesvrije JSON in `archived_rows`
+   zetten (upsert op tabel en id), en de sessie in `archived_sessions` als
+   "geschreven" markeren;
+2. per tabel alleen de opgehaalde rijen verwijderen (id=lte.<hoogste id>, of de
+   id's zelf voor effect_groups) en de verwijderde rijen zoals de server ze
+   teruggeeft nog een keer archiveren: een wijziging na stap 1 gaat zo niet
+   verloren, en een rij die na stap 1 is toegevoegd blijft staan;
+3. staan er daarna nog rijen van de sessie (toegevoegd tijdens de run), dan
+   blijft de status "geschreven" en pakt de volgende run ze op; anders wordt de
+   sessie "gearchiveerd".
+Het archief staat in de database en is dus voor alle replica's hetzelfde. Een
+replica die een gearchiveerde sessie toont, maakt er met ensure_snapshot één
+keer een lokale snapshot van (snapshots.py), zodat pages/9 en pages/14 en oude
+rapporten blijven werken. De hulpmiddelen over veel sessies heen (batch_report,
+columnar_export en daarmee analytics en search_index) lezen via fetch_pages, dat
+gearchiveerde sessies uit archived_rows haalt. Elke stap is veilig te herhalen; een afgebroken run
+gaat verder waar hij was. session_meta blijft staan, zodat de toegangscode werkt.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+import columnar_export
+import database
+import session_cache
+import snapshots
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("WERKSESSIE_ARCHIVE_DAYS", 90))
+# Tabellen met rijen per sessie; allemaal ook in de Arrow-snapshot
+HOT_TABLES = {t: columnar_export.TABLES[t]["order"] for t in snapshots.SNAPSHOT_TABLES}
+# Tabellen met een tekst-id (geen oplopende teller): verwijderen op de id's zelf
+TEXT_ID_TABLES = {"effect_groups"}
+ROWS_TABLE, SESSIONS_TABLE = "archived_rows", "archived_sessions"
+LOOKUP_TTL = 300  # seconden; zo vaak kijkt een pagina of een sessie inmiddels gearchiveerd is
+
+PENDING, ARCHIVED = "geschreven", "gearchiveerd"
+
+
+def _status_rows(codes=None) -> list:
+    params = {"select": "session,status,rows,archived_at"}
+    if codes:
+        params["session"] = database.in_filter(codes)
+    return database.fetch_all(SESSIONS_TABLE, {**params, "order": "session.asc"})
+
+
+def lookup(session: str) -> dict | None:
+    """Archiefgegevens van een sessie ({status, archived_at, rows}), of None als ze niet gearchiveerd is."""
+    info = next(iter(_status_rows([session])), None)
+    return info if info and info.get("status") == ARCHIVED else None
+
+
+def candidates(older_than_days: int, codes=None) -> list:
+    """Sessies (session_meta-rijen) die oud genoeg zijn en nog niet gearchiveerd."""
+    if codes:
+        meta = database.fetch_session_meta(codes)
+    else:
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).date().isoformat()
+        meta = database.fetch_session_meta(date_to=cutoff)
+    done = {r["session"] for r in _status_rows([m["access_code"] for m in meta]) if r["status"] == ARCHIVED}
+    return [m for m in meta if m["access_code"] not in done]
+
+
+def hot_counts(session: str) -> dict:
+    """Aantal rijen per hete tabel voor een sessie (server-side geteld); None bij een fout."""
+    loaders = {
+        table: (lambda table=table: database.count_rows(table, {"session": f"eq.{session}"}))
+        for table in HOT_TABLES
+    }
+    counts, errors = database.fetch_concurrently(loaders, deadline=60)
+    return {table: None if table in errors else counts[table] for table in HOT_TABLES}
+
+
+def _fetch_rows(session: str) -> dict:
+    loaders = {
+        table: (lambda table=table, order=order: database.fetch_all(
+            table, {"select": "*", "session": f"eq.{session}", "order": order}))
+        for table, order in HOT_TABLES.items()
+    }
+    fetched, errors = database.fetch_concurrently(loaders, deadline=300)
+    if errors:
+        raise RuntimeError("; ".join(f"{name}: {e}" for name, e in errors.items()))
+    return fetched
+
+
+def _post(table: str, rows: list, on_conflict: str) -> None:
+    """Upsert in blokken van PAGE_SIZE rijen; RuntimeError als een blok mislukt."""
+    for start in range(0, len(rows), database.PAGE_SIZE):
+        try:
+            r = database.request(
+                "POST", database.table_url(table),
+                headers=database.headers("resolution=merge-duplicates,return=minimal", json_body=True),
+                params={"on_conflict": on_conflict}, json=rows[start:start + database.PAGE_SIZE],
+            )
+        except requests.RequestException as e:
+            raise RuntimeError(f"{table}: geen verbinding ({type(e).__name__})") from e
+        if r.status_code not in (200, 201, 204):
+            raise RuntimeError(f"{table}: opslaan mislukt ({r.status_code} {r.text})")
+
+
+def store_rows(session: str, table: str, rows: list) -> None:
+    """Zet rijen van een hete tabel verliesvrij in archived_rows (veilig om te herhalen)."""
+    _post(ROWS_TABLE, [
+        {"source": table, "id": str(row["id"]), "session": session, "data": row} for row in rows
+    ], "source,id")
+
+
+def _set_status(session: str, status: str, rows: dict) -> None:
+    archived_at = datetime.now(timezone.utc).isoformat(timespec="seconds") if status == ARCHIVED else None
+    _post(SESSIONS_TABLE, [{"session": session, "status": status, "rows": rows, "archived_at": archived_at}],
+          "session")
+
+
+def archived_counts(session: str) -> dict:
+    """Aantal gearchiveerde rijen per tabel (server-side geteld)."""
+    return {table: database.count_rows(ROWS_TABLE, {"session": f"eq.{session}", "source": f"eq.{table}"})
+            for table in HOT_TABLES}
+
+
+def _bound(table: str, rows: list) -> str:
+    """Filter op precies de opgehaalde rijen: hoogste id, of de id's zelf bij een tekst-id."""
+    if table in TEXT_ID_TABLES:
+        return database.in_filter(row["id"] for row in rows)
+    return f"lte.{max(int(row['id']) for row in rows)}"
+
+
+def delete_hot_rows(session: str, fetched: dict) -> None:
+    """Verwijder de opgehaalde rijen uit de hete tabellen en archiveer wat de server verwijderde."""
+    for table, rows in fetched.items():
+        if not rows:
+            continue
+        try:
+            r = database.request(
+                "DELETE", database.table_url(table),
+                headers=database.headers("return=representation"),
+                params={"session": f"eq.{session}", "id": _bound(table, rows)},
+            )
+        except requests.RequestException as e:
+            raise RuntimeError(f"{table}: geen verbinding ({type(e).__name__})") from e
+        if r.status_code not in (200, 204):
+            raise RuntimeError(f"{table}: verwijderen mislukt ({r.status_code} {r.text})")
+        # Zoals ze op het moment van verwijderen waren: ook wijzigingen na het ophalen
+        store_rows(session, table, r.json() if r.status_code == 200 else [])
+
+
+def archive_session(session: str) -> dict:
+    """Archiveer één sessie (hervat een afgebroken run); geeft de archiefgegevens."""
+    previous = next(iter(_status_rows([session])), None)
+    if previous and previous["status"] == ARCHIVED:
+        return previous
+
+    fetched = _fetch_rows(session)
+    for table, rows in fetched.items():
+        store_rows(session, table, rows)
+    _set_status(session, PENDING, {})
+    delete_hot_rows(session, fetched)
+    snapshots.forget(session)
+
+    server = hot_counts(session)
+    failed = [t for t, n in server.items() if n is None]
+    if failed:
+        raise RuntimeError(f"kon rijen niet tellen in {', '.join(failed)}")
+    remaining = {t: n for t, n in server.items() if n}
+    if remaining:
+        raise RuntimeError("tijdens het archiveren toegevoegd en blijven staan: "
+                           + ", ".join(f"{t} {n}" for t, n in remaining.items()) + "; draai opnieuw")
+    rows = {t: n or 0 for t, n in archived_counts(session).items()}
+    _set_status(session, ARCHIVED, rows)
+    return {"status": ARCHIVED, "rows": rows}
+
+
+def write_snapshot(session: str, root=None):
+    """Lokale snapshot van een gearchiveerde sessie, uit archived_rows."""
+    rows = database.fetch_all(ROWS_TABLE, {"select": "source,data", "session": f"eq.{session}",
+                                           "order": "source.asc,id.asc"})
+    tables = {table: [] for table in HOT_TABLES}
+    for row in rows:
+        tables.setdefault(row["source"], []).append(row["data"])
+    for table in tables:
+        if table not in TEXT_ID_TABLES:
+            tables[table].sort(key=lambda r: int(r["id"]))
+    meta = (database.fetch_session_meta([session]) or [{}])[0]
+    return snapshots.write_snapshot(session, tables, meta, root=root)
+
+
+def ensure_snapshot(session: str, root=None) -> bool:
+    """
+    Is de sessie gearchiveerd? Zo ja, zorg dan voor een lokale snapshot.
+
+    Voor pages/9 en pages/14: de status wordt per LOOKUP_TTL seconden één keer
+    opgevraagd, de snapshot wordt per replica één keer gemaakt.
+    """
+    def archived():
+        try:
+            return lookup(session) is not None
+        except RuntimeError:
+            return False  # archief niet bereikbaar: zoals een lopende sessie behandelen
+
+    if not session_cache.get_or_load(session, ("archief",), archived, ttl=LOOKUP_TTL):
+        return False
+    if not snapshots.is_closed(session, root):
+        write_snapshot(session, root)
+    return True
+
+
+# =======================
+# Lezen over hete tabellen en archief heen
+# =======================
+def _archived_table_rows(session: str, table: str) -> list:
+    """Rijen van één tabel uit archived_rows; is het archief niet bereikbaar, dan uit de lokale snapshot."""
+    try:
+        rows = [r["data"] for r in database.fetch_all(ROWS_TABLE, {
+            "select": "data", "session": f"eq.{session}", "source": f"eq.{table}", "order": "id.asc",
+        })]
+    except RuntimeError:
+        if not snapshots.is_closed(session):
+            raise
+        rows = [{"session": session, **row} for row in snapshots.read_table(session, table).to_pylist()]
+    return rows
+
+
+def fetch_pages(table: str, codes: list, params: dict | None = None, *, page_size: int = database.PAGE_SIZE):
+    """
+    database.fetch_pages met session=in.(codes), maar ook voor gearchiveerde sessies.
+
+    Lopende sessies komen gepagineerd uit de hete tabel, in de volgorde van
+    `params["order"]`. Een sessie in archived_sessions komt daarna, per sessie
+    aaneengesloten en op id, uit archived_rows; is ze nog maar "geschreven",
+    dan wint de rij die nog in de hete tabel staat. `select` wordt ook op de
+    gearchiveerde rijen toegepast. Gooit RuntimeError als iets niet te lezen is.
+    """
+    codes = [str(c) for c in codes]
+    if not codes:
+        return
+    params = dict(params or {})
+    statuses = {r["session"]: r["status"] for r in _status_rows(codes)}
+    hot = [c for c in codes if c not in statuses]
+    if hot:
+        yield from database.fetch_pages(table, {**params, "session": database.in_filter(hot)}, page_size=page_size)
+
+    fields = [f for f in params.get("select", "*").split(",") if f != "*"]
+    for session in sorted(statuses):
+        rows = {str(row["id"]): row for row in _archived_table_rows(session, table)}
+        if statuses[session] != ARCHIVED:
+            rows.update((str(row["id"]), row) for row in database.fetch_all(
+                table, {"select": "*", "session": f"eq.{session}", "order": HOT_TABLES[table]}))
+        ordered = sorted(rows.values(), key=lambda r: str(r["id"]) if table in TEXT_ID_TABLES else int(r["id"]))
+        if fields:
+            ordered = [{f: row.get(f) for f in fields} for row in ordered]
+        for start in range(0, len(ordered), page_size):
+            yield ordered[start:start + page_size]
+
+
+def fetch_all(table: str, codes: list, params: dict | None = None) -> list:
+    """Alle rijen van de gegeven sessies, lopend of gearchiveerd (zie fetch_pages)."""
+    return [row for page in fetch_pages(table, codes, params) for row in page]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Archiveer oude sessies naar de archieftabellen.")
+    parser.add_argument("codes", nargs="*", help="alleen deze toegangscodes (standaard: alle oude sessies)")
+    parser.add_argument("--older-than", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help=f"leeftijd in dagen (standaard {ARCHIVE_AFTER_DAYS})")
+    parser.add_argument("--dry-run", action="store_true", help="alleen tonen wat er gearchiveerd zou worden")
+    args = parser.parse_args(argv)
+
+    sessions = candidates(args.older_than, args.codes)
+    if not sessions:
+        print("Geen sessies om te archiveren.")
+        return 0
+
+    failed = 0
+    totals = dict.fromkeys(HOT_TABLES, 0)
+    for meta in sessions:
+        code = meta["access_code"]
+        label = f"{code} ({str(meta.get('created_at', ''))[:10]})"
+        if args.dry_run:
+            counts = hot_counts(code)
+            for table, n in counts.items():
+                totals[table] += n or 0
+            print(f"  · {label}: " + ", ".join(f"{t} {'?' if n is None else n}" for t, n in counts.items()))
+            continue
+        try:
+            info = archive_session(code)
+        except Exception as e:
+            print(f"  ✗ {label}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        for table, n in info["rows"].items():
+            totals[table] += n
+        print(f"  ✓ {label}: {sum(info['rows'].values())} rijen → {ROWS_TABLE}")
+
+    verb = "zou verplaatsen" if args.dry_run else "verplaatst"
+    print(f"{len(sessions) - failed} sessies, {verb}: " + ", ".join(f"{t} {n}" for t, n in totals.items()))
+    return 0 if not failed else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+# batch_report.py
+"""
+Groepsrapporten voor veel sessies tegelijk, zonder pages/14 per sessie te openen.
+
+Voorbeelden:
+    python batch_report.py ABC123 DEF456 --out rapporten
+    python batch_report.py --from 2025-09-01 --to 2025-10-01 --formats docx,pdf
+
+Haalt de data van alle sessies in bulk op (session=in.(...), gepagineerd) en
+rendert de rapporten in een procespool met dezelfde report_builder als de pagina.
+Credentials via .streamlit/secrets.toml of SUPABASE_URL / SUPABASE_KEY.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+import archive
+import database
+import frames
+import report_builder
+import score_aggregates
+
+
+def select_sessions(codes: list, date_from: str | None, date_to: str | None) -> pd.DataFrame:
+    """Sessiemetadata voor de opgegeven codes, of voor alle sessies in de datumrange."""
+    return pd.DataFrame(database.fetch_session_meta(codes, date_from, date_to))
+
+
+def fetch_session_data(codes: list) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Inzendingen en groepsresultaten van alle sessies in twee gepagineerde bulk-reads (ook gearchiveerde)."""
+    df_sub = frames.to_frame(archive.fetch_all(
+        "submissions", codes, {"select": "*", "order": "id.asc"}
+    ), "submissions")
+    df_group = frames.to_frame(archive.fetch_all(
+        "group_results", codes, {"select": "*", "order": "id.asc"}
+    ), "group_results")
+    return df_sub, df_group
+
+
+def render_session(code: str, meta: dict, df_sub: pd.DataFrame, df_group: pd.DataFrame,
+                   formats: list, out_dir: str) -> dict:
+    """Bouw en render het rapport van één sessie (draait in een worker-proces)."""
+    start = time.perf_counter()
+    # Zelfde domeinscores als pages/14: uit de ontdubbelde inzendingen (score_aggregates)
+    state = score_aggregates.compute_state(score_aggregates.dedupe(df_sub))
+    report = report_builder.build_report(
+        df_sub,
+        df_group,
+        description=meta.get("description") or "–",
+        info=meta.get("info") or "–",
+        stopwords=report_builder.load_dutch_stopwords(),
+        domain_scores=score_aggregates.state_domain_means(state, report_builder.DOMAINS),
+    )
+    target = Path(out_dir) / code
+    target.mkdir(parents=True, exist_ok=True)
+    sizes = {}
+    for fmt in formats:
+        file_name, _ = report_builder.FORMATS[fmt]
+        data = report_builder.render(report, fmt)
+        (target / file_name).write_bytes(data)
+        sizes[fmt] = len(data)
+    return {"session": code, "seconds": time.perf_counter() - start, "bytes": sizes}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Render groepsrapporten voor meerdere sessies.")
+    parser.add_argument("codes", nargs="*", help="toegangscodes van de sessies")
+    parser.add_argument("--from", dest="date_from", help="sessies aangemaakt vanaf (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="sessies aangemaakt vóór (YYYY-MM-DD)")
+    parser.add_argument("--out", default="rapporten", help="uitvoermap (per sessie een submap)")
+    parser.add_argument("--formats", default="docx", help="kommagescheiden: " + ",".join(report_builder.FORMATS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="aantal processen")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in report_builder.FORMATS]
+    if unknown:
+        parser.error(f"Onbekend formaat: {', '.join(unknown)}")
+    if not args.codes and not (args.date_from or args.date_to):
+        parser.error("Geef toegangscodes of een datumrange (--from/--to) op.")
+
+    t0 = time.perf_counter()
+    meta = select_sessions(args.codes, args.date_from, args.date_to)
+    if meta.empty:
+        print("Geen sessies gevonden.")
+        return 1
+    codes = meta["access_code"].tolist()
+    df_sub, df_group = fetch_session_data(codes)
+    t_fetch = time.perf_counter() - t0
+    print(f"{len(codes)} sessie(s), {len(df_sub)} inzendingen en {len(df_group)} groepsresultaten "
+          f"opgehaald in {t_fetch:.1f} s")
+
+    results, skipped, failed = [], [], []
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {}
+        for row in meta.to_dict(orient="records"):
+            code = row["access_code"]
+            sub = df_sub[df_sub["session"] == code] if not df_sub.empty else df_sub
+            grp = df_group[df_group["session"] == code] if not df_group.empty else df_group
+            if sub.empty or grp.empty:
+                skipped.append(code)
+                continue
+            futures[pool.submit(render_session, code, row, sub, grp, formats, args.out)] = code
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                failed.append((futures[future], e))
+                continue
+            results.append(result)
+            print(f"  ✓ {result['session']}: {result['seconds']:.1f} s")
+
+    total = time.perf_counter() - t0
+    print()
+    print(f"Klaar in {total:.1f} s (ophalen {t_fetch:.1f} s) → {Path(args.out).resolve()}")
+    print(f"  gerenderd: {len(results)}  overgeslagen (te weinig data): {len(skipped)}  mislukt: {len(failed)}")
+    if results:
+        slowest = max(results, key=lambda r: r["seconds"])
+        print(f"  gemiddeld {sum(r['seconds'] for r in results) / len(results):.1f} s per sessie, "
+              f"traagste {slowest['session']} ({slowest['seconds']:.1f} s)")
+    for code in skipped:
+        print(f"  - overgeslagen: {code}")
+    for code, error in failed:
+        print(f"  ✗ {code}: {error}", file=sys.stderr)
+    return 0 if not failed else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# bench_schema.py
+"""
+Querylatentie van de paginapatronen vóór en na de indexen uit migrations/.
+
+    python bench_schema.py                  # 100k rijen per tabel, SQLite in een tijdelijke map
+    python bench_schema.py --rows 500000 --repeat 50
+
+Bouwt een SQLite-database met alleen 0001_basis, vult hem met synthetische
+sessies, meet elke query, past daarna de overige migraties toe en meet opnieuw.
+De queries volgen de filters die de pagina's via PostgREST sturen; de prefix op
+group_id (PostgREST `like` met ge-escapete `_`, zie ranking.like_prefix) is hier een
+GLOB, waarin `_` ook letterlijk is en die SQLite wel via een index kan doen. Er zijn
+meer dan tien groepen, zodat de controle op groep 1 ook groep 10-12 uitsluit.
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import migrate
+
+DOMAINS = ["Welzijn", "Materiële welvaart", "Gezondheid", "Arbeid en vrije tijd",
+           "Wonen", "Sociaal", "Veiligheid", "Milieu"]
+PARTICIPANTS_PER_SESSION = 25
+GROUPS_PER_SESSION = 12
+
+# naam -> (SQL, functie die parameters maakt uit een willekeurige sessie s en rij-id i)
+QUERIES = {
+    "submissions per (sessie, domein)": (
+        "select id, text from submissions where session = ? and domain = ?",
+        lambda s, i: (s, DOMAINS[i % len(DOMAINS)]),
+    ),
+    "submissions (submission_id, domein, tekst)": (
+        "select id from submissions where submission_id = ? and domain = ? and text = ?",
+        lambda s, i: (f"{s}-p{i % PARTICIPANTS_PER_SESSION}", DOMAINS[i % len(DOMAINS)], f"effect {i}"),
+    ),
+    "nieuwste 1000 inzendingen van een sessie": (
+        "select * from submissions where session = ? order by timestamp desc limit 1000",
+        lambda s, i: (s,),
+    ),
+    "stemmen van een groep (prefix group_id)": (
+        "select group_id, votes from effect_votes where session = ? and group_id glob ?",
+        lambda s, i: (s, f"{s}_{i % GROUPS_PER_SESSION + 1}_*"),
+    ),
+    "laatste stem van een sessie": (
+        "select last_updated from effect_votes where session = ? order by last_updated desc limit 1",
+        lambda s, i: (s,),
+    ),
+    "groepskeuze (sessie, naam)": (
+        "select \"group\" from groups where session = ? and name = ?",
+        lambda s, i: (s, f"deelnemer {i % PARTICIPANTS_PER_SESSION}"),
+    ),
+    "groepsfeedback van een sessie": (
+        "select * from group_results where session = ?",
+        lambda s, i: (s,),
+    ),
+}
+
+
+def fill(conn: sqlite3.Connection, rows: int, seed: int = 0) -> list:
+    """Synthetische data: `rows` rijen in submissions, effect_votes en groups; geeft de sessiecodes."""
+    rng = random.Random(seed)
+    n_sessions = max(1, rows // 200)
+    sessions = [f"S{n:05d}" for n in range(n_sessions)]
+
+    def stamp(i):
+        return f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00Z"
+
+    conn.executemany(
+        "insert into submissions (session, submission_id, name, domain, text, score, posneg, timestamp) "
+        "values (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (s, f"{s}-p{i % PARTICIPANTS_PER_SESSION}", f"deelnemer {i % PARTICIPANTS_PER_SESSION}",
+             DOMAINS[i % len(DOMAINS)], f"effect {i}", rng.randint(1, 5), rng.choice((-1, 1)), stamp(i))
+            for i in range(rows) for s in [sessions[i % n_sessions]]
+        ),
+    )
+    conn.executemany(
+        "insert into effect_votes (session, \"group\", group_id, votes, last_updated) values (?, ?, ?, ?, ?)",
+        (
+            (s, f"Groep {g}", f"{s}_{g}_{DOMAINS[i % len(DOMAINS)].lower()}_{i % 7}", rng.choice((-1, 1)), stamp(i))
+            for i in range(rows) for s in [sessions[i % n_sessions]] for g in [i % GROUPS_PER_SESSION + 1]
+        ),
+    )
+    conn.executemany(
+        "insert into groups (session, name, \"group\") values (?, ?, ?)",
+        (
+            (sessions[i // PARTICIPANTS_PER_SESSION % n_sessions],
+             f"deelnemer {i % PARTICIPANTS_PER_SESSION}" + (f" {i // (PARTICIPANTS_PER_SESSION * n_sessions)}"
+                                                            if i >= PARTICIPANTS_PER_SESSION * n_sessions else ""),
+             f"Groep {i % GROUPS_PER_SESSION + 1}")
+            for i in range(rows)
+        ),
+    )
+    conn.executemany(
+        "insert into group_results (session, \"group\", group_id, text, domein, posneg) values (?, ?, ?, ?, ?, ?)",
+        (
+            (s, f"Groep {g}", f"{s}_{g}_{i}", f"effect {i}", DOMAINS[i % len(DOMAINS)], 1)
+            for i in range(rows // 10) for s in [sessions[i % n_sessions]] for g in [i % GROUPS_PER_SESSION + 1]
+        ),
+    )
+    conn.commit()
+    conn.execute("analyze")
+    return sessions
+
+
+def measure(conn: sqlite3.Connection, sessions: list, repeat: int, seed: int = 1) -> dict:
+    """Mediane latentie (ms) per query over `repeat` willekeurige sessies."""
+    rng = random.Random(seed)
+    result = {}
+    for name, (sql, make_params) in QUERIES.items():
+        timings = []
+        for _ in range(repeat):
+            params = make_params(rng.choice(sessions), rng.randrange(1_000_000))
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        result[name] = statistics.median(timings)
+    return result
+
+
+def check_group_prefix(conn: sqlite3.Connection, session: str) -> bool:
+    """De prefixquery van groep 1 geeft precies de stemmen van groep 1, niet die van groep 10-12."""
+    prefix = f"{session}_1_"
+    found = [r[0] for r in conn.execute(QUERIES["stemmen van een groep (prefix group_id)"][0], (session, prefix + "*"))]
+    expected = [r[0] for r in conn.execute("select group_id from effect_votes where session = ?", (session,))
+                if r[0].startswith(prefix)]
+    return sorted(found) == sorted(expected)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Querylatentie vóór en na de schema-indexen (SQLite).")
+    parser.add_argument("--rows", type=int, default=100_000, help="rijen per tabel")
+    parser.add_argument("--repeat", type=int, default=30, help="metingen per query")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "bench.db"
+        migrate.migrate_sqlite(db, until="0001")
+        conn = sqlite3.connect(str(db))
+        sessions = fill(conn, args.rows)
+        before = measure(conn, sessions, args.repeat)
+        conn.close()
+
+        applied = migrate.migrate_sqlite(db)
+        conn = sqlite3.connect(str(db))
+        conn.execute("analyze")
+        after = measure(conn, sessions, args.repeat)
+        prefix_ok = check_group_prefix(conn, sessions[0])
+        conn.close()
+
+    print(f"{args.rows} rijen per tabel, {len(sessions)} sessies; mediaan over {args.repeat} queries")
+    print(f"migraties toegepast: {', '.join(applied)}")
+    print(f"prefix group_id exact (groep 1 zonder 10-12): {'ja' if prefix_ok else 'NEE'}")
+    width = max(map(len, QUERIES))
+    print(f"  {'query':<{width}}  {'vóór ms':>9}  {'na ms':>9}  {'factor':>7}")
+    for name in QUERIES:
+        factor = before[name] / after[name] if after[name] else float("inf")
+        print(f"  {name:<{width}}  {before[name]:9.3f}  {after[name]:9.3f}  {factor:6.0f}×")
+    return 0 if prefix_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
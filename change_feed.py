@@ -0,0 +1,160 @@
+# change_feed.py
+"""
+Eén gedeelde wijzigingsfeed per sessie voor het live facilitator-overzicht.
+
+Elke poll haalt alleen wat nieuw is sinds de vorige cursor (delta's op
+`timestamp` / `last_updated`), plus goedkope server-side tellingen. De
+tussenstanden worden incrementeel bijgewerkt en procesbreed gedeeld, zodat
+meerdere open dashboards (bijv. beamer + laptop) samen één poll per interval doen.
+Elk dashboard krijgt een kopie van de stand, gemaakt onder de lock: zo kan een
+ander dashboard hem bijwerken terwijl dit dashboard de kopie tekent.
+"""
+import threading
+import time
+from collections import Counter, deque
+
+import streamlit as st
+
+import database
+
+POLL_INTERVAL = 10  # seconden; minimale tijd tussen twee polls per sessie
+RECENT_EVENTS = 50
+
+# Tabellen in de feed: cursor-kolom voor delta's, of None voor een kleine snapshot
+FEED_SOURCES = {
+    "submissions": {"cursor": "timestamp", "select": "id,name,domain,timestamp"},
+    "effect_votes": {"cursor": "last_updated", "select": "id,group,votes,last_updated"},
+    "groups": {"cursor": None, "select": "name,group"},
+    "group_results": {"cursor": None, "select": "group"},
+}
+
+
+@st.cache_resource
+def _feed_store() -> dict:
+    return {"lock": threading.Lock(), "sessions": {}}
+
+
+def _new_state() -> dict:
+    return {
+        "lock": threading.Lock(),
+        "last_poll": 0.0,
+        "cursors": {table: None for table in FEED_SOURCES},
+        "seen": {table: set() for table in FEED_SOURCES},  # id's van rijen óp de cursor
+        "totals": {},
+        "participants": {},          # domein -> set(namen)
+        "per_minute": Counter(),     # 'YYYY-MM-DDTHH:MM' -> aantal inzendingen
+        "group_choice": {},          # naam -> groep (pages/10)
+        "votes_per_group": Counter(),
+        "feedback_groups": set(),    # groepen met rijen in group_results
+        "events": deque(maxlen=RECENT_EVENTS),
+        "errors": 0,
+    }
+
+
+def _fetch_delta(session: str, table: str, state: dict) -> list | None:
+    """Nieuwe rijen sinds de cursor; rijen met hetzelfde tijdstip worden via id ontdubbeld."""
+    source = FEED_SOURCES[table]
+    params = {"select": source["select"], "session": f"eq.{session}"}
+    cursor_col = source["cursor"]
+    if cursor_col:
+        params["order"] = f"{cursor_col}.asc"
+        if state["cursors"][table]:
+            params[cursor_col] = f"gte.{state['cursors'][table]}"
+    rows = database.fetch_rows(table, params)
+    if rows is None:
+        return None
+    if not cursor_col:
+        state["totals"][table] = len(rows)
+        return rows
+
+    # Totaal via een goedkope server-side telling (telt ook verwijderde rijen goed)
+    total = database.count_rows(table, {"session": f"eq.{session}"})
+    if total is not None:
+        state["totals"][table] = total
+
+    # Alleen rijen met precies het cursortijdstip komen (door gte) nog eens terug; de
+    # rest is nooit meer nodig, dus `seen` blijft zo groot als één tijdstip
+    fresh = []
+    for row in rows:
+        row_id = row.get("id")
+        if row_id is not None and row_id in state["seen"][table]:
+            continue
+        fresh.append(row)
+        stamp = row.get(cursor_col)
+        if not stamp:
+            continue
+        if stamp > (state["cursors"][table] or ""):
+            state["cursors"][table] = stamp
+            state["seen"][table] = set()
+        if stamp == state["cursors"][table]:
+            state["seen"][table].add(row_id)
+    return fresh
+
+
+def _apply(table: str, rows: list, state: dict) -> None:
+    if table == "submissions":
+        for row in rows:
+            state["participants"].setdefault(row.get("domain") or "–", set()).add(row.get("name"))
+            ts = row.get("timestamp") or ""
+            if ts:
+                state["per_minute"][ts[:16]] += 1
+            state["events"].appendleft((ts[11:19], f"{row.get('name')} • {row.get('domain')}"))
+    elif table == "effect_votes":
+        for row in rows:
+            state["votes_per_group"][row.get("group") or "–"] += 1
+            ts = row.get("last_updated") or ""
+            state["events"].appendleft((ts[11:19], f"Stem in {row.get('group')}"))
+    elif table == "groups":
+        state["group_choice"] = {r.get("name"): r.get("group") for r in rows}
+    elif table == "group_results":
+        state["feedback_groups"] = {r.get("group") for r in rows if r.get("group")}
+
+
+def _snapshot(state: dict) -> dict:
+    """Kopie van de stand om te tekenen (aanroepen met state["lock"])."""
+    return {
+        "last_poll": state["last_poll"],
+        "totals": dict(state["totals"]),
+        "participants": {domain: frozenset(names) for domain, names in state["participants"].items()},
+        "per_minute": Counter(state["per_minute"]),
+        "group_choice": dict(state["group_choice"]),
+        "votes_per_group": Counter(state["votes_per_group"]),
+        "feedback_groups": frozenset(state["feedback_groups"]),
+        "events": list(state["events"]),
+        "errors": state["errors"],
+    }
+
+
+def poll(session: str, *, force: bool = False) -> dict:
+    """
+    Werk de feed van een sessie bij (hoogstens eens per POLL_INTERVAL) en geef een kopie van de stand.
+
+    Een mislukte tabel laat de vorige stand staan; de volgende poll probeert opnieuw.
+    """
+    store = _feed_store()
+    with store["lock"]:
+        state = store["sessions"].setdefault(str(session), _new_state())
+
+    with state["lock"]:
+        if force or time.monotonic() - state["last_poll"] >= POLL_INTERVAL:
+            for table in FEED_SOURCES:
+                rows = _fetch_delta(str(session), table, state)
+                if rows is None:
+                    state["errors"] += 1
+                    continue
+                _apply(table, rows, state)
+            state["last_poll"] = time.monotonic()
+        return _snapshot(state)
+
+
+def forget(session: str) -> None:
+    """Gooi de feed van een sessie weg; de volgende poll begint opnieuw."""
+    store = _feed_store()
+    with store["lock"]:
+        store["sessions"].pop(str(session), None)
+
+
+def missing_feedback(state: dict) -> list:
+    """Groepen die in pages/10 gekozen zijn maar nog geen groepsfeedback hebben ingestuurd."""
+    chosen = {g for g in state["group_choice"].values() if g}
+    return sorted(chosen - state["feedback_groups"])
@@ -0,0 +1,221 @@
+# columnar_export.py
+"""
+Export van sessiedata naar Parquet (of Arrow IPC) voor analyse.
+
+Voorbeelden:
+    python columnar_export.py ABC123 DEF456 --out export
+    python columnar_export.py --from 2025-01-01 --to 2026-01-01 --format arrow
+
+De tabellen worden gepagineerd gelezen en pagina voor pagina weggeschreven, zodat
+het geheugen begrensd blijft; gearchiveerde sessies (archive.py) komen uit het
+archief. Uitvoer is per tabel gepartitioneerd op sessie:
+    <out>/<tabel>/session=<code>/part-0.parquet
+Laag-kardinale tekstkolommen zijn dictionary-encoded, scores en polariteit int8.
+Lezen gaat met load_table(), bijv. een heel jaar workshops in één dataset-scan.
+"""
+import argparse
+import shutil
+import sys
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import database
+
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+# Per tabel: te exporteren kolommen met hun type, en een stabiele volgorde voor het pagineren.
+# De sessie staat in het pad van de partitie en niet als kolom in de bestanden.
+TABLES = {
+    "submissions": {
+        "order": "session.asc,id.asc",
+        "fields": [
+            ("id", pa.string()), ("submission_id", pa.string()), ("name", CATEGORY),
+            ("domain", CATEGORY), ("text", pa.string()), ("score", pa.int8()),
+            ("posneg", pa.int8()), ("timestamp", TIMESTAMP),
+        ],
+    },
+    "effect_votes": {
+        "order": "session.asc,id.asc",
+        "fields": [
+            ("id", pa.string()), ("group", CATEGORY), ("group_id", pa.string()),
+            ("votes", pa.int8()), ("text", pa.string()), ("domein", CATEGORY),
+            ("posneg", pa.int8()), ("last_updated", TIMESTAMP),
+        ],
+    },
+    # Sinds effect_groups.py staan tekst, domein en polariteit hier en niet meer op de stemmen
+    "effect_groups": {
+        "order": "session.asc,id.asc",
+        "fields": [
+            ("id", pa.string()), ("group", CATEGORY), ("domain", CATEGORY),
+            ("text", pa.string()), ("posneg", pa.int8()), ("opened_at", TIMESTAMP),
+        ],
+    },
+    "groups": {
+        "order": "session.asc,name.asc",
+        "fields": [("name", CATEGORY), ("group", CATEGORY)],
+    },
+    "group_results": {
+        "order": "session.asc,group.asc,text.asc",
+        "fields": [
+            ("group", CATEGORY), ("group_id", pa.string()), ("text", pa.string()),
+            ("domein", CATEGORY), ("posneg", pa.int8()),
+            ("feedback_group_impact", pa.string()), ("feedback_place_impact", pa.string()),
+            ("feedback_distance", CATEGORY), ("feedback_improvements", pa.string()),
+            ("feedback_start", pa.int16()),
+        ],
+    },
+}
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def table_schema(table: str) -> pa.Schema:
+    return pa.schema(TABLES[table]["fields"])
+
+
+def _column(values: pd.Series, typ: pa.DataType) -> pa.Array:
+    """Eén kolom naar het gewenste Arrow-type; niet-parseerbare waarden worden null."""
+    if pa.types.is_dictionary(typ):
+        return pa.array(values.where(values.notna(), None).map(lambda v: v if v is None else str(v)),
+                        type=pa.string()).dictionary_encode()
+    if pa.types.is_integer(typ):
+        return pa.array(pd.to_numeric(values, errors="coerce").astype("Int64"), type=pa.int64()).cast(typ)
+    if pa.types.is_timestamp(typ):
+        return pa.array(pd.to_datetime(values, errors="coerce", utc=True, format="ISO8601"), type=typ)
+    return pa.array(values.where(values.notna(), None).map(lambda v: v if v is None else str(v)), type=typ)
+
+
+def rows_to_batch(rows: list, table: str) -> pa.RecordBatch:
+    """Supabase-JSON-rijen naar een getypeerde RecordBatch (ontbrekende kolommen worden null)."""
+    df = pd.DataFrame(rows)
+    schema = table_schema(table)
+    arrays = [
+        _column(df[f.name] if f.name in df.columns else pd.Series([None] * len(df), dtype=object), f.type)
+        for f in schema
+    ]
+    return pa.record_batch(arrays, schema=schema)
+
+
+def partition_dir(out_dir, table: str, session: str) -> Path:
+    return Path(out_dir) / table / f"session={quote(str(session), safe='')}"
+
+
+class _PartitionWriter:
+    """Schrijft batches van één sessie; Parquet direct per batch, Arrow IPC in één keer bij sluiten."""
+
+    def __init__(self, path: Path, schema: pa.Schema, fmt: str):
+        if path.parent.exists():
+            shutil.rmtree(path.parent)  # opnieuw exporteren vervangt de partitie
+        path.parent.mkdir(parents=True)
+        self.path, self.schema, self.fmt = path, schema, fmt
+        self.batches = []
+        self.writer = pq.ParquetWriter(str(path), schema, compression="zstd") if fmt == "parquet" else None
+        self.rows = 0
+
+    def write(self, batch: pa.RecordBatch) -> None:
+        self.rows += batch.num_rows
+        if self.writer is not None:
+            self.writer.write_batch(batch)
+        else:
+            self.batches.append(batch)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            return
+        # IPC-bestanden staan geen wisselende dictionaries toe: eerst samenvoegen
+        data = pa.Table.from_batches(self.batches, schema=self.schema).unify_dictionaries().combine_chunks()
+        with pa.OSFile(str(self.path), "wb") as sink, pa.ipc.new_file(sink, self.schema) as writer:
+            writer.write_table(data)
+
+
+def export_table(table: str, codes: list, out_dir, *, fmt: str = "parquet", page_size: int = database.PAGE_SIZE) -> dict:
+    """
+    Exporteer één tabel voor de gegeven sessies; geeft het aantal rijen per sessie terug.
+
+    De rijen komen per sessie aaneengesloten binnen, dus er is steeds maar één
+    partitie open. Gearchiveerde sessies komen uit het archief (archive.fetch_pages).
+    """
+    import archive  # archive.py leest TABLES uit deze module
+
+    params = {
+        "select": ",".join(["session"] + [name for name, _ in TABLES[table]["fields"]]),
+        "order": TABLES[table]["order"],
+    }
+    schema = table_schema(table)
+    counts, writer, current = {}, None, None
+    try:
+        for page in archive.fetch_pages(table, codes, params, page_size=page_size):
+            df = pd.DataFrame(page)
+            # Een pagina kan de grens tussen twee sessies bevatten
+            for session, part in df.groupby("session", sort=False):
+                if session != current:
+                    if writer is not None:
+                        writer.close()
+                    current = session
+                    writer = _PartitionWriter(
+                        partition_dir(out_dir, table, session) / f"part-0{FORMATS[fmt]}", schema, fmt
+                    )
+                writer.write(rows_to_batch(part.to_dict(orient="records"), table))
+                counts[session] = counts.get(session, 0) + len(part)
+    finally:
+        if writer is not None:
+            writer.close()
+    return counts
+
+
+def export_sessions(codes: list, out_dir, *, tables=tuple(TABLES), fmt: str = "parquet") -> dict:
+    """Exporteer alle gevraagde tabellen; resultaat: {tabel: {sessie: rijen}}."""
+    return {table: export_table(table, codes, out_dir, fmt=fmt) for table in tables}
+
+
+def load_table(out_dir, table: str, sessions: list | None = None, *, fmt: str = "parquet") -> pa.Table:
+    """Lees een geëxporteerde tabel (optioneel alleen bepaalde sessies) als één Arrow-tabel."""
+    dataset = ds.dataset(
+        str(Path(out_dir) / table),
+        format="parquet" if fmt == "parquet" else "ipc",
+        partitioning=ds.HivePartitioning.discover(infer_dictionary=True),
+    )
+    flt = ds.field("session").isin([str(s) for s in sessions]) if sessions else None
+    return dataset.to_table(filter=flt)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Exporteer sessiedata naar Parquet/Arrow.")
+    parser.add_argument("codes", nargs="*", help="toegangscodes van de sessies")
+    parser.add_argument("--from", dest="date_from", help="sessies aangemaakt vanaf (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="sessies aangemaakt vóór (YYYY-MM-DD)")
+    parser.add_argument("--out", default="export", help="uitvoermap")
+    parser.add_argument("--format", choices=list(FORMATS), default="parquet")
+    parser.add_argument("--tables", default=",".join(TABLES), help="kommagescheiden tabellen")
+    args = parser.parse_args(argv)
+
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    unknown = [t for t in tables if t not in TABLES]
+    if unknown:
+        parser.error(f"Onbekende tabel: {', '.join(unknown)}")
+    if not args.codes and not (args.date_from or args.date_to):
+        parser.error("Geef toegangscodes of een datumrange (--from/--to) op.")
+
+    codes = args.codes or [m["access_code"] for m in database.fetch_session_meta(None, args.date_from, args.date_to)]
+    if not codes:
+        print("Geen sessies gevonden.")
+        return 1
+
+    t0 = time.perf_counter()
+    result = export_sessions(codes, args.out, tables=tables, fmt=args.format)
+    print(f"{len(codes)} sessie(s) geëxporteerd in {time.perf_counter() - t0:.1f} s → {Path(args.out).resolve()}")
+    for table, counts in result.items():
+        print(f"  {table}: {sum(counts.values())} rijen in {len(counts)} partitie(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,546 @@
+# database.py
+"""
+Dunne laag rond de Supabase REST-API (PostgREST) voor de pagina's en scripts.
+
+Credentials komen uit st.secrets; scripts buiten Streamlit kunnen ze ook via
+SUPABASE_URL / SUPABASE_KEY in de omgeving meegeven.
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+DEFAULT_TIMEOUT = 15
+PAGE_SIZE = 1000  # standaard maximum aantal rijen per request bij Supabase
+FETCH_WORKERS = int(os.environ.get("WERKSESSIE_FETCH_WORKERS", 16))
+
+# Begrenzing van requests naar Supabase, per proces
+RATE_PER_SECOND = float(os.environ.get("WERKSESSIE_RATE_PER_SECOND", 20))
+MAX_CONCURRENCY = int(os.environ.get("WERKSESSIE_MAX_CONCURRENCY", 8))
+LATENCY_TARGET = 2.0  # seconden; trager dan dit telt als teken van overbelasting
+RETRY_STATUS = {429, 502, 503, 504}
+MAX_ATTEMPTS = 4
+BACKOFF_BASE, BACKOFF_CAP = 0.25, 4.0
+
+# Circuit breaker: na zoveel mislukte requests op rij even niet meer proberen
+BREAKER_FAILURES = int(os.environ.get("WERKSESSIE_BREAKER_FAILURES", 5))
+BREAKER_COOLDOWN = float(os.environ.get("WERKSESSIE_BREAKER_COOLDOWN", 30))
+# Zo lang wacht een pagina hooguit op data voordat ze rendert met wat er is
+RENDER_BUDGET = float(os.environ.get("WERKSESSIE_RENDER_BUDGET", 4))
+
+
+def _secret(name: str) -> str:
+    return os.environ.get(name.upper()) or st.secrets[name]
+
+
+def base_url() -> str:
+    return _secret("supabase_url").rstrip("/")
+
+
+def headers(prefer: str = "", json_body: bool = False) -> dict:
+    """Standaard Supabase-headers; `prefer` gaat ongewijzigd in de Prefer-header."""
+    key = _secret("supabase_key")
+    h = {
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
+        "Accept": "application/json",
+    }
+    if json_body:
+        h["Content-Type"] = "application/json"
+    if prefer:
+        h["Prefer"] = prefer
+    return h
+
+
+def table_url(table: str) -> str:
+    return f"{base_url()}/rest/v1/{table}"
+
+
+# =======================
+# Adaptieve begrenzing en retries
+# =======================
+@st.cache_resource
+def _limiter() -> dict:
+    """
+    Token bucket (gemiddeld tempo) plus een AIMD-venster (gelijktijdige requests).
+
+    Het venster groeit met 1/venster per vlot antwoord en halveert bij 429/503,
+    time-outs of trage antwoorden, zoals TCP-congestiecontrole.
+    """
+    return {
+        "cond": threading.Condition(),
+        "tokens": float(MAX_CONCURRENCY),
+        "stamp": time.monotonic(),
+        "window": float(MAX_CONCURRENCY),
+        "in_flight": 0,
+        "stats": Counter(),
+    }
+
+
+def _acquire(deadline: float) -> bool:
+    """Wacht op een token en een plek in het venster; False als de deadline eerder verloopt."""
+    lim = _limiter()
+    with lim["cond"]:
+        while True:
+            now = time.monotonic()
+            lim["tokens"] = min(float(MAX_CONCURRENCY), lim["tokens"] + (now - lim["stamp"]) * RATE_PER_SECOND)
+            lim["stamp"] = now
+            if lim["in_flight"] < int(lim["window"]) and lim["tokens"] >= 1:
+                lim["tokens"] -= 1
+                lim["in_flight"] += 1
+                return True
+            if now >= deadline:
+                lim["stats"]["afgewezen"] += 1
+                return False
+            refill = (1 - lim["tokens"]) / RATE_PER_SECOND if lim["tokens"] < 1 else 0.05
+            lim["cond"].wait(min(deadline - now, max(refill, 0.01)))
+
+
+def _release(latency: float, overloaded: bool) -> None:
+    lim = _limiter()
+    with lim["cond"]:
+        lim["in_flight"] -= 1
+        if overloaded or latency > LATENCY_TARGET:
+            lim["window"] = max(1.0, lim["window"] / 2)
+            lim["stats"]["overbelast"] += 1
+        else:
+            lim["window"] = min(float(MAX_CONCURRENCY), lim["window"] + 1 / lim["window"])
+            lim["stats"]["ok"] += 1
+        lim["cond"].notify_all()
+
+
+def _count(stat: str) -> None:
+    """Verhoog een teller van de begrenzer (onder zijn lock: requests lopen in meerdere threads)."""
+    lim = _limiter()
+    with lim["cond"]:
+        lim["stats"][stat] += 1
+
+
+def limiter_stats() -> dict:
+    """
+    Huidig venster, lopende requests en tellers (ok / overbelast / afgewezen / retries /
+    kortgesloten / doorgelopen).
+    """
+    lim = _limiter()
+    with lim["cond"]:
+        return {"window": lim["window"], "in_flight": lim["in_flight"], **lim["stats"]}
+
+
+def _backoff(attempt: int, retry_after: str | None = None) -> float:
+    """Exponentiële backoff met 'full jitter'; een Retry-After van de server gaat voor."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay
+
+
+# =======================
+# Circuit breaker
+# =======================
+class CircuitOpenError(requests.ConnectionError):
+    """Supabase faalde te vaak op rij; het request is niet verstuurd."""
+
+
+class QueueTimeout(requests.Timeout):
+    """De lokale begrenzer had binnen de time-out geen plek; het request is niet verstuurd."""
+
+
+@st.cache_resource
+def _breaker() -> dict:
+    """
+    Procesbrede circuit breaker: 'dicht' (normaal), 'open' (alles meteen weigeren)
+    of 'half-open' (na de afkoeltijd mag één proefrequest door).
+    """
+    return {"lock": threading.Lock(), "failures": 0, "open_until": 0.0, "probing": False}
+
+
+def _breaker_admit(url: str) -> None:
+    br = _breaker()
+    with br["lock"]:
+        if br["failures"] < BREAKER_FAILURES:
+            return
+        if time.monotonic() >= br["open_until"] and not br["probing"]:
+            br["probing"] = True  # proefrequest
+            return
+    _count("kortgesloten")
+    raise CircuitOpenError(f"Database tijdelijk niet bereikbaar; {url} niet geprobeerd")
+
+
+def _breaker_result(ok: bool | None) -> None:
+    """Uitkomst van een request bij Supabase; None als het nooit verstuurd is (telt niet mee)."""
+    br = _breaker()
+    with br["lock"]:
+        br["probing"] = False
+        if ok is None:
+            return
+        if ok:
+            br["failures"] = 0
+            return
+        br["failures"] += 1
+        if br["failures"] >= BREAKER_FAILURES:
+            br["open_until"] = time.monotonic() + BREAKER_COOLDOWN
+
+
+def breaker_state() -> dict:
+    """{'state': 'dicht' | 'open' | 'half-open', 'failures': int, 'retry_in': seconden tot een nieuwe poging}."""
+    br = _breaker()
+    with br["lock"]:
+        failures, remaining = br["failures"], br["open_until"] - time.monotonic()
+    if failures < BREAKER_FAILURES:
+        state = "dicht"
+    else:
+        state = "open" if remaining > 0 else "half-open"
+    return {"state": state, "failures": failures, "retry_in": max(0.0, remaining)}
+
+
+def request(method: str, url: str, *, timeout: float = DEFAULT_TIMEOUT, idempotent: bool | None = None,
+            **kwargs) -> requests.Response:
+    """
+    requests.request achter de procesbrede begrenzer, met retries bij overbelasting.
+
+    GET/HEAD/PATCH/DELETE en upserts (Prefer: resolution=...) worden ook na een
+    time-out of verbroken verbinding herhaald. Een gewone POST alleen bij 429/503:
+    dan heeft de server het verzoek zeker niet uitgevoerd. Gooit
+    requests.RequestException als er na alle pogingen geen antwoord is, en
+    CircuitOpenError (ook een RequestException) zolang de circuit breaker open staat.
+    """
+    method = method.upper()
+    _breaker_admit(url)
+    started, r, ok = time.time(), None, None
+    try:
+        r = _request(method, url, timeout=timeout, idempotent=idempotent, **kwargs)
+        ok = r.status_code < 500 and r.status_code != 429
+        return r
+    except QueueTimeout:
+        raise  # lokale wachtrij, geen teken dat Supabase faalt
+    except requests.RequestException:
+        ok = False
+        raise
+    finally:
+        # Alleen echte uitkomsten van Supabase tellen: transportfouten, 5xx en 429
+        _breaker_result(ok)
+        if RECORD_DIR:
+            _record(method, url, kwargs, r, started)
+
+
+def _request(method: str, url: str, *, timeout: float, idempotent: bool | None, **kwargs) -> requests.Response:
+    if idempotent is None:
+        prefer = (kwargs.get("headers") or {}).get("Prefer", "")
+        idempotent = method != "POST" or "resolution=" in prefer
+    for attempt in range(MAX_ATTEMPTS):
+        last = attempt == MAX_ATTEMPTS - 1
+        if not _acquire(time.monotonic() + timeout):
+            raise QueueTimeout(f"Geen ruimte voor een request naar {url} binnen {timeout} s")
+        start = time.monotonic()
+        try:
+            r = requests.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            _release(time.monotonic() - start, overloaded=True)
+            if last or not idempotent:
+                raise
+            _count("retries")
+            time.sleep(_backoff(attempt))
+            continue
+        overloaded = r.status_code in RETRY_STATUS
+        _release(time.monotonic() - start, overloaded=overloaded)
+        retryable = overloaded and (idempotent or r.status_code in (429, 503))
+        if not retryable or last:
+            return r
+        _count("retries")
+        time.sleep(_backoff(attempt, r.headers.get("Retry-After")))
+    return r
+
+
+# =======================
+# Opnemen van verkeer (opt-in, voor replay.py)
+# =======================
+RECORD_DIR = os.environ.get("WERKSESSIE_RECORD_DIR")  # leeg: niets opnemen
+# Geheime sleutel voor de HMAC van toegangscodes; zonder sleutel een willekeurige per proces
+RECORD_KEY = os.environ.get("WERKSESSIE_RECORD_KEY")
+_PLAIN_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "and"}
+
+
+@st.cache_resource
+def _recorder() -> dict:
+    key = RECORD_KEY.encode("utf-8") if RECORD_KEY else secrets.token_bytes(32)
+    return {"lock": threading.Lock(), "key": key}
+
+
+def anonymize(session) -> str:
+    """
+    Sleutel voor een toegangscode: HMAC-SHA256 met RECORD_KEY.
+
+    Een gewone hash van een korte code is met alle kandidaten terug te rekenen; zonder
+    de geheime sleutel kan dat niet. Met dezelfde WERKSESSIE_RECORD_KEY geeft een
+    code in elk proces dezelfde sleutel; zonder sleutel alleen binnen één proces.
+    """
+    return hmac.new(_recorder()["key"], str(session).encode("utf-8"), hashlib.sha256).hexdigest()[:12]
+
+
+def _request_shape(url: str, params: dict | None, body) -> dict:
+    """
+    Vorm van een request zonder inhoud: tabel, kolommen en operatoren, aantal rijen.
+
+    Filterwaarden, teksten en namen worden niet opgeslagen; alleen de operator
+    (bijv. 'eq', 'like', 'in:3') blijft over.
+    """
+    parts = urlsplit(url)
+    query = {**dict(parse_qsl(parts.query)), **{k: str(v) for k, v in (params or {}).items()}}
+    session = query.get("session", "")
+    session = session.split(".", 1)[1] if session.startswith("eq.") else None
+    rows = body if isinstance(body, list) else [body] if isinstance(body, dict) else []
+    if session is None and rows:
+        session = rows[0].get("session")
+
+    shape = {}
+    for key, value in query.items():
+        if key in ("and", "or"):
+            shape[key] = len(value.split(","))
+        elif key in _PLAIN_PARAMS:
+            shape[key] = value
+        elif value.startswith("in."):
+            shape[key] = f"in:{len(value[4:-1].split(','))}"
+        else:
+            shape[key] = value.split(".", 1)[0]
+    return {
+        "table": parts.path.rstrip("/").rsplit("/", 1)[-1],
+        "session": anonymize(session) if session else "onbekend",
+        "params": shape,
+        "rows_in": len(rows),
+        "fields_in": sorted({k for row in rows for k in row}),
+    }
+
+
+def _record(method: str, url: str, kwargs: dict, r: requests.Response | None, started: float) -> None:
+    """Eén regel JSON per request in <RECORD_DIR>/<sessie-hash>.jsonl; fouten bij opnemen worden genegeerd."""
+    try:
+        shape = _request_shape(url, kwargs.get("params"), kwargs.get("json"))
+        rows_out = None
+        if r is not None and r.content and r.headers.get("Content-Type", "").startswith("application/json"):
+            data = r.json()
+            rows_out = len(data) if isinstance(data, list) else 1
+        entry = {
+            "t": round(started, 3),
+            "method": method,
+            **shape,
+            "status": r.status_code if r is not None else "error",
+            "latency_ms": round((time.time() - started) * 1000, 1),
+            "rows_out": rows_out,
+            "bytes_out": len(r.content) if r is not None else 0,
+        }
+        path = Path(RECORD_DIR) / f"{shape['session']}.jsonl"
+        with _recorder()["lock"]:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+    except Exception:
+        pass
+
+
+def _parse_total(content_range: str | None) -> int | None:
+    """'0-9/42' of '*/0' -> 42 / 0."""
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
+
+
+def fetch_rows(table: str, params: dict | None = None, *, timeout: int = DEFAULT_TIMEOUT) -> list | None:
+    """GET rijen uit een tabel; None bij netwerkfout, foutstatus of geen JSON."""
+    rows, _ = fetch_rows_with_count(table, params, timeout=timeout, count=False)
+    return rows
+
+
+def fetch_rows_with_count(
+    table: str,
+    params: dict | None = None,
+    *,
+    timeout: int = DEFAULT_TIMEOUT,
+    count: bool = True,
+) -> tuple[list | None, int | None]:
+    """GET rijen plus het totaal aantal (server-side geteld via Prefer: count=exact)."""
+    try:
+        r = request(
+            "GET",
+            table_url(table),
+            headers=headers("count=exact" if count else ""),
+            params=params,
+            timeout=timeout,
+        )
+    except requests.RequestException:
+        return None, None
+    if r.status_code not in (200, 206):
+        return None, None
+    try:
+        rows = r.json()
+    except ValueError:
+        return None, None
+    return rows, _parse_total(r.headers.get("Content-Range")) if count else None
+
+
+def count_rows(table: str, params: dict | None = None, *, timeout: int = DEFAULT_TIMEOUT) -> int | None:
+    """Aantal rijen volgens de server (HEAD + Prefer: count=exact), zonder rijen over te sturen."""
+    try:
+        r = request("HEAD", table_url(table), headers=headers("count=exact"), params=params, timeout=timeout)
+    except requests.RequestException:
+        return None
+    if r.status_code not in (200, 206):
+        return None
+    return _parse_total(r.headers.get("Content-Range"))
+
+
+def fetch_pages(table: str, params: dict | None = None, *, page_size: int = PAGE_SIZE, timeout: int = DEFAULT_TIMEOUT):
+    """
+    Lees een tabel in pagina's van `page_size` rijen (limit/offset) en lever per pagina een lijst op.
+
+    Geef in `params` een `order` mee voor een stabiele volgorde tussen pagina's.
+    Gooit RuntimeError als een pagina niet opgehaald kan worden.
+    """
+    offset = 0
+    while True:
+        rows = fetch_rows(table, {**(params or {}), "limit": page_size, "offset": offset}, timeout=timeout)
+        if rows is None:
+            raise RuntimeError(f"Kon {table} niet ophalen (offset {offset}).")
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+def fetch_all(table: str, params: dict | None = None, **kwargs) -> list:
+    """Alle rijen van een (gefilterde) tabel, over meerdere pagina's heen."""
+    return [row for page in fetch_pages(table, params, **kwargs) for row in page]
+
+
+def in_filter(values) -> str:
+    """PostgREST-filter `in.(a,b,c)`; waarden met komma's of haakjes worden gequote."""
+    quoted = []
+    for v in values:
+        v = str(v)
+        quoted.append('"' + v.replace('"', '\\"') + '"' if any(c in v for c in ',()" ') else v)
+    return f"in.({','.join(quoted)})"
+
+
+def fetch_session_meta(codes=None, date_from: str | None = None, date_to: str | None = None,
+                       select: str = "access_code,description,info,prov,created_at") -> list:
+    """Rijen uit session_meta voor de opgegeven codes, of voor alle sessies in de datumrange."""
+    params = {"select": select, "order": "created_at.asc"}
+    if codes:
+        params["access_code"] = in_filter(codes)
+    else:
+        filters = []
+        if date_from:
+            filters.append(f"created_at.gte.{date_from}")
+        if date_to:
+            filters.append(f"created_at.lt.{date_to}")
+        if filters:
+            params["and"] = f"({','.join(filters)})"
+    return fetch_all("session_meta", params)
+
+
+# =======================
+# Gelijktijdig ophalen
+# =======================
+# Drie pools, zodat een taak nooit wacht op een taak die achter haar in dezelfde pool staat:
+# "pagina" voor reads van een pagina, "genest" voor fetch_concurrently binnen zo'n read
+# (bijv. load_data op pages/14) en "achtergrond" voor verversingen uit session_cache.
+# Nog dieper genest draait inline.
+BACKGROUND_WORKERS = int(os.environ.get("WERKSESSIE_BACKGROUND_WORKERS", 4))
+_local = threading.local()
+
+
+@st.cache_resource
+def _executors() -> dict:
+    """Gedeelde threadpools per proces voor I/O; requests geeft de GIL vrij tijdens het wachten."""
+    return {
+        "pagina": ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="supabase"),
+        "genest": ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="supabase-genest"),
+        "achtergrond": ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="supabase-achtergrond"),
+    }
+
+
+def _with_script_ctx(fn, ctx, level: int):
+    """Voer `fn` uit met de Streamlit-context van de aanroeper (voor st.secrets en de caches)."""
+    def run():
+        add_script_run_ctx(None, ctx)
+        _local.level = level
+        try:
+            return fn()
+        finally:
+            _local.level = 0
+            add_script_run_ctx(None, None)  # threads worden hergebruikt door andere sessies
+    return run
+
+
+def submit(fn, *, background: bool = False) -> Future:
+    """
+    Start `fn` met de Streamlit-context van de aanroeper.
+
+    Vanuit het script gaat `fn` naar de pool "pagina", vanuit een taak naar
+    "genest"; nog dieper draait hij meteen in deze thread. `background` is voor
+    taken waar niemand op wacht (pool "achtergrond").
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    level = getattr(_local, "level", 0)
+    if background:
+        return _executors()["achtergrond"].submit(_with_script_ctx(fn, ctx, 1))
+    if level < 2:
+        pool = _executors()["pagina" if level == 0 else "genest"]
+        return pool.submit(_with_script_ctx(fn, ctx, level + 1))
+    future = Future()
+    try:
+        future.set_result(fn())
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def fetch_concurrently(loaders: dict, *, deadline: float = DEFAULT_TIMEOUT) -> tuple[dict, dict]:
+    """
+    Voer onafhankelijke reads tegelijk uit: {naam: functie zonder argumenten}.
+
+    Geeft (resultaten, fouten) terug, beide per naam. Eén deadline geldt voor het
+    geheel; wat dan nog loopt komt in `fouten` als TimeoutError en de pagina kan
+    met de rest verder. Een functie die een exception gooit faalt alleen zelf.
+
+    Een functie die bij de deadline nog niet begonnen is, wordt geannuleerd. Een
+    functie die al draait, kan een thread niet stoppen: die loopt door tot haar
+    eigen requests klaar zijn. Elk request is begrensd door zijn time-out en
+    MAX_ATTEMPTS pogingen, en het aantal threads door de pool. Het resultaat gaat
+    hier verloren; wat de functie zelf bewaart (session_cache) blijft nuttig
+    voor de volgende rerun. limiter_stats telt ze als "doorgelopen".
+    """
+    futures = {submit(fn): name for name, fn in loaders.items()}
+    results, errors = {}, {}
+    pending = set(futures)
+    end = time.monotonic() + deadline
+    while pending:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+    for future in pending:
+        if not future.cancel():
+            _count("doorgelopen")
+        errors[futures[future]] = TimeoutError(f"{futures[future]}: geen antwoord binnen {deadline:.0f} s")
+    return results, errors
@@ -0,0 +1,250 @@
+# effect_groups.py
+"""
+Canonieke effectgroepen per sessie, één keer gemaakt als de facilitator het stemmen opent.
+
+Voorheen clusterde pages/11 de inzendingen voor elke stemmer opnieuw en kopieerde
+elke stem de tekst, het domein en de polariteit. Nu clustert "Stemmen openen"
+(pages/15) de inzendingen van elke groep één keer en schrijft het resultaat naar
+de tabel `effect_groups`:
+    id (PK, '<sessie>_<groep>_<domein>_<hash van de teksten>'), session, group, domain, text,
+    posneg (-1/0/1), authors (json-array met namen), opened_at (generatie)
+Stemmen verwijzen alleen nog naar dat id; pages/11 leest de tabel met één kleine
+request per sessie (index op session), en de ranglijst van pages/12/13 haalt
+tekst, domein en polariteit hier vandaan.
+
+Het id hangt af van de leden van de groep, niet van de volgorde: opnieuw openen
+geeft een onveranderde effectgroep hetzelfde id, zodat haar stemmen blijven
+tellen. Een groep die door nieuwe inzendingen verandert krijgt een nieuw id; de
+stemmen op het oude id tellen dan niet meer mee (zie ranking.compute_ranking).
+
+Opnieuw openen schrijft alle rijen in één upsert (één transactie) met een nieuw
+opened_at; lezers houden alleen de rijen met het nieuwste opened_at. Het daarna
+opruimen van oudere generaties is alleen opruimen: mislukt het, dan zien lezers
+toch nooit een mengsel van oude en nieuwe effectgroepen.
+"""
+import difflib
+import hashlib
+import json
+import re
+
+import pandas as pd
+import requests
+
+import database
+import frames
+import group_assignment
+import session_cache
+from datetime import datetime, timezone
+
+from aggregation import majority_posneg, norm_text, normalize_name, text_polarity
+
+TABLE = "effect_groups"
+CACHE_KEY = "effect_groups"
+CACHE_TTL = 15  # seconden; opnieuw openen in een ander proces wordt zo opgepikt
+SIMILARITY_THRESHOLD = 0.6
+COLUMNS = ["id", "session", "group", "domain", "text", "posneg", "authors", "opened_at"]
+
+
+# =======================
+# Clusteren
+# =======================
+def parse_group_number(g) -> int | None:
+    """Parseert groep-nummer uit int/float/'3'/'Groep 3'/etc."""
+    if g is None or (isinstance(g, float) and pd.isna(g)):
+        return None
+    if isinstance(g, int):
+        return g
+    if isinstance(g, float):
+        return int(g)
+    m = re.search(r"(\d+)", str(g))
+    return int(m.group(1)) if m else None
+
+
+def slugify(s: str) -> str:
+    s = (s or "").strip().lower()
+    s = re.sub(r"[^a-z0-9]+", "-", s)
+    return s.strip("-")
+
+
+def group_similar_effects(df_local: pd.DataFrame, similarity_threshold: float = SIMILARITY_THRESHOLD) -> list:
+    """Groepeer vergelijkbare 'text' waarden binnen hetzelfde domein."""
+    grouped = []
+    used_indices = set()
+    for i, row_i in df_local.iterrows():
+        if i in used_indices:
+            continue
+        group = [i]
+        text_i = str(row_i.get("text", "")).lower()
+        for j, row_j in df_local.iterrows():
+            if j <= i or j in used_indices:
+                continue
+            text_j = str(row_j.get("text", "")).lower()
+            if difflib.SequenceMatcher(None, text_i, text_j).ratio() >= similarity_threshold:
+                group.append(j)
+                used_indices.add(j)
+        grouped.append(group)
+    return grouped
+
+
+def effect_id(session: str, group_number: int, domain: str, texts) -> str:
+    """Stabiel id uit de genormaliseerde teksten van de leden (volgorde maakt niet uit)."""
+    members = "\n".join(sorted(norm_text(list(texts)).tolist()))
+    digest = hashlib.sha1(members.encode("utf-8")).hexdigest()[:12]
+    return f"{session}_{group_number}_{slugify(str(domain))}_{digest}"
+
+
+def cluster_group(df_group: pd.DataFrame, session: str, group_number: int, group_label: str) -> list:
+    """Effectgroepen (rijen voor `effect_groups`) uit de inzendingen van één groep."""
+    text_posneg_map = {}
+    if {"text", "posneg"}.issubset(df_group.columns):
+        text_posneg_map = text_polarity(df_group["text"], df_group["posneg"])
+
+    rows = []
+    domains = sorted(d for d in df_group["domain"].dropna().unique().tolist() if str(d).strip() != "")
+    for dom in domains:
+        df_dom = df_group[df_group["domain"] == dom].reset_index(drop=True)
+        for members in group_similar_effects(df_dom):
+            part = df_dom.loc[members]
+            texts = [str(t) for t in part["text"].tolist() if str(t).strip() != ""]
+            # posneg-meerderheid over de teksten in deze groep
+            text_norms = norm_text(texts)
+            component_posnegs = text_norms[text_norms != ""].map(text_posneg_map).fillna(0)
+            rows.append({
+                "id": effect_id(session, group_number, dom, part["text"].astype(str)),
+                "session": session,
+                "group": group_label,
+                "domain": str(dom),
+                "text": " / ".join(texts) if texts else "(geen tekst)",
+                "posneg": majority_posneg(component_posnegs),  # -1/0/1
+                "authors": [str(a) for a in part["name"].dropna().unique().tolist()],
+            })
+    return rows
+
+
+def cluster_session(submissions: pd.DataFrame, groups: pd.DataFrame, session: str) -> list:
+    """Alle effectgroepen van een sessie: per groep de inzendingen van haar leden clusteren."""
+    if submissions.empty or groups.empty:
+        return []
+    df = submissions.drop_duplicates(subset=[c for c in ["name", "domain", "score", "text"] if c in submissions])
+    if "name_norm" not in df.columns:
+        df = df.assign(name_norm=normalize_name(df["name"]))
+    members = groups.dropna(subset=["name"]).astype({"name": object, "group": object})
+    members = members.assign(group_number=members["group"].map(parse_group_number)).dropna(subset=["group_number"])
+    members = members.assign(name_norm=normalize_name(members["name"]))
+
+    rows = []
+    for number, part in members.groupby("group_number"):
+        df_group = df[df["name_norm"].isin(set(part["name_norm"]))]
+        if not df_group.empty:
+            rows.extend(cluster_group(df_group, session, int(number), str(part["group"].iloc[0])))
+    return rows
+
+
+# =======================
+# Opslaan en lezen
+# =======================
+def open_voting(session: str) -> list:
+    """
+    Clustert de hele sessie en schrijft `effect_groups` (facilitatorknop "Stemmen openen").
+
+    Eén upsert op id voor alle rijen met een nieuw opened_at; daarna worden oudere
+    generaties opgeruimd. Geeft de geschreven rijen; RuntimeError als het opslaan mislukt.
+    """
+    submissions = database.fetch_all(
+        "submissions",
+        {"select": "name,domain,score,text,posneg", "session": f"eq.{session}", "order": "timestamp.desc"},
+    )
+    group_assignment.invalidate_snapshot(session)  # de indeling van nu, niet van 15 s geleden
+    groups = group_assignment.groups_snapshot(session)
+    rows = cluster_session(pd.DataFrame(submissions, columns=["name", "domain", "score", "text", "posneg"]),
+                           groups, session)
+    opened_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    rows = [{**row, "opened_at": opened_at} for row in rows]
+    # Zonder rijen is er geen nieuwe generatie: dan gaat de hele sessie in één request weg
+    stale = {"session": f"eq.{session}"}
+    try:
+        if rows:
+            r = database.request(
+                "POST",
+                database.table_url(TABLE),
+                headers=database.headers("resolution=merge-duplicates,return=minimal", json_body=True),
+                params={"on_conflict": "id"},
+                json=rows,
+            )
+            if r.status_code not in (200, 201, 204):
+                raise RuntimeError(f"Opslaan van effectgroepen mislukt: {r.status_code} {r.text}")
+        else:
+            r = database.request("DELETE", database.table_url(TABLE), headers=database.headers(), params=stale)
+            if r.status_code not in (200, 204):
+                raise RuntimeError(f"Opruimen van oude effectgroepen mislukt: {r.status_code} {r.text}")
+    except requests.RequestException as e:
+        raise RuntimeError(f"Geen verbinding met de database ({type(e).__name__}).") from e
+
+    if rows:
+        # Oudere generaties opruimen; mislukt dit, dan houden lezers toch alleen de nieuwste
+        try:
+            database.request("DELETE", database.table_url(TABLE), headers=database.headers(),
+                             params={**stale, "or": f'(opened_at.lt."{opened_at}",opened_at.is.null)'})
+        except requests.RequestException:
+            pass  # de volgende keer "Stemmen openen" ruimt ze alsnog op
+
+    invalidate(session)
+    return rows
+
+
+def latest_generation(df: pd.DataFrame) -> pd.DataFrame:
+    """Alleen de rijen van de laatste keer "Stemmen openen" (rijen zonder opened_at zijn ouder)."""
+    if df.empty or "opened_at" not in df.columns:
+        return df
+    opened = pd.to_datetime(df["opened_at"], errors="coerce", utc=True, format="ISO8601")
+    if opened.isna().all():
+        return df  # alleen rijen van vóór opened_at
+    return df[opened == opened.max()].reset_index(drop=True)
+
+
+def generation(df: pd.DataFrame):
+    """opened_at van de huidige effectgroepen (None zonder effectgroepen of van vóór opened_at)."""
+    if df.empty or "opened_at" not in df.columns:
+        return None
+    opened = pd.to_datetime(df["opened_at"], errors="coerce", utc=True, format="ISO8601").max()
+    return None if pd.isna(opened) else opened.isoformat()
+
+
+def _fetch(session: str) -> pd.DataFrame:
+    rows = database.fetch_all(TABLE, {"select": ",".join(COLUMNS), "session": f"eq.{session}", "order": "id.asc"})
+    return latest_generation(frames.to_frame(rows, TABLE, session=session, columns=COLUMNS))
+
+
+def load(session: str) -> pd.DataFrame:
+    """Effectgroepen van een sessie (gedeeld object: niet in-place aanpassen)."""
+    return session_cache.get_or_load(session, CACHE_KEY, lambda: _fetch(session), ttl=CACHE_TTL, shared=True,
+                                     revalidate=True)
+
+
+def invalidate(session: str) -> None:
+    session_cache.invalidate(session, CACHE_KEY)
+
+
+def _authors(value) -> list:
+    # jsonb komt als lijst binnen, een tekstkolom als JSON-string
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = [value]
+    return [str(a) for a in value] if isinstance(value, (list, tuple)) else []
+
+
+def for_group(df: pd.DataFrame, session: str, group_number) -> list:
+    """Effectgroepen van één groep als dicts voor pages/11 (met genormaliseerde auteurs)."""
+    part = df[df["id"].astype(str).str.startswith(f"{session}_{group_number}_")]
+    return [
+        {
+            "group_id": row["id"],
+            "text": row["text"],
+            "domain": row["domain"],
+            "posneg": int(row["posneg"]) if pd.notna(row["posneg"]) else 0,
+            "authors_norm": frozenset(normalize_name(pd.Series(_authors(row["authors"]), dtype=object))),
+        }
+        for _, row in part.iterrows()
+    ]
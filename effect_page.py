@@ -1,9 +1,19 @@
 # effect_page.py
 import streamlit as st
-import requests
 import uuid
 import pandas as pd
 
+import database
+import score_aggregates
+import similar_index
+
+
+@st.cache_data
+def load_domain_info() -> pd.DataFrame:
+    """domein_info.xlsx één keer per proces inlezen in plaats van bij elke rerun."""
+    return pd.read_excel("domein_info.xlsx")
+
+
 def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
     st.set_page_config(page_title=f"Effect op {domain}", layout="wide")
     st.title(f"Effect op {domain}")
@@ -54,19 +64,19 @@ def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
     if not st.session_state[domain]["loaded"]:
         try:
             q = (
-                f"?select=id,text,score,posneg,submission_id,session,domain"
+                f"?select=id,text,score,posneg,submission_id,session,domain,name"
                 f"&submission_id=eq.{st.session_state.submission_id}"
                 f"&domain=eq.{domain}"
             )
-            r = requests.get(BASE + q, headers=headers(), timeout=10)
+            r = database.request("GET", BASE + q, headers=headers(), timeout=10)
             rows = r.json() if r.ok else []
             if not rows:
                 q2 = (
-                    f"?select=id,text,score,posneg,submission_id,session,domain"
+                    f"?select=id,text,score,posneg,submission_id,session,domain,name"
                     f"&session=eq.{st.session_state.access_code}"
                     f"&domain=eq.{domain}"
                 )
-                r2 = requests.get(BASE + q2, headers=headers(), timeout=10)
+                r2 = database.request("GET", BASE + q2, headers=headers(), timeout=10)
                 rows = r2.json() if r2.ok else []
             for row in rows:
                 etype = "positive" if int(row.get("posneg", 0)) == 1 else "negative"
@@ -82,9 +92,12 @@ def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
         except Exception as e:
             st.warning(f"Kon eerdere antwoorden niet laden: {e}")
 
+    # --- Index voor suggesties van vergelijkbare effecten (één keer per proces) ---
+    similar_index.seed(st.session_state.access_code, domain)
+
     # --- Domeininformatie laden ---
     try:
-        info_df = pd.read_excel("domein_info.xlsx")
+        info_df = load_domain_info()
         info = info_df[info_df["domein"] == domain]
         info_text = info["introductietekst"].iloc[0]
         questions = info["hulpvragen"].iloc[0].split("-")
@@ -152,7 +165,7 @@ def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
                     f"&domain=eq.{data['domain']}"
                     f"&text=eq.{data['text']}"
                 )
-                r_lookup = requests.get(BASE + q, headers=headers(False), timeout=10)
+                r_lookup = database.request("GET", BASE + q, headers=headers(False), timeout=10)
                 if r_lookup.ok:
                     rows = r_lookup.json()
                     if isinstance(rows, list) and rows:
@@ -162,9 +175,9 @@ def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
             # --- PATCH of POST ---
             if row_id:
                 url = f"{BASE}?id=eq.{row_id}"
-                r = requests.patch(url, headers=headers(True), json=data, timeout=10)
+                r = database.request("PATCH", url, headers=headers(True), json=data, timeout=10)
             else:
-                r = requests.post(BASE, headers=headers(True), json=data, timeout=10)
+                r = database.request("POST", BASE, headers=headers(True), json=data, timeout=10)
 
             r.raise_for_status()
             res = r.json()
@@ -173,6 +186,10 @@ def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
             elif isinstance(res, dict) and "id" in res:
                 effect["row_id"] = res["id"]
 
+            # Per rij-id: de vorige bijdrage van deze rij vervangen, nooit dubbel tellen
+            score_aggregates.apply_change(data["session"], effect.get("row_id"), data)
+            similar_index.add(data["session"], data["domain"], effect.get("row_id"), data["text"])
+
             st.toast("✅ Opgeslagen", icon="💾")
             return True
         except Exception as e:
@@ -185,8 +202,10 @@ def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
             return
         try:
             url = f"{BASE}?id=eq.{effect['row_id']}"
-            r = requests.delete(url, headers=headers(False), timeout=10)
+            r = database.request("DELETE", url, headers=headers(False), timeout=10)
             r.raise_for_status()
+            score_aggregates.apply_change(st.session_state.get("access_code", ""), effect["row_id"], None)
+            similar_index.remove(st.session_state.get("access_code", ""), domain, effect["row_id"])
             st.success("Verwijderd uit database.")
         except Exception as e:
             st.error(f"⚠️ Verwijderen mislukt: {e}")
@@ -194,7 +213,11 @@ def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
     # =======================================================
     #  RENDER FUNCTIE
     # =======================================================
+    @st.fragment
     def render_effect(effect, etype, idx):
+        """Eén effectkaart; een klik herlaadt alleen deze kaart, niet de hele pagina."""
+        if effect.get("mode") == "deleted":
+            return
         with st.container(border=True):
             if effect.get("mode") == "edit":
                 c1, c2 = st.columns([3, 1])
@@ -205,6 +228,14 @@ def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
                         key=f"{etype}_txt_{effect['id']}",
                         height=100,
                     )
+                    suggestions = similar_index.similar(
+                        st.session_state.access_code, domain, effect["text"], exclude=effect.get("row_id")
+                    )
+                    if suggestions:
+                        st.caption("Lijkt op wat al eerder is ingevuld in deze sessie:")
+                        for sug in suggestions:
+                            times = f" ({sug['count']}×)" if sug["count"] > 1 else ""
+                            st.caption(f"• {sug['text']}{times}")
                 with c2:
                     start_score = int(effect.get("score", SCORE_MIN))
                     start_score = max(SCORE_MIN, min(SCORE_MAX, start_score))
@@ -215,7 +246,7 @@ def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
                     if st.button("💾 Opslaan", key=f"{etype}_save_{effect['id']}", use_container_width=True):
                         if save_effect(effect):
                             effect["mode"] = "view"
-                            st.rerun()
+                            st.rerun(scope="fragment")
             else:
                 c1, c2, c3 = st.columns([6, 1, 1])
                 with c1:
@@ -225,14 +256,16 @@ def render_effect_page(*, domain: str, domain_index: int, next_domain: str):
                 with c2:
                     if st.button("✏️", key=f"{etype}_edit_{effect['id']}"):
                         effect["mode"] = "edit"
-                        st.rerun()
+                        st.rerun(scope="fragment")
                 with c3:
                     if st.button("🗑️", key=f"{etype}_del_{effect['id']}"):
                         delete_effect(effect)
+                        # Direct uit de lijst; de kaart zelf tekent bij de fragment-rerun niets meer
                         st.session_state[domain][etype] = [
                             e for e in st.session_state[domain][etype] if e["id"] != effect["id"]
                         ]
-                        st.rerun()
+                        effect["mode"] = "deleted"
+                        st.rerun(scope="fragment")
 
     # =======================================================
     #  UI
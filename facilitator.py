@@ -0,0 +1,37 @@
+# facilitator.py
+"""
+Toegang tot de facilitatorpagina's (pages/15 en pages/16).
+
+De toegangscode van een sessie kennen alle deelnemers; wie sessies afsluit,
+groepen indeelt, het stemmen opent of in alle sessies zoekt moet daarnaast de
+facilitatorcode invoeren. Die staat in st.secrets["facilitator_code"] (of in
+FACILITATOR_CODE in de omgeving). Zonder ingestelde code blijven deze pagina's dicht.
+"""
+import hmac
+import os
+
+import streamlit as st
+
+
+def _facilitator_code() -> str | None:
+    try:
+        return os.environ.get("FACILITATOR_CODE") or st.secrets.get("facilitator_code")
+    except Exception:  # geen secrets.toml
+        return None
+
+
+def require_facilitator() -> None:
+    """Vraag om de facilitatorcode en stop de pagina zolang die niet is ingevoerd."""
+    if st.session_state.get("facilitator"):
+        return
+    expected = _facilitator_code()
+    if not expected:
+        st.error("Facilitatortoegang is niet ingesteld (facilitator_code in de secrets).")
+        st.stop()
+    code_input = st.text_input("Facilitatorcode", type="password")
+    if code_input:
+        if hmac.compare_digest(code_input.encode("utf-8"), str(expected).encode("utf-8")):
+            st.session_state.facilitator = True
+            st.rerun()
+        st.error("Onjuiste facilitatorcode")
+    st.stop()
@@ -0,0 +1,113 @@
+# frames.py
+"""
+Compacte, getypeerde DataFrames uit Supabase-JSON.
+
+Zonder schema wordt elke tekstkolom een Python-object per cel en komen score en
+posneg binnen als int64 of object. Met veel sessies tegelijk in één proces
+bepaalt dat hoeveel werksessies een server aankan. Hier krijgt elke tabel:
+- categoricals voor kolommen met weinig verschillende waarden (sessie, domein, naam, groep);
+- int8/int16 voor scores, polariteit en stemmen (nullable als er lege waarden zijn);
+- een genormaliseerde naamkolom (name_norm) die één keer bij het laden wordt
+  berekend in plaats van bij elke rerun.
+De besparing per sessie wordt bijgehouden voor het facilitator-overzicht.
+"""
+import threading
+
+import pandas as pd
+import streamlit as st
+
+from aggregation import norm_text
+
+SCHEMAS = {
+    "submissions": {
+        "category": ["session", "domain", "name", "submission_id"],
+        "int": {"score": "int8", "posneg": "int8"},
+        "normalized": {"name_norm": "name"},
+    },
+    "effect_votes": {
+        "category": ["session", "group", "group_id", "domein"],
+        "int": {"votes": "int8", "posneg": "int8"},
+        "normalized": {},
+    },
+    "effect_groups": {
+        "category": ["session", "group", "domain"],
+        "int": {"posneg": "int8"},
+        "normalized": {},
+    },
+    "groups": {
+        "category": ["session", "name", "group"],
+        "int": {},
+        "normalized": {"name_norm": "name"},
+    },
+    "group_results": {
+        "category": ["session", "group", "group_id", "domein", "feedback_distance"],
+        "int": {"posneg": "int8", "feedback_start": "int16"},
+        "normalized": {},
+    },
+}
+
+# Genormaliseerde kolommen met weinig verschillende waarden worden ook categorical
+CATEGORY_NORMALIZED = {"name_norm"}
+
+
+@st.cache_resource
+def _savings_store() -> dict:
+    # (sessie, tabel) -> (bytes zonder schema, bytes met schema, rijen)
+    return {"lock": threading.Lock(), "tables": {}}
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def compact(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Pas het schema van `table` toe op een ruwe DataFrame (ontbrekende kolommen worden overgeslagen)."""
+    schema = SCHEMAS[table]
+    out = df.copy()
+    for col, source in schema["normalized"].items():
+        if source in out.columns and col not in out.columns:
+            out[col] = norm_text(out[source])
+            if col in CATEGORY_NORMALIZED:
+                out[col] = out[col].astype("category")
+    for col in schema["category"]:
+        if col in out.columns:
+            out[col] = out[col].astype("category")
+    for col, dtype in schema["int"].items():
+        if col not in out.columns:
+            continue
+        values = pd.to_numeric(out[col], errors="coerce")
+        # Nullable type (bijv. "Int8") alleen als er lege of niet-gehele waarden zijn
+        if values.notna().all() and (values == values.round()).all():
+            out[col] = values.astype(dtype)
+        else:
+            out[col] = values.round().astype(dtype.capitalize())
+    return out
+
+
+def to_frame(rows: list | None, table: str, *, session: str | None = None,
+             columns: list | None = None) -> pd.DataFrame:
+    """Supabase-rijen naar een compacte DataFrame; met `session` wordt de besparing geregistreerd."""
+    raw = pd.DataFrame(rows or [], columns=columns)
+    out = compact(raw, table)
+    if session is not None:
+        store = _savings_store()
+        with store["lock"]:
+            store["tables"][(str(session), table)] = (frame_bytes(raw), frame_bytes(out), len(out))
+    return out
+
+
+def savings() -> pd.DataFrame:
+    """Geheugen per sessie zonder en met schema (alleen tabellen die via to_frame geladen zijn)."""
+    store = _savings_store()
+    with store["lock"]:
+        items = list(store["tables"].items())
+    if not items:
+        return pd.DataFrame(columns=["sessie", "rijen", "MB zonder schema", "MB met schema", "bespaard %"])
+    df = pd.DataFrame(
+        [(session, rows, raw, compacted) for (session, _), (raw, compacted, rows) in items],
+        columns=["sessie", "rijen", "raw", "compact"],
+    ).groupby("sessie", as_index=False).sum()
+    df["MB zonder schema"] = (df["raw"] / 1e6).round(2)
+    df["MB met schema"] = (df["compact"] / 1e6).round(2)
+    df["bespaard %"] = (100 * (1 - df["compact"] / df["raw"].where(df["raw"] > 0))).round(0)
+    return df.drop(columns=["raw", "compact"]).sort_values("MB met schema", ascending=False)
@@ -0,0 +1,164 @@
+# group_assignment.py
+"""
+Automatische, gebalanceerde groepsindeling door de facilitator.
+
+Alle deelnemers van een sessie worden in één keer over `n_groups` groepen
+verdeeld (groottes verschillen hooguit één) en met één bulk-upsert naar `groups`
+geschreven. De indeling wordt daarna als snapshot per sessie in session_cache
+bewaard, zodat pages/10 en pages/11 haar niet per gebruiker opnieuw ophalen.
+"""
+import random
+import re
+
+import pandas as pd
+import requests
+
+import database
+import frames
+import session_cache
+from aggregation import normalize_name
+
+SNAPSHOT_KEY = "groups"
+SNAPSHOT_TTL = 15  # seconden; handmatige keuzes in andere processen worden zo opgepikt
+GROUP_COLUMNS = ["session", "name", "group"]
+
+
+def group_label(number: int) -> str:
+    """Zelfde label als de keuze op pages/10: 'Groep 3'."""
+    return f"Groep {number}"
+
+
+def fetch_n_groups(session: str, default: int = 1) -> int:
+    """Aantal groepen uit `meta` (zoals op pages/10), of `default`."""
+    rows = database.fetch_rows("meta", {"select": "n_groups", "session": f"eq.{session}"})
+    try:
+        return max(1, int(rows[0].get("n_groups") or default))
+    except (TypeError, ValueError, IndexError):
+        return default
+
+
+def _fetch_groups(session: str, *, strict: bool = False) -> pd.DataFrame:
+    rows = database.fetch_rows("groups", {"select": "session,name,group", "session": f"eq.{session}"})
+    if rows is None and strict:
+        raise RuntimeError("Kon de groepsindeling niet ophalen.")
+    return frames.to_frame(rows or [], "groups", session=session, columns=GROUP_COLUMNS)
+
+
+def groups_snapshot(session: str) -> pd.DataFrame:
+    """
+    Groepsindeling van een sessie (gedeeld object: niet in-place aanpassen).
+
+    Na de TTL komt de vorige indeling terug terwijl ze op de achtergrond ververst
+    wordt; RuntimeError als er nog geen indeling in de cache staat en ophalen mislukt.
+    """
+    return session_cache.get_or_load(session, SNAPSHOT_KEY, lambda: _fetch_groups(session, strict=True),
+                                     ttl=SNAPSHOT_TTL, shared=True, revalidate=True)
+
+
+def invalidate_snapshot(session: str) -> None:
+    session_cache.invalidate(session, SNAPSHOT_KEY)
+
+
+def registered_participants(session: str) -> list:
+    """
+    Iedereen die zich in de sessie heeft laten zien: namen uit `groups` en `submissions`.
+
+    Namen worden genormaliseerd vergeleken; de schrijfwijze uit `groups` gaat voor,
+    zodat de upsert op (session, name) de bestaande rij raakt.
+    """
+    names = {}
+    groups = _fetch_groups(session)
+    submissions = pd.DataFrame(
+        database.fetch_all("submissions", {"select": "name", "session": f"eq.{session}", "order": "id.asc"}),
+        columns=["name"],
+    )
+    for frame in (groups, submissions):
+        frame = frame.dropna(subset=["name"])
+        for name, norm in zip(frame["name"], normalize_name(frame["name"])):
+            if norm and norm not in names:
+                names[norm] = str(name).strip()
+    return sorted(names.values(), key=str.lower)
+
+
+def _parse_number(label) -> int | None:
+    """'Groep 3' / '3' / 3 -> 3 (zoals parse_group_number op pages/11)."""
+    if label is None or (isinstance(label, float) and pd.isna(label)):
+        return None
+    m = re.search(r"(\d+)", str(label))
+    return int(m.group(1)) if m else None
+
+
+def assign_groups(names: list, n_groups: int, *, existing: dict | None = None,
+                  seed: int | None = None) -> dict:
+    """
+    Verdeel `names` over groep 1..n_groups zodat de groottes hooguit één verschillen.
+
+    `existing` (naam -> groepslabel) wordt gerespecteerd zolang de groep nog niet vol
+    zit; wie niet past of nog geen groep heeft wordt willekeurig (reproduceerbaar
+    met `seed`) over de kleinste groepen verdeeld.
+    """
+    n_groups = max(1, int(n_groups))
+    # `extra` groepen krijgen één deelnemer meer; welke dat worden volgt uit het vullen
+    base, extra = divmod(len(names), n_groups)
+    members = {g: [] for g in range(1, n_groups + 1)}
+
+    existing_norm = {normalize_name(k): v for k, v in (existing or {}).items()}
+    rng = random.Random(seed)
+    order = list(names)
+    rng.shuffle(order)
+
+    def full(g: int) -> bool:
+        size = len(members[g])
+        if size < base:
+            return False
+        # Een groep van `base` mag nog groeien zolang er grote groepen over zijn
+        large = sum(1 for m in members.values() if len(m) > base)
+        return size > base or large >= extra
+
+    unplaced = []
+    for name in order:
+        wanted = _parse_number(existing_norm.get(normalize_name(name)))
+        if wanted in members and not full(wanted):
+            members[wanted].append(name)
+        else:
+            unplaced.append(name)
+    for name in unplaced:
+        g = min((g for g in members if not full(g)), key=lambda g: (len(members[g]), g))
+        members[g].append(name)
+
+    return {name: group_label(g) for g, group in members.items() for name in group}
+
+
+def save_assignment(session: str, assignment: dict, *, timeout: int = database.DEFAULT_TIMEOUT) -> bool:
+    """Schrijf de hele indeling in één request (upsert op session,name) en ververs de snapshot."""
+    payload = [{"session": session, "name": name, "group": label} for name, label in assignment.items()]
+    if not payload:
+        return True
+    try:
+        r = database.request("POST",
+            database.table_url("groups"),
+            headers=database.headers("resolution=merge-duplicates,return=minimal", json_body=True),
+            params={"on_conflict": "session,name"},
+            json=payload,
+            timeout=timeout,
+        )
+    except requests.RequestException:
+        return False
+    if r.status_code not in (200, 201, 204):
+        return False
+    snapshot = frames.to_frame(payload, "groups", session=session, columns=GROUP_COLUMNS)
+    invalidate_snapshot(session)
+    session_cache.get_or_load(session, SNAPSHOT_KEY, lambda: snapshot, ttl=SNAPSHOT_TTL, shared=True)
+    return True
+
+
+def assign_session(session: str, n_groups: int, *, keep_existing: bool = True,
+                   seed: int | None = None) -> dict | None:
+    """Deel alle deelnemers van een sessie in en sla op; None als opslaan mislukt."""
+    names = registered_participants(session)
+    existing = {}
+    if keep_existing:
+        current = _fetch_groups(session).dropna(subset=["name"])
+        existing = dict(zip(current["name"], current["group"]))
+    assignment = assign_groups(names, n_groups, existing=existing, seed=seed)
+    return assignment if save_assignment(session, assignment) else None
@@ -0,0 +1,82 @@
+# group_feedback.py
+"""
+Groepsfeedback uit pages/12 en pages/13 opslaan in `group_results`.
+
+Alle feedbackrijen van een groep gaan in één request naar PostgREST. Eén
+bulk-insert is één statement en dus één transactie: óf alle rijen staan
+erin, óf geen enkele. De conflictsleutel is het effectgroep-id
+(session, group, group_id) in plaats van de vrije tekst, zodat opnieuw
+versturen de bestaande rijen bijwerkt, ook als de tekst van het
+representatieve effect intussen anders is.
+De UNIQUE-index op (session, "group", group_id) staat in migrations/0003_effect_groups.sql.
+"""
+import pandas as pd
+import requests
+
+import database
+
+CONFLICT_KEY = "session,group,group_id"
+
+# Achtervoegsel van de widget-key in feedback_ui -> kolom in group_results
+ANSWER_FIELDS = {
+    "q1": "feedback_group_impact",
+    "q2": "feedback_place_impact",
+    "q_reikwijdte": "feedback_distance",
+    "q3": "feedback_improvements",
+    "q_start_year": "feedback_start",
+}
+ANSWER_DEFAULTS = {"feedback_start": 0}
+
+
+def feedback_rows(session: str, group_name: str, sections: list, answers) -> list:
+    """
+    Rijen voor `group_results` uit de toplijsten en de ingevulde antwoorden.
+
+    `sections` is een lijst (label, DataFrame) zoals op de pagina's ("Pos", top_pos);
+    `answers` is st.session_state (keys '<label>_<index>_<vraag>').
+    """
+    rows = []
+    for label, df in sections:
+        for idx, row in df.iterrows():
+            posneg = row.get("posneg_resolved")
+            group_id = row.get("group_id")
+            record = {
+                "session": session,
+                "group": group_name,
+                "group_id": None if pd.isna(group_id) else str(group_id),
+                "text": row["text"],
+                "domein": row.get("domein", ""),
+                "posneg": None if pd.isna(posneg) else int(posneg),
+            }
+            for suffix, column in ANSWER_FIELDS.items():
+                record[column] = answers.get(f"{label}_{idx}_{suffix}", ANSWER_DEFAULTS.get(column, ""))
+            rows.append(record)
+    return rows
+
+
+def save_feedback(rows: list, *, timeout: float = 15) -> tuple:
+    """
+    Alles-of-niets upsert van de feedback van één groep.
+
+    Geeft (True, None) als de database alle rijen heeft bevestigd, anders
+    (False, foutmelding); bij een fout is er niets opgeslagen.
+    """
+    if not rows:
+        return True, None
+    missing = [row["text"] for row in rows if row["group_id"] is None]
+    if missing:
+        return False, f"Effectgroep-id ontbreekt voor: {', '.join(map(str, missing))}"
+    try:
+        r = database.request(
+            "POST",
+            database.table_url("group_results"),
+            headers=database.headers("resolution=merge-duplicates,return=minimal", json_body=True),
+            params={"on_conflict": CONFLICT_KEY},
+            json=rows,
+            timeout=timeout,
+        )
+    except requests.RequestException as e:
+        return False, f"Geen verbinding met de database ({type(e).__name__})."
+    if r.status_code not in (200, 201, 204):
+        return False, f"{r.status_code} {r.text}"
+    return True, None
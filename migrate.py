@@ -0,0 +1,163 @@
+# migrate.py
+"""
+Geversioneerde schemamigraties (migrations/NNNN_naam.sql) voor Postgres en SQLite.
+
+    python migrate.py status werksessie.db                 # toegepast / nog te doen
+    python migrate.py sqlite werksessie.db                 # lokale SQLite-database bijwerken
+    python migrate.py postgres postgresql://...            # direct op Postgres (pakket psycopg)
+    python migrate.py print postgres > upgrade.sql         # SQL voor de Supabase SQL-editor
+
+Elke migratie draait in één transactie en wordt vastgelegd in schema_migrations;
+een migratie wordt dus nooit twee keer toegepast. In een migratiebestand gelden
+blokken na "-- [postgres]" of "-- [sqlite]" alleen voor dat dialect en blokken na
+"-- [alle]" (en alles vóór de eerste markering) voor beide.
+"""
+import argparse
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+DIALECTS = ("postgres", "sqlite")
+_MARKER = re.compile(r"^--\s*\[(postgres|sqlite|alle)\]\s*$")
+
+TRACKING_TABLE = (
+    "create table if not exists schema_migrations "
+    "(version text primary key, name text not null, applied_at text not null)"
+)
+
+
+def migrations(directory=MIGRATIONS_DIR) -> list:
+    """(versie, naam, pad) van alle migraties, oplopend."""
+    found = []
+    for path in sorted(Path(directory).glob("[0-9][0-9][0-9][0-9]_*.sql")):
+        version, name = path.stem.split("_", 1)
+        found.append((version, name, path))
+    return found
+
+
+def statements(path, dialect: str) -> list:
+    """De SQL-statements van één migratie voor `dialect`, zonder commentaar."""
+    if dialect not in DIALECTS:
+        raise ValueError(f"Onbekend dialect: {dialect}")
+    current, lines = "alle", []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        marker = _MARKER.match(line.strip())
+        if marker:
+            current = marker.group(1)
+            continue
+        if current in ("alle", dialect) and not line.lstrip().startswith("--"):
+            lines.append(line)
+    # Statements eindigen met ';' aan het eind van een regel
+    return [s.strip() for s in re.split(r";\s*$", "\n".join(lines), flags=re.M) if s.strip()]
+
+
+def pending(applied: set, directory=MIGRATIONS_DIR) -> list:
+    return [m for m in migrations(directory) if m[0] not in applied]
+
+
+# =======================
+# SQLite
+# =======================
+def applied_sqlite(conn: sqlite3.Connection) -> set:
+    conn.execute(TRACKING_TABLE)
+    return {row[0] for row in conn.execute("select version from schema_migrations")}
+
+
+def migrate_sqlite(db_path, *, directory=MIGRATIONS_DIR, until: str | None = None) -> list:
+    """Pas alle openstaande migraties (t/m versie `until`) toe op een SQLite-bestand."""
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        done = []
+        for version, name, path in pending(applied_sqlite(conn), directory):
+            if until is not None and version > until:
+                break
+            conn.execute("begin")
+            try:
+                for sql in statements(path, "sqlite"):
+                    conn.execute(sql)
+                conn.execute(
+                    "insert into schema_migrations values (?, ?, strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))",
+                    (version, name),
+                )
+                conn.execute("commit")
+            except Exception:
+                conn.execute("rollback")
+                raise
+            done.append(f"{version}_{name}")
+        return done
+    finally:
+        conn.close()
+
+
+# =======================
+# Postgres
+# =======================
+def migrate_postgres(url: str, *, directory=MIGRATIONS_DIR) -> list:
+    """Pas alle openstaande migraties toe op Postgres (bijv. de database van Supabase)."""
+    import psycopg  # alleen nodig voor deze route; de SQL-editor werkt ook met `print`
+
+    done = []
+    with psycopg.connect(url) as conn:
+        conn.execute(TRACKING_TABLE)
+        conn.commit()
+        applied = {row[0] for row in conn.execute("select version from schema_migrations")}
+        for version, name, path in pending(applied, directory):
+            with conn.transaction():
+                for sql in statements(path, "postgres"):
+                    conn.execute(sql)
+                conn.execute(
+                    "insert into schema_migrations values (%s, %s, now()::text)", (version, name)
+                )
+            done.append(f"{version}_{name}")
+    return done
+
+
+def render_script(dialect: str, *, directory=MIGRATIONS_DIR) -> str:
+    """Alle migraties als één script; elke migratie in een eigen transactie en alleen als ze nog niet is toegepast."""
+    parts = [TRACKING_TABLE + ";"]
+    for version, name, path in migrations(directory):
+        body = ";\n".join(statements(path, dialect)) + ";"
+        if dialect == "postgres":
+            parts.append(
+                f"-- {version}_{name}\n"
+                f"do $migration$ begin\n"
+                f"if not exists (select 1 from schema_migrations where version = '{version}') then\n"
+                f"{body}\n"
+                f"insert into schema_migrations values ('{version}', '{name}', now()::text);\n"
+                f"end if;\n"
+                f"end $migration$;"
+            )
+        else:
+            # SQLite kent geen voorwaardelijke blokken: gebruik `migrate.py sqlite` voor het bijhouden
+            parts.append(f"-- {version}_{name}\nbegin;\n{body}\ncommit;")
+    return "\n\n".join(parts) + "\n"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Schemamigraties voor Postgres en SQLite.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="toegepaste en openstaande migraties (SQLite)").add_argument("db")
+    sub.add_parser("sqlite", help="SQLite-database bijwerken").add_argument("db")
+    sub.add_parser("postgres", help="Postgres bijwerken (psycopg)").add_argument("url")
+    sub.add_parser("print", help="SQL-script naar stdout").add_argument("dialect", choices=DIALECTS)
+    args = parser.parse_args(argv)
+
+    if args.command == "print":
+        sys.stdout.write(render_script(args.dialect))
+        return 0
+    if args.command == "status":
+        conn = sqlite3.connect(args.db)
+        applied = applied_sqlite(conn)
+        conn.close()
+        for version, name, _ in migrations():
+            print(f"  {'✓' if version in applied else '·'} {version}_{name}")
+        return 0
+    done = migrate_sqlite(args.db) if args.command == "sqlite" else migrate_postgres(args.url)
+    print("Toegepast: " + (", ".join(done) if done else "niets, schema is actueel"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
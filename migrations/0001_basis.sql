@@ -0,0 +1,132 @@
+-- 0001 Basisschema: de tabellen zoals de app ze gebruikt.
+-- Bestaande tabellen blijven ongemoeid (if not exists).
+-- Blokken na "-- [postgres]" of "-- [sqlite]" gelden alleen voor dat dialect,
+-- na "-- [alle]" weer voor beide.
+
+-- [postgres]
+create table if not exists session_meta (
+    access_code text primary key,
+    description text,
+    info text,
+    link text,
+    prov text,
+    n_effects integer,
+    n_groups integer,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists meta (
+    id bigint generated by default as identity primary key,
+    session text not null,
+    n_groups integer
+);
+
+create table if not exists submissions (
+    id bigint generated by default as identity primary key,
+    session text not null,
+    submission_id text,
+    name text,
+    domain text,
+    text text,
+    score smallint,
+    posneg smallint,
+    timestamp timestamptz not null default now()
+);
+
+create table if not exists effect_votes (
+    id bigint generated by default as identity primary key,
+    session text not null,
+    "group" text,
+    group_id text,
+    votes smallint not null default 0,
+    text text,
+    domein text,
+    posneg smallint,
+    last_updated timestamptz not null default now()
+);
+
+create table if not exists groups (
+    id bigint generated by default as identity primary key,
+    session text not null,
+    name text not null,
+    "group" text
+);
+
+create table if not exists group_results (
+    id bigint generated by default as identity primary key,
+    session text not null,
+    "group" text,
+    group_id text,
+    text text,
+    domein text,
+    posneg smallint,
+    feedback_group_impact text,
+    feedback_place_impact text,
+    feedback_distance text,
+    feedback_improvements text,
+    feedback_start smallint
+);
+
+-- [sqlite]
+create table if not exists session_meta (
+    access_code text primary key,
+    description text,
+    info text,
+    link text,
+    prov text,
+    n_effects integer,
+    n_groups integer,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+create table if not exists meta (
+    id integer primary key autoincrement,
+    session text not null,
+    n_groups integer
+);
+
+create table if not exists submissions (
+    id integer primary key autoincrement,
+    session text not null,
+    submission_id text,
+    name text,
+    domain text,
+    text text,
+    score integer,
+    posneg integer,
+    timestamp text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+create table if not exists effect_votes (
+    id integer primary key autoincrement,
+    session text not null,
+    "group" text,
+    group_id text,
+    votes integer not null default 0,
+    text text,
+    domein text,
+    posneg integer,
+    last_updated text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+create table if not exists groups (
+    id integer primary key autoincrement,
+    session text not null,
+    name text not null,
+    "group" text
+);
+
+create table if not exists group_results (
+    id integer primary key autoincrement,
+    session text not null,
+    "group" text,
+    group_id text,
+    text text,
+    domein text,
+    posneg integer,
+    feedback_group_impact text,
+    feedback_place_impact text,
+    feedback_distance text,
+    feedback_improvements text,
+    feedback_start integer
+);
@@ -0,0 +1,32 @@
+-- 0002 Indexen voor de querypatronen van de pagina's, en de UNIQUE-constraint
+-- op groups(session, name) waar de upsert van pages/10 en group_assignment.py op rust.
+
+-- similar_index.py en effect_page.py: effecten per (sessie, domein)
+create index if not exists submissions_session_domain_idx on submissions (session, domain);
+-- effect_page.py: dubbele inzending controleren en bewerken
+create index if not exists submissions_submission_domain_text_idx on submissions (submission_id, domain, text);
+-- pages/9, pages/11 en change_feed.py: nieuwste inzendingen van een sessie
+create index if not exists submissions_session_timestamp_idx on submissions (session, timestamp desc);
+
+-- ranking.py: stemmen van een groep via een prefix op group_id ('<sessie>_<groep>_%')
+-- [postgres]
+create index if not exists effect_votes_session_group_id_idx on effect_votes (session, group_id text_pattern_ops);
+-- [sqlite]
+create index if not exists effect_votes_session_group_id_idx on effect_votes (session, group_id);
+-- [alle]
+-- ranking.votes_version en change_feed.py: laatste stem van een sessie
+create index if not exists effect_votes_session_last_updated_idx on effect_votes (session, last_updated desc);
+
+-- pages/10 en group_assignment.fetch_n_groups
+create index if not exists meta_session_idx on meta (session);
+-- batch_report.py en archive.py: sessies in een datumrange
+create index if not exists session_meta_created_at_idx on session_meta (created_at);
+
+-- groups: één rij per deelnemer per sessie; bij dubbelen blijft de nieuwste staan
+-- [postgres]
+delete from groups a using groups b
+    where a.session = b.session and a.name = b.name and a.id < b.id;
+-- [sqlite]
+delete from groups where id not in (select max(id) from groups group by session, name);
+-- [alle]
+create unique index if not exists groups_session_name_key on groups (session, name);
@@ -0,0 +1,39 @@
+-- 0003 Canonieke effectgroepen (effect_groups.py) en de conflictsleutel van de
+-- groepsfeedback (group_feedback.py): één rij per effectgroep per groep.
+
+-- [postgres]
+create table if not exists effect_groups (
+    id text primary key,
+    session text not null,
+    "group" text,
+    domain text,
+    text text,
+    posneg smallint,
+    authors jsonb not null default '[]'::jsonb
+);
+-- [sqlite]
+create table if not exists effect_groups (
+    id text primary key,
+    session text not null,
+    "group" text,
+    domain text,
+    text text,
+    posneg integer,
+    authors text not null default '[]'
+);
+-- [alle]
+create index if not exists effect_groups_session_idx on effect_groups (session);
+
+-- [postgres]
+delete from group_results a using group_results b
+    where a.session = b.session and a."group" = b."group" and a.group_id = b.group_id and a.id < b.id;
+-- [sqlite]
+-- Zoals in Postgres ("=" is nooit waar voor NULL): rijen zonder groep of group_id blijven staan
+delete from group_results where "group" is not null and group_id is not null and id not in (
+    select max(id) from group_results
+    where "group" is not null and group_id is not null
+    group by session, "group", group_id
+);
+-- [alle]
+create unique index if not exists group_results_session_group_group_id_key
+    on group_results (session, "group", group_id);
@@ -0,0 +1,35 @@
+-- 0004 Archief in de database (archive.py): een verliesvrije kopie van elke
+-- gearchiveerde rij en de status per sessie, gedeeld door alle replica's.
+
+-- [postgres]
+create table if not exists archived_rows (
+    source text not null,
+    id text not null,
+    session text not null,
+    data jsonb not null,
+    archived_at timestamptz not null default now(),
+    primary key (source, id)
+);
+create table if not exists archived_sessions (
+    session text primary key,
+    status text not null,
+    rows jsonb not null default '{}'::jsonb,
+    archived_at timestamptz
+);
+-- [sqlite]
+create table if not exists archived_rows (
+    source text not null,
+    id text not null,
+    session text not null,
+    data text not null,
+    archived_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+    primary key (source, id)
+);
+create table if not exists archived_sessions (
+    session text primary key,
+    status text not null,
+    rows text not null default '{}',
+    archived_at text
+);
+-- [alle]
+create index if not exists archived_rows_session_idx on archived_rows (session);
@@ -0,0 +1,10 @@
+-- 0005 Generatie van de effectgroepen (effect_groups.open_voting): alle rijen van
+-- één keer "Stemmen openen" krijgen hetzelfde tijdstip; lezers houden alleen de
+-- nieuwste generatie en het opruimen van oude rijen filtert op dat tijdstip.
+
+-- [postgres]
+alter table effect_groups add column if not exists opened_at timestamptz;
+-- [sqlite]
+alter table effect_groups add column opened_at text;
+-- [alle]
+create index if not exists effect_groups_session_opened_at_idx on effect_groups (session, opened_at);
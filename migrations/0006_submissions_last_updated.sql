@@ -0,0 +1,27 @@
+-- 0006 Laatste wijziging per inzending (score_aggregates.server_version): het
+-- aantal rijen plus de laatste last_updated van een sessie verandert bij elke
+-- opslag, wijziging of verwijdering, ook als die uit een andere replica komt.
+-- De server zet de kolom zelf, zodat klokverschillen tussen replica's niet uitmaken.
+
+-- [postgres]
+alter table submissions add column if not exists last_updated timestamptz;
+update submissions set last_updated = timestamp where last_updated is null;
+alter table submissions alter column last_updated set default now();
+alter table submissions alter column last_updated set not null;
+create or replace function submissions_touch_last_updated() returns trigger language plpgsql as $$
+begin new.last_updated := now(); return new; end
+$$;
+drop trigger if exists submissions_touch_last_updated on submissions;
+create trigger submissions_touch_last_updated before update on submissions
+    for each row execute function submissions_touch_last_updated();
+-- [sqlite]
+alter table submissions add column last_updated text;
+update submissions set last_updated = timestamp where last_updated is null;
+create trigger if not exists submissions_insert_last_updated after insert on submissions
+    when new.last_updated is null
+    begin update submissions set last_updated = strftime('%Y-%m-%dT%H:%M:%fZ', 'now') where id = new.id; end;
+create trigger if not exists submissions_touch_last_updated after update of session, name, domain, text, score, posneg
+    on submissions
+    begin update submissions set last_updated = strftime('%Y-%m-%dT%H:%M:%fZ', 'now') where id = new.id; end;
+-- [alle]
+create index if not exists submissions_session_last_updated_idx on submissions (session, last_updated desc);
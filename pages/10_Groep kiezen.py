@@ -1,5 +1,9 @@
 import streamlit as st
-import requests
+import pandas as pd
+
+import database
+import group_assignment
+from aggregation import normalize_name
 
 st.set_page_config(page_title="Kies je groep", layout="wide")
 st.title("👥 Kies je groep")
@@ -15,7 +19,7 @@ display_name = st.session_state.name
 # --- Aantal groepen ophalen uit meta ---
 def fetch_n_groups():
     try:
-        r = requests.get(
+        r = database.request("GET",
             f"{st.secrets['supabase_url']}/rest/v1/meta?select=n_groups&session=eq.{session_code}",
             headers={
                 "apikey": st.secrets["supabase_key"],
@@ -35,10 +39,20 @@ st.info(f"Deze sessie heeft **{n_groups}** groep(en).")
 # --- Keuze UI ---
 group_options = [f"Groep {i}" for i in range(1, n_groups + 1)]
 
+# Als de facilitator al heeft ingedeeld staat die groep vooraf geselecteerd
+try:
+    groups_df = group_assignment.groups_snapshot(session_code)
+except RuntimeError:
+    groups_df = pd.DataFrame(columns=["name", "group", "name_norm"])  # geen voorselectie; kiezen kan nog
+assigned = groups_df.loc[groups_df["name_norm"] == normalize_name(display_name), "group"]
+assigned_label = str(assigned.iloc[0]) if not assigned.empty else None
+if assigned_label in group_options:
+    st.success(f"Je bent ingedeeld in **{assigned_label}**. Klik op doorgaan, of kies een andere groep.")
+
 chosen = st.radio(
     "Kies jouw groep:",
     options=group_options,
-    index=None,        # geen vooraf geselecteerde groep
+    index=group_options.index(assigned_label) if assigned_label in group_options else None,
     horizontal=True,
 )
 
@@ -56,12 +70,9 @@ def upsert_group_choice(session_code: str, username: str, group_name: str) -> bo
     """
     Upsert into 'groups' so that if (session, name) already exists,
     the 'group' column is overwritten with the new value.
-    Requires a UNIQUE constraint on (session, name) in the 'groups' table.
+    Relies on the UNIQUE index groups_session_name_key (migrations/0002_indexen.sql).
     """
-    url_base = f"{st.secrets['supabase_url']}/rest/v1/groups"
-    # Upsert via PostgREST: on_conflict + Prefer: resolution=merge-duplicates
-    url = f"{url_base}?on_conflict=session,name"
-
+    url = f"{st.secrets['supabase_url']}/rest/v1/groups?on_conflict=session,name"
     payload = {
         "session": session_code,
         "name": username,
@@ -75,24 +86,10 @@ def upsert_group_choice(session_code: str, username: str, group_name: str) -> bo
     }
 
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=10)
-        if resp.status_code in (200, 201):
-            return True
-
-        # Optional fallback if UNIQUE (session,name) isn’t set: do an update instead
-        if resp.status_code == 409:
-            patch_url = f"{url_base}?session=eq.{session_code}&name=eq.{username}"
-            patch_headers = {
-                "apikey": st.secrets["supabase_key"],
-                "Authorization": f"Bearer {st.secrets['supabase_key']}",
-                "Content-Type": "application/json",
-                "Prefer": "return=representation",
-            }
-            patch_resp = requests.patch(patch_url, headers=patch_headers, json={"group": group_name}, timeout=10)
-            return patch_resp.status_code in (200, 204)
+        resp = database.request("POST", url, headers=headers, json=payload, timeout=10)
+        return resp.status_code in (200, 201)
     except Exception:
-        pass
-    return False
+        return False
 
 # --- Doorgaan ---
 if st.button("➡️ Doorgaan"):
@@ -103,6 +100,7 @@ if st.button("➡️ Doorgaan"):
         st.session_state["selected_group"] = group_num
 
         ok = upsert_group_choice(session_code, display_name, chosen)  # schrijft naar 'groups'
+        group_assignment.invalidate_snapshot(session_code)
         if not ok:
             st.warning("Kon je keuze niet opslaan in de database. Probeer het later nog eens.")
         else:
@@ -1,12 +1,17 @@
 import streamlit as st
 import pandas as pd
-import requests
 from datetime import datetime
 import uuid
-import difflib
 import random
-import re
-from collections import Counter
+
+import database
+import effect_groups
+import frames
+from aggregation import normalize_name, vote_sums
+from effect_groups import parse_group_number
+from group_assignment import SNAPSHOT_KEY as GROUPS_KEY, groups_snapshot
+from ranking import invalidate_group_ranking
+from session_cache import data_badge, session_cached
 
 # =======================
 # Configuratie
@@ -41,141 +46,52 @@ HEADERS = {
 }
 
 # =======================
-# Helpers
-# =======================
-def parse_group_number(g) -> int | None:
-    """Parseert groep-nummer uit int/float/'3'/'Groep 3'/etc."""
-    if g is None or (isinstance(g, float) and pd.isna(g)):
-        return None
-    if isinstance(g, int):
-        return g
-    if isinstance(g, float):
-        return int(g)
-    s = str(g)
-    m = re.search(r"(\d+)", s)
-    return int(m.group(1)) if m else None
-
-def normalize_name(s: str) -> str:
-    """Case-insensitive naam-normalisatie met spaties gecondenseerd."""
-    if not isinstance(s, str):
-        return ""
-    s = s.strip().lower()
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-def slugify(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = re.sub(r"[^a-z0-9]+", "-", s)
-    return s.strip("-")
-
-def majority_posneg(series: pd.Series) -> int:
-    """Return majority van {-1, 1}; bij tie/geen waarden -> 0."""
-    if series is None or len(series) == 0:
-        return 0
-    vals = []
-    for v in series.tolist():
-        if pd.isna(v) or str(v).strip() == "":
-            continue
-        try:
-            vv = int(float(v))
-            if vv in (-1, 1):
-                vals.append(vv)
-            elif vv == 0:
-                vals.append(0)
-        except Exception:
-            continue
-    if not vals:
-        return 0
-    cnt = Counter(vals)
-    mc = cnt.most_common()
-    if len(mc) >= 2 and mc[0][1] == mc[1][1]:
-        return 0
-    return mc[0][0] if mc[0][0] in (-1, 0, 1) else 0
-
-def group_similar_effects(df_local, similarity_threshold=0.6):
-    """Groepeer vergelijkbare 'text' waarden binnen hetzelfde domein."""
-    grouped = []
-    used_indices = set()
-    for i, row_i in df_local.iterrows():
-        if i in used_indices:
-            continue
-        group = [i]
-        text_i = str(row_i.get("text", "")).lower()
-        for j, row_j in df_local.iterrows():
-            if j <= i or j in used_indices:
-                continue
-            text_j = str(row_j.get("text", "")).lower()
-            similarity = difflib.SequenceMatcher(None, text_i, text_j).ratio()
-            if similarity >= similarity_threshold:
-                group.append(j)
-                used_indices.add(j)
-        grouped.append(group)
-    return grouped
-
-def norm_text(s: str) -> str:
-    """Normaliseer tekst om robuuster te matchen tussen tables."""
-    if not isinstance(s, str):
-        return ""
-    return re.sub(r"\s+", " ", s.strip().lower())
-
-# =======================
-# Data ophalen (cached)
+# Data ophalen (cached per sessie, zie session_cache.py)
 # =======================
-@st.cache_data(ttl=15)
-def fetch_submissions():
-    url = (
-        f"{st.secrets['supabase_url']}/rest/v1/submissions"
-        f"?select=*&order=timestamp.desc&limit=1000&session=eq.{SESSION}"
-    )
-    r = requests.get(url, headers=HEADERS, timeout=15)
-    if r.status_code != 200:
-        return pd.DataFrame()
-    data = r.json()
-    if not data:
-        return pd.DataFrame()
-    return pd.DataFrame(data)
-
-@st.cache_data(ttl=15)
-def fetch_votes():
+@session_cached(ttl=15, shared=True, revalidate=True)
+def fetch_votes(session):
     url = (
         f"{st.secrets['supabase_url']}/rest/v1/effect_votes"
-        f"?select=*&session=eq.{SESSION}"
-    )
-    r = requests.get(url, headers=HEADERS, timeout=15)
-    if r.status_code != 200:
-        return pd.DataFrame(columns=["group_id", "votes"])
-    data = r.json()
-    return pd.DataFrame(data) if data else pd.DataFrame(columns=["group_id", "votes"])
-
-@st.cache_data(ttl=15)
-def fetch_groups_for_session():
-    url = (
-        f"{st.secrets['supabase_url']}/rest/v1/groups"
-        f"?select=session,name,group&session=eq.{SESSION}"
+        f"?select=group_id,votes,last_updated&session=eq.{session}"
     )
-    r = requests.get(url, headers=HEADERS, timeout=15)
+    r = database.request("GET", url, headers=HEADERS, timeout=15)
     if r.status_code != 200:
-        return pd.DataFrame(columns=["session", "name", "group"])
+        # Niet als lege stemmen cachen: dan blijft de laatst goede stand staan
+        raise RuntimeError(f"Kon de stemmen niet ophalen: {r.status_code}")
     data = r.json()
-    return pd.DataFrame(data) if data else pd.DataFrame(columns=["session", "name", "group"])
+    return frames.to_frame(data, "effect_votes", session=session, columns=None if data else ["group_id", "votes"])
 
 # =======================
 # Ophalen + GROEP VIA NAAM (uit groups)
 # =======================
-df_submissions_all = fetch_submissions()
-df = df_submissions_all.drop_duplicates(subset=["name", "domain", "score", "text"]) if not df_submissions_all.empty else pd.DataFrame()
-if df.empty:
-    st.info("Nog geen inzendingen.")
+# Groepsindeling, effectgroepen en stemmen zijn onafhankelijk: tegelijk ophalen,
+# zodat de pagina op de traagste query wacht in plaats van op de som. Verlopen data
+# komt meteen uit de cache (ververst op de achtergrond); alleen een lege cache wacht,
+# en hooguit RENDER_BUDGET seconden: wat dan nog loopt komt in de cache voor de volgende keer.
+fetched, fetch_errors = database.fetch_concurrently({
+    "groups": lambda: groups_snapshot(SESSION),
+    "effects": lambda: effect_groups.load(SESSION),
+    "votes": lambda: fetch_votes(SESSION),
+}, deadline=database.RENDER_BUDGET)
+if "effects" in fetch_errors or "groups" in fetch_errors:
+    if any(isinstance(fetch_errors.get(k), TimeoutError) for k in ("effects", "groups")):
+        st.info("⏳ De database is traag; de effectgroepen worden nog geladen.")
+    else:
+        st.error("Kon de effectgroepen of de groepsindeling niet ophalen. Probeer het zo nog eens.")
+    if st.button("🔄 Opnieuw proberen"):
+        st.rerun()
     st.stop()
+if "votes" in fetch_errors:
+    st.warning("Kon de stemmen niet ophalen; de tellingen kunnen achterlopen.")
 
-groups_df = fetch_groups_for_session()
+# Eén snapshot van de groepsindeling per sessie (zie group_assignment.py);
+# kopie omdat de cache het object met andere gebruikers van deze sessie deelt
+groups_df = fetched["groups"].copy()
 if groups_df.empty:
     st.error("Geen groepsindeling gevonden. Vraag de organisator om je in een groep te plaatsen.")
     st.stop()
 
-# Normaliseer namen voor matching
-df["name_norm"] = df["name"].apply(normalize_name)
-groups_df["name_norm"] = groups_df["name"].apply(normalize_name)
+# Genormaliseerde namen voor matching komen al mee uit frames.to_frame
 current_user_norm = normalize_name(USERNAME)
 
 # Bepaal groepnummer en label van de huidige gebruiker (uit groups)
@@ -193,104 +109,59 @@ selected_group = str(selected_group_num)
 # Originele label zoals in de tabel (bijv. 'Groep 3'); valt terug op 'Groep X' als None
 selected_group_label = str(my_row.iloc[0]["group"]) if "group" in my_row.columns else f"Groep {selected_group}"
 
-# Groepsleden bepalen aan de hand van dezelfde group_number
-group_members_norm = groups_df.loc[
-    groups_df["group_number"] == selected_group_num, "name_norm"
-].dropna().unique().tolist()
-
-# Filter inzendingen op groepsleden
-df_group = df[df["name_norm"].isin(group_members_norm)].copy()
+# Effectgroepen van jouw groep: één keer geclusterd toen de facilitator het stemmen opende
+cluster_groups = effect_groups.for_group(fetched["effects"], SESSION, selected_group)
+if not cluster_groups:
+    st.info("⏳ Het stemmen is nog niet geopend voor jouw groep. Wacht tot de facilitator het stemmen opent.")
+    if st.button("🔄 Opnieuw kijken"):
+        st.rerun()
+    st.stop()
 
 st.info(
     f"Je stemt binnen **{selected_group_label}** "
     f"(nr. {selected_group}). "
-    f"Aantal groepsleden met inzendingen: {df_group['name_norm'].nunique()} "
-    f"(inzendingen: {len(df_group)})"
+    f"Effecten om op te stemmen: {len(cluster_groups)}"
 )
-
-if df_group.empty:
-    st.warning("Er zijn nog geen inzendingen van mensen in jouw groep.")
-    st.stop()
-
-vote_data = fetch_votes()
+data_badge(SESSION, GROUPS_KEY, effect_groups.CACHE_KEY, fetch_votes.cache_key())
 
 # =======================
-# Polariteit per tekst uit submissions (van jouw groep)
+# Stemindex (één keer per versie van de stemdata)
 # =======================
-text_posneg_map = {}
-if {"text", "posneg"}.issubset(df_group.columns):
-    tmp = df_group.copy()
-    tmp["text_norm"] = tmp["text"].map(norm_text)
-    sub_agg = (
-        tmp.groupby("text_norm", dropna=False)["posneg"]
-        .apply(majority_posneg)
-        .reset_index(name="posneg_majority")
-    )
-    text_posneg_map = {
-        r["text_norm"]: int(r["posneg_majority"]) if pd.notna(r["posneg_majority"]) else 0
-        for _, r in sub_agg.iterrows() if r["text_norm"] != ""
-    }
+def load_vote_index(vote_data: pd.DataFrame) -> dict:
+    """
+    group_id -> stemsom, opgebouwd met één groupby per versie van de stemdata.
+
+    Na een eigen stem wordt de index in het geheugen bijgewerkt (zie register_vote);
+    pas als de opgehaalde stemdata echt verandert wordt hij opnieuw opgebouwd.
+    """
+    latest = None
+    if not vote_data.empty and "last_updated" in vote_data.columns:
+        latest = vote_data["last_updated"].max()
+    version = (SESSION, len(vote_data), latest)
+
+    state = st.session_state.get("vote_index")
+    if state is None or state["version"] != version:
+        state = {"version": version, "index": vote_sums(vote_data).to_dict()}
+        st.session_state["vote_index"] = state
+    return state["index"]
+
+if "votes" in fetch_errors and "vote_index" in st.session_state:
+    vote_index = st.session_state["vote_index"]["index"]  # laatst bekende stand houden
+else:
+    vote_index = load_vote_index(fetched.get("votes", pd.DataFrame(columns=["group_id", "votes"])))
 
-# =======================
-# Effectgroepen bouwen
-# =======================
-effect_groups = []
-domains = sorted([d for d in df_group["domain"].dropna().unique().tolist() if str(d).strip() != ""])
-
-for dom in domains:
-    df_dom = df_group[df_group["domain"] == dom].copy()
-    if df_dom.empty:
-        continue
-
-    if "posneg" not in df_dom.columns:
-        df_dom["posneg"] = 0
-
-    grouped_indices = group_similar_effects(df_dom, similarity_threshold=0.6)
-
-    for idx, group in enumerate(grouped_indices):
-        rows = df_dom.loc[group]
-        texts = [str(t) for t in rows["text"].tolist() if str(t).strip() != ""]
-        authors = rows["name"].dropna().unique().tolist()
-
-        merged_text = " / ".join(texts) if texts else "(geen tekst)"
-        group_id = f"{SESSION}_{selected_group}_{slugify(str(dom))}_{idx}"
-
-        # votes ophalen
-        total_votes = 0
-        if not vote_data.empty:
-            try:
-                total_votes = int(vote_data[vote_data["group_id"] == group_id]["votes"].sum())
-            except Exception:
-                total_votes = 0
-
-        # posneg majority over component-teksten in deze groep
-        text_norms = [norm_text(t) for t in texts]
-        component_posnegs = [text_posneg_map.get(tn, 0) for tn in text_norms if tn != ""]
-        posneg_val = majority_posneg(pd.Series(component_posnegs, dtype="float"))
-        posneg_val = int(posneg_val) if pd.notna(posneg_val) else 0
-
-        effect_groups.append({
-            "text": merged_text,
-            "group_id": group_id,
-            "votes": total_votes,
-            "authors": authors,
-            "domain": dom,
-            "posneg": posneg_val,  # -1/0/1
-        })
+# votes uit de index (O(1) per effectgroep)
+effects = [
+    {**e, "votes": int(vote_index.get(e["group_id"], 0))} for e in cluster_groups
+]
 
 # =======================
-# Stemmen registreren (incl. posneg én group)
+# Stemmen registreren (alleen id en groep)
 # =======================
-def register_vote(group_id, value, text, domein, posneg):
-    # clamp posneg naar {-1,0,1}
+def register_vote(group_id, value):
+    # Tekst, domein en polariteit staan in effect_groups; de stem verwijst alleen naar het id
     try:
-        p = int(posneg)
-        posneg_clean = p if p in (-1, 0, 1) else 0
-    except Exception:
-        posneg_clean = 0
-
-    try:
-        r = requests.post(
+        r = database.request("POST",
             f"{st.secrets['supabase_url']}/rest/v1/effect_votes",
             headers={**HEADERS, "Content-Type": "application/json", "Prefer": "return=representation"},
             json={
@@ -298,9 +169,6 @@ def register_vote(group_id, value, text, domein, posneg):
                 "group": selected_group_label,          # ✅ voeg groep toe aan kolom 'group'
                 "group_id": group_id,
                 "votes": int(value),
-                "text": text,
-                "domein": domein,
-                "posneg": posneg_clean,                 # ✅ stuur posneg mee
                 "last_updated": datetime.utcnow().isoformat(timespec="seconds") + "Z",
             },
             timeout=15,
@@ -313,33 +181,43 @@ def register_vote(group_id, value, text, domein, posneg):
         return
 
     st.session_state.voted_ids.add(group_id)
+    # Index bijwerken in plaats van opnieuw ophalen
+    vote_index[group_id] = vote_index.get(group_id, 0) + int(value)
+    # Ranglijst van de groep (pages 12/13) is nu verouderd
+    invalidate_group_ranking(SESSION, selected_group)
 
+@st.fragment
 def vote_buttons(effect):
+    """Stemknoppen van één effect; een stem herlaadt alleen dit fragment."""
     # Niet op eigen effect stemmen
-    if normalize_name(st.session_state.name) in [normalize_name(a) for a in effect.get("authors", [])]:
+    if current_user_norm in effect["authors_norm"]:
         st.info("Je kunt niet stemmen op je eigen effect.")
         return
 
     # Niet dubbel stemmen
     if effect["group_id"] in st.session_state.voted_ids:
-        st.caption("✅ Stem geregistreerd voor dit effect.")
+        st.caption(
+            "✅ Stem geregistreerd voor dit effect. "
+            f"Nog over: ➕ {MAX_UPVOTES - st.session_state.upvotes_used} "
+            f"/ ➖ {MAX_DOWNVOTES - st.session_state.downvotes_used}"
+        )
         return
 
     vote_cols = st.columns(2)
     with vote_cols[0]:
         if st.button("➕", key=f"plus_{effect['group_id']}"):
             if st.session_state.upvotes_used < MAX_UPVOTES:
-                register_vote(effect["group_id"], +1, effect["text"], effect["domain"], effect.get("posneg", 0))
+                register_vote(effect["group_id"], +1)
                 st.session_state.upvotes_used += 1
-                st.rerun()
+                st.rerun(scope="fragment")
             else:
                 st.warning("Max upvotes bereikt.")
     with vote_cols[1]:
         if st.button("➖", key=f"minus_{effect['group_id']}"):
             if st.session_state.downvotes_used < MAX_DOWNVOTES:
-                register_vote(effect["group_id"], -1, effect["text"], effect["domain"], effect.get("posneg", 0))
+                register_vote(effect["group_id"], -1)
                 st.session_state.downvotes_used += 1
-                st.rerun()
+                st.rerun(scope="fragment")
             else:
                 st.warning("Max downvotes bereikt.")
 
@@ -355,9 +233,9 @@ st.markdown(f"Je stemt binnen **{selected_group_label}** (nr. {selected_group}).
 
 # Shuffle + filter (niet op eigen/zijn al gestemd)
 effect_groups_shuffled = [
-    e for e in effect_groups
+    e for e in effects
     if e["group_id"] not in st.session_state.voted_ids
-    and normalize_name(st.session_state.name) not in [normalize_name(a) for a in e.get("authors", [])]
+    and current_user_norm not in e["authors_norm"]
 ]
 random.shuffle(effect_groups_shuffled)
 
@@ -1,18 +1,16 @@
 import streamlit as st
-import pandas as pd
-import requests
-import plotly.graph_objects as go
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
-from io import BytesIO
-from docx import Document
-from docx.shared import Inches
-import tempfile
-import os
-from datetime import date
-import statistics
 from pathlib import Path
 import nltk
+import pandas as pd
+
+import archive
+import database
+import frames
+import report_builder
+import score_aggregates
+import session_cache
+import snapshots
+from session_cache import session_cached
 
 # --- Page setup ---
 st.set_page_config(page_title="Genereer Rapport", layout="wide")
@@ -60,216 +58,112 @@ if "group_answers_submitted" not in st.session_state or not st.session_state["gr
     st.stop()
 
 # --- Data loading ---
-@st.cache_data(ttl=30)
-def load_data():
-    headers = {
-        "apikey": st.secrets["supabase_key"],
-        "Authorization": f"Bearer {st.secrets['supabase_key']}"
-    }
-
-    r_sub = requests.get(f"{st.secrets['supabase_url']}/rest/v1/submissions?select=*", headers=headers)
-    df_sub = pd.DataFrame(r_sub.json()) if r_sub.status_code == 200 else pd.DataFrame()
-
-    r_group = requests.get(f"{st.secrets['supabase_url']}/rest/v1/group_results?select=*", headers=headers)
-    df_group = pd.DataFrame(r_group.json()) if r_group.status_code == 200 else pd.DataFrame()
-
-    return df_sub, df_group
-
-df_sub, df_group = load_data()
-df_sub = df_sub[df_sub["session"] == st.session_state.access_code]
-df_group = df_group[df_group["session"] == st.session_state.access_code]
+@session_cached(ttl=30, shared=True, revalidate=True)
+def load_data(session):
+    def load(table):
+        rows = database.fetch_rows(table, {"select": "*", "session": f"eq.{session}"})
+        if rows is None:
+            raise RuntimeError(f"Kon {table} niet ophalen.")
+        return frames.to_frame(rows, table, session=session)
+
+    # Beide tabellen tegelijk: de wachttijd is die van de traagste, niet de som
+    fetched, errors = database.fetch_concurrently({
+        "submissions": lambda: load("submissions"),
+        "group_results": lambda: load("group_results"),
+    })
+    if errors:
+        # Niet cachen; bij de volgende bezoeker opnieuw proberen
+        raise RuntimeError("; ".join(str(e) for e in errors.values()))
+    return fetched["submissions"], fetched["group_results"]
+
+# Gearchiveerde sessie (archive.py): eerst de lokale snapshot uit het archief maken
+try:
+    archive.ensure_snapshot(st.session_state.access_code)
+except RuntimeError as e:
+    st.error(f"Kon de gearchiveerde sessie niet laden: {e}")
+    st.stop()
+closed = snapshots.is_closed(st.session_state.access_code)
+if closed:
+    # Afgesloten sessie: memory-mapped snapshot, geen netwerk
+    df_sub = snapshots.load_frame(st.session_state.access_code, "submissions")
+    df_group = snapshots.load_frame(st.session_state.access_code, "group_results")
+    snapshots.restore_aggregates(st.session_state.access_code)
+else:
+    # Verlopen data komt meteen uit de cache en wordt op de achtergrond ververst;
+    # bij een lege cache wachten we hooguit RENDER_BUDGET seconden
+    fetched, errors = database.fetch_concurrently(
+        {"data": lambda: load_data(st.session_state.access_code)}, deadline=database.RENDER_BUDGET,
+    )
+    if errors:
+        if isinstance(errors["data"], TimeoutError):
+            st.info("⏳ De database is traag; de sessiedata wordt nog geladen.")
+        else:
+            st.error(f"Kon de sessiedata niet ophalen: {errors['data']}")
+        if st.button("🔄 Opnieuw proberen"):
+            st.rerun()
+        st.stop()
+    df_sub, df_group = fetched["data"]
+    session_cache.data_badge(st.session_state.access_code, load_data.cache_key())
+# Kopieën: de cache deelt deze frames met andere deelnemers van dezelfde sessie
+df_sub, df_group = df_sub.copy(), df_group.copy()
 
 if df_sub.empty or df_group.empty:
     st.warning("Niet genoeg data om een rapport te maken.")
     st.stop()
 
-# --- Stats ---
-n_participants = df_sub["name"].nunique()
-n_groups = df_group["group"].nunique()
-
-# --- Domains ---
-domains = [
-    "Welzijn", "Materiële welvaart", "Gezondheid", "Arbeid en vrije tijd",
-    "Wonen", "Sociaal", "Veiligheid", "Milieu"
-]
-
-# Signed score (posneg ∈ {1,-1})
-df_sub["signed_score"] = df_sub["score"] * df_sub["posneg"]
-grouped = df_sub.groupby("domain")["signed_score"].mean().reindex(domains, fill_value=0).tolist()
-
-# --- Chart helpers ---
-def create_spider_chart(data):
-    fig = go.Figure()
-    fig.add_trace(go.Barpolar(
-        r=[abs(v) for v in data],
-        theta=domains,
-        marker_color=["blue" if v >= 0 else "orange" for v in data],
-        opacity=0.85
-    ))
-    fig.update_layout(polar=dict(radialaxis=dict(visible=True)), showlegend=False, margin=dict(l=0, r=0, t=0, b=0))
-    return fig
-
-def save_plotly_chart(fig):
-    """
-    Try exporting with Plotly (kaleido). If that fails (e.g., kaleido missing),
-    fall back to a simple matplotlib bar chart so the DOCX still gets an image.
-    """
-    img = BytesIO()
-    try:
-        fig.write_image(img, format="png")
-        img.seek(0)
-        return img
-    except Exception:
-        # Fallback: matplotlib horizontal bar of signed scores
-        plt.figure(figsize=(7, 4))
-        vals = grouped  # use already computed list
-        y = range(len(domains))
-        colors = ["tab:blue" if v >= 0 else "tab:orange" for v in vals]
-        plt.barh(list(domains), vals, alpha=0.85, color=colors)
-        plt.axvline(0, linewidth=1)
-        plt.tight_layout()
-        plt.savefig(img, format="png")
-        plt.close()
-        img.seek(0)
-        return img
-
-# --- Wordcloud (uses Dutch stopwords) ---
-def generate_wordcloud(text):
-    wc = WordCloud(
-        width=800,
-        height=400,
-        background_color="white",
-        stopwords=dutch_stopwords
-    ).generate(text)
-    buf = BytesIO()
-    plt.figure(figsize=(10, 5))
-    plt.imshow(wc, interpolation="bilinear")
-    plt.axis("off")
-    plt.tight_layout()
-    plt.savefig(buf, format="png")
-    plt.close()
-    buf.seek(0)
-    return buf
-
-# --- Utilities ---
-def safe_int(val):
-    try:
-        return int(val)
-    except (ValueError, TypeError):
-        return None
-
-def format_stats(values):
-    if not values:
-        return "geen data"
-    return f"min: {min(values)} jaar, max: {max(values)} jaar, gemiddeld: {round(statistics.mean(values), 1)} jaar"
-
-# --- Init document ---
-doc = Document()
-doc.add_heading(f"Verslag werksessie – {st.session_state.get('description', '–')}", 0)
-doc.add_paragraph(f"Datum: {date.today().strftime('%d-%m-%Y')}")
-doc.add_paragraph(f"Thema: {st.session_state.get('description', '–')}")
-doc.add_paragraph(f"Informatie: {st.session_state.get('info', '–')}")
-doc.add_paragraph(f"Aantal deelnemers: {n_participants}")
-doc.add_paragraph(f"Aantal groepen: {n_groups}")
-doc.add_page_break()
-
-# --- Scores section ---
-doc.add_heading("1. Gemiddelde scores per domein", level=1)
-doc.add_paragraph("In onderstaande grafiek zie je hoe positief of negatief elk domein is beoordeeld door de deelnemers. Blauwe balken zijn positief, oranje negatief.")
-doc.add_picture(save_plotly_chart(create_spider_chart(grouped)), width=Inches(6))
-doc.add_page_break()
-
-# --- Top effects ---
-# Note: your 'votes' were derived by counting same text; adjust as needed
-df_group["votes"] = df_group.groupby("text")["text"].transform("count")
-# If you have a 'posneg' in group_results, you can use it; else these two lines treat 'votes' as popularity only.
-df_pos = df_group.sort_values("votes", ascending=False)
-df_neg = pd.DataFrame(columns=df_group.columns)  # placeholder if you don't track negatives separately
-
-doc.add_heading("2. Hoogst gewaardeerde effecten", level=1)
-top_n = max(1, n_groups * 3)
-for label, group_df in [("Positief", df_pos), ("Negatief", df_neg)]:
-    doc.add_heading(f"{label} – meest genoemde effecten", level=2)
-    for _, row in group_df.head(top_n).iterrows():
-        doc.add_paragraph(f"• {row['text']} ({row['votes']} stemmen)")
-doc.add_page_break()
-
-# --- Summary ---
-pos_groups, neg_groups = [], []
-pos_places, neg_places = [], []
-pos_reach, neg_reach = [], []
-
-pos_start_vals = [safe_int(r.get("feedback_start")) for r in df_group.to_dict(orient="records")]
-neg_start_vals = []  # only if you differentiate negatives
-
-pos_start_vals = [v for v in pos_start_vals if v is not None]
-neg_start_vals = [v for v in neg_start_vals if v is not None]
-
-doc.add_heading("3. Samenvatting wie waar wanneer", level=1)
-doc.add_paragraph("Hier zie je hoe de positieve en negatieve effecten geconcentreerd zijn bij groepen, plekken of in de tijd")
-
-doc.add_heading("Positieve effecten", level=2)
-doc.add_paragraph(f"• Groepen: {', '.join(filter(None, pos_groups))}")
-doc.add_paragraph(f"• Plaatsen: {', '.join(filter(None, pos_places))}")
-doc.add_paragraph(f"• Reikwijdte: {', '.join(filter(None, pos_reach))}")
-doc.add_paragraph(f"• Verwachte start effect: {format_stats(pos_start_vals)}")
-
-doc.add_heading("Negatieve effecten", level=2)
-doc.add_paragraph(f"• Groepen: {', '.join(filter(None, neg_groups))}")
-doc.add_paragraph(f"• Plaatsen: {', '.join(filter(None, neg_places))}")
-doc.add_paragraph(f"• Reikwijdte: {', '.join(filter(None, neg_reach))}")
-doc.add_paragraph(f"• Verwachte start effect: {format_stats(neg_start_vals)}")
-doc.add_page_break()
-
-# --- Details per effect ---
-doc.add_heading("4. Groepsfeedback voor de belangrijkste effecten", level=1)
-for label, group_df in [("Positief", df_pos), ("Negatief", df_neg)]:
-    doc.add_heading(f"{label}e effecten", level=2)
-    for _, row in group_df.iterrows():
-        doc.add_heading(f"Effect: {row['text']}", level=3)
-        doc.add_paragraph(f"Groep: {row.get('group', '–')}")
-        doc.add_paragraph(f"- Groepsimpact: {row.get('feedback_group_impact', '')}")
-        doc.add_paragraph(f"- Plaatsimpact: {row.get('feedback_place_impact', '')}")
-        doc.add_paragraph(f"- Reikwijdte: {row.get('feedback_distance', '')}")
-        doc.add_paragraph(f"- Verbeteringen: {row.get('feedback_improvements', '')}")
-
-        if label == "Positief":
-            pos_groups.append(row.get('feedback_group_impact', ''))
-            pos_places.append(row.get('feedback_place_impact', ''))
-            pos_reach.append(row.get('feedback_distance', ''))
-        else:
-            neg_groups.append(row.get('feedback_group_impact', ''))
-            neg_places.append(row.get('feedback_place_impact', ''))
-            neg_reach.append(row.get('feedback_distance', ''))
-
-# --- Theme analysis (with Dutch stopwords in wordcloud) ---
-doc.add_heading("5. Thema-analyse", level=1)
-for domain in domains:
-    doc.add_heading(domain, level=2)
-    domain_df = df_sub[df_sub["domain"] == domain]
-    doc.add_paragraph(f"Aantal stemmen in dit domein: {len(domain_df)}")
-
-    text = " ".join(domain_df["text"].astype(str)).strip()
-    if text:
-        wc_img = generate_wordcloud(text)
-        doc.add_picture(wc_img, width=Inches(5.5))
-    else:
-        doc.add_paragraph("⚠️ Geen tekst beschikbaar voor dit domein.")
-
-# --- Save & download ---
-with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp_file:
-    tmp_path = tmp_file.name
-    doc.save(tmp_path)
-
-with open(tmp_path, "rb") as f:
-    st.download_button(
-        label="📄 Download rapport als Word-bestand",
-        data=f.read(),
-        file_name="groepsrapport.docx",
-        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+# Signed score (posneg ∈ {1,-1}) per domain, from the running aggregates
+# (seed_session ontdubbelt zelf, net als pages/9, en vult opnieuw als de versie op de server verandert)
+score_aggregates.seed_session(st.session_state.access_code, df_sub)
+grouped = score_aggregates.domain_means(st.session_state.access_code, report_builder.DOMAINS)
+
+# --- Report model: built once per version of the data, rendered per format on demand ---
+# Het model en de gerenderde bestanden hangen aan dezelfde versie van de frames, zodat
+# een rapport nooit uit een oudere versie van de data komt dan de versie in de key.
+report_version = int(
+    pd.util.hash_pandas_object(df_sub.astype(str), index=False).sum()
+    ^ pd.util.hash_pandas_object(df_group.astype(str), index=False).sum()
+)
+report_ttl = None if closed else 30  # een afgesloten sessie verandert niet meer
+report = session_cache.get_or_load(
+    st.session_state.access_code,
+    ("report", report_version),
+    lambda: report_builder.build_report(
+        df_sub,
+        df_group,
+        description=st.session_state.get("description", "–"),
+        info=st.session_state.get("info", "–"),
+        stopwords=dutch_stopwords,
+        domain_scores=grouped,
+    ),
+    ttl=report_ttl,
+)
+# Het model zelf bevat nog niet gerenderde figuren (niet te pickelen); de gerenderde
+# bestanden wel: die worden per versie van de data met de andere replica's gedeeld.
+
+session = st.session_state.access_code  # de download draait later buiten deze run
+
+
+def render_download(fmt: str):
+    # Renderen vult de PNG's en bestanden in het model zelf: daarna opnieuw meten voor het budget
+    return session_cache.download(
+        session, ("render", fmt, report_version), lambda: report_builder.render(report, fmt),
+        ttl=report_ttl, shared=True, grows=("report", report_version),
     )
 
-try:
-    os.remove(tmp_path)
-except PermissionError:
-    st.warning("Het bestand kon niet worden verwijderd – mogelijk nog in gebruik.")
+# --- Download (each format is only rendered when its button is clicked) ---
+labels = {
+    "docx": "📄 Download rapport als Word-bestand",
+    "pdf": "📕 Download rapport als PDF",
+    "html": "🌐 Download rapport als webpagina",
+}
+cols = st.columns(len(labels))
+for col, (fmt, label) in zip(cols, labels.items()):
+    file_name, mime = report_builder.FORMATS[fmt]
+    with col:
+        st.download_button(
+            label=label,
+            data=render_download(fmt),
+            file_name=file_name,
+            mime=mime,
+            key=f"download_{fmt}",
+        )
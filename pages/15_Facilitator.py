@@ -0,0 +1,219 @@
+import streamlit as st
+import pandas as pd
+
+import change_feed
+import database
+import effect_groups
+import facilitator
+import frames
+import group_assignment
+import ranking
+import score_aggregates
+import session_cache
+import shared_cache
+import similar_index
+import snapshots
+
+st.set_page_config(page_title="Live overzicht", layout="wide")
+st.title("📺 Live overzicht van de werksessie")
+
+# --- Basischecks ---
+if "access_code" not in st.session_state:
+    st.error("Sessiecode ontbreekt. Ga terug naar de startpagina.")
+    st.stop()
+facilitator.require_facilitator()
+
+session_code = st.session_state.access_code
+st.caption(
+    f"Sessie: **{st.session_state.get('description', session_code)}** • "
+    f"ververst elke {change_feed.POLL_INTERVAL} seconden zonder de pagina te herladen"
+)
+
+ordered_domains = [
+    "Materiële welvaart", "Gezondheid", "Arbeid en vrije tijd", "Wonen",
+    "Sociaal", "Veiligheid", "Milieu", "Welzijn",
+]
+
+
+# =======================
+# Live paneel (alleen dit fragment draait periodiek opnieuw)
+# =======================
+@st.fragment(run_every=change_feed.POLL_INTERVAL)
+def live_panel():
+    state = change_feed.poll(session_code)
+    totals = state["totals"]
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Deelnemers", len({n for names in state["participants"].values() for n in names}))
+    c2.metric("Inzendingen", totals.get("submissions", 0))
+    c3.metric("Stemmen", totals.get("effect_votes", 0))
+    c4.metric("Groepen met feedback", len(state["feedback_groups"]))
+
+    col_left, col_right = st.columns(2)
+    with col_left:
+        st.subheader("Deelnemers per domein")
+        per_domain = pd.Series(
+            {d: len(state["participants"].get(d, ())) for d in ordered_domains},
+            name="deelnemers",
+        )
+        st.bar_chart(per_domain, horizontal=True)
+
+        st.subheader("Inzendingen per minuut")
+        if state["per_minute"]:
+            per_minute = pd.Series(state["per_minute"], name="inzendingen").sort_index().tail(30)
+            per_minute.index = pd.to_datetime(per_minute.index)
+            st.bar_chart(per_minute)
+        else:
+            st.caption("Nog geen inzendingen.")
+
+    with col_right:
+        st.subheader("Groepskeuze")
+        choices = pd.Series(state["group_choice"], dtype=object)
+        if choices.empty:
+            st.caption("Nog niemand heeft een groep gekozen.")
+        else:
+            st.bar_chart(choices.value_counts().sort_index().rename("deelnemers"))
+
+        st.subheader("Stemmen per groep")
+        if state["votes_per_group"]:
+            st.bar_chart(pd.Series(state["votes_per_group"], name="stemmen").sort_index())
+        else:
+            st.caption("Nog geen stemmen.")
+
+        missing = change_feed.missing_feedback(state)
+        if missing:
+            st.warning("Nog geen groepsfeedback van: " + ", ".join(missing))
+        elif state["group_choice"]:
+            st.success("Alle groepen hebben hun feedback ingestuurd.")
+
+    with st.expander("Laatste activiteit"):
+        for ts, text in list(state["events"])[:15]:
+            st.text(f"{ts}  {text}")
+        if state["errors"]:
+            st.caption(f"Mislukte polls sinds start: {state['errors']}")
+
+
+live_panel()
+
+# =======================
+# Groepen automatisch indelen
+# =======================
+with st.expander("👥 Groepen automatisch indelen"):
+    st.caption(
+        "Verdeelt alle deelnemers van deze sessie (met een groepskeuze of een inzending) "
+        "evenwichtig over de groepen en slaat de indeling in één keer op."
+    )
+    c1, c2, c3 = st.columns(3)
+    n_groups = c1.number_input(
+        "Aantal groepen", min_value=1, max_value=50,
+        value=group_assignment.fetch_n_groups(session_code, default=int(st.session_state.get("n_groups", 1))),
+    )
+    seed = c2.number_input("Seed (voor een herhaalbare indeling)", min_value=0, value=0, step=1)
+    keep_existing = c3.checkbox("Bestaande keuzes behouden", value=True)
+    if st.button("Groepen indelen"):
+        assignment = group_assignment.assign_session(
+            session_code, int(n_groups), keep_existing=keep_existing, seed=int(seed)
+        )
+        if assignment is None:
+            st.error("Kon de groepsindeling niet opslaan. Probeer het later nog eens.")
+        elif not assignment:
+            st.info("Nog geen deelnemers gevonden om in te delen.")
+        else:
+            st.success(f"{len(assignment)} deelnemers ingedeeld in {int(n_groups)} groepen.")
+            st.dataframe(
+                pd.Series(assignment, name="groep").rename_axis("naam").reset_index().sort_values(["groep", "naam"]),
+                hide_index=True,
+            )
+
+# =======================
+# Stemmen openen
+# =======================
+with st.expander("🗳️ Stemmen openen"):
+    st.caption(
+        "Clustert de inzendingen van elke groep één keer tot effectgroepen en slaat die op. "
+        "Deelnemers stemmen daarna op deze vaste lijst (pagina Stemmen). Open het stemmen "
+        "pas als de groepsindeling klaar is en alle deelnemers hun effecten hebben ingevuld."
+    )
+    try:
+        opened = effect_groups.load(session_code)
+    except RuntimeError:
+        opened = None
+    if opened is not None and not opened.empty:
+        st.info(f"Het stemmen is open: {len(opened)} effectgroepen in {opened['group'].nunique()} groepen.")
+        st.caption("Opnieuw openen clustert opnieuw. Effectgroepen die niet veranderen houden hun stemmen; "
+                   "stemmen op effectgroepen die door nieuwe inzendingen veranderen tellen niet meer mee.")
+    if st.button("Stemmen opnieuw openen" if opened is not None and not opened.empty else "Stemmen openen"):
+        with st.spinner("Effectgroepen maken..."):
+            try:
+                rows = effect_groups.open_voting(session_code)
+            except RuntimeError as e:
+                st.error(f"Stemmen openen mislukt: {e}")
+            else:
+                ranking.invalidate_session_rankings(session_code)
+                if not rows:
+                    st.info("Nog geen inzendingen van ingedeelde deelnemers gevonden.")
+                else:
+                    st.success(f"{len(rows)} effectgroepen opgeslagen; het stemmen is open.")
+                    st.dataframe(
+                        pd.DataFrame(rows).groupby("group").size().rename("effectgroepen").reset_index(),
+                        hide_index=True,
+                    )
+
+# =======================
+# Sessie afsluiten
+# =======================
+with st.expander("🔒 Sessie afsluiten"):
+    closed = snapshots.manifest(session_code)
+    if closed:
+        st.success(
+            f"Deze sessie is afgesloten op {closed['closed_at']}; resultaten en rapport "
+            f"worden uit de lokale snapshot gelezen ({sum(closed['rows'].values())} rijen)."
+        )
+    st.caption(
+        "Legt alle data van deze sessie vast in een lokale snapshot. De resultaten- en "
+        "rapportpagina lezen daarna niet meer uit de database. Doe dit pas als iedereen klaar is."
+    )
+    confirm = st.checkbox("Iedereen is klaar; de data van deze sessie verandert niet meer")
+    if st.button("Sessie afsluiten" if not closed else "Snapshot opnieuw maken", disabled=not confirm):
+        try:
+            info = snapshots.close_session(session_code)
+        except RuntimeError as e:
+            st.error(f"Afsluiten mislukt: {e}")
+        else:
+            st.success(f"Snapshot gemaakt: {info['rows']}")
+
+# =======================
+# Cachegeheugen van dit proces
+# =======================
+with st.expander("🧠 Cachegeheugen (alle sessies in dit proces)"):
+    sizes = session_cache.usage()
+    st.caption(
+        f"In gebruik: {session_cache.total_bytes() / 1e6:.1f} MB van "
+        f"{session_cache.CACHE_BUDGET_BYTES / 1e6:.0f} MB"
+    )
+    if sizes:
+        st.dataframe(
+            pd.DataFrame({"sessie": list(sizes), "MB": [round(b / 1e6, 2) for b in sizes.values()]}),
+            hide_index=True,
+        )
+    saved = frames.savings()
+    if not saved.empty:
+        st.caption("Geheugenbesparing door compacte, getypeerde tabellen (frames.py):")
+        st.dataframe(saved, hide_index=True)
+    shared = shared_cache.stats()
+    st.caption("Gedeelde cache tussen replica's (shared_cache.py): "
+               + ", ".join(f"{k}: {v}" for k, v in shared.items()))
+    breaker = database.breaker_state()
+    st.caption(f"Circuit breaker naar Supabase: {breaker['state']} ({breaker['failures']} fouten op rij"
+               + (f", nieuwe poging over {breaker['retry_in']:.0f} s)" if breaker["state"] == "open" else ")"))
+    if st.button("Cache van deze sessie vrijgeven"):
+        session_cache.invalidate(session_code, shared=False)
+        # De kleinere stores buiten het budget (zie session_cache.py) ook
+        ranking.invalidate_session_rankings(session_code)
+        score_aggregates.invalidate_session(session_code)
+        similar_index.forget(session_code)
+        change_feed.forget(session_code)
+        st.success("Cache van deze sessie is vrijgegeven.")
+    if shared_cache.enabled() and st.button("Sessie in alle replica's opnieuw laden"):
+        session_cache.invalidate(session_code)
+        st.success("Gedeelde cache van deze sessie is ongeldig gemaakt.")
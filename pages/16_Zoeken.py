@@ -0,0 +1,80 @@
+import time
+
+import streamlit as st
+
+import facilitator
+import search_index
+
+st.set_page_config(page_title="Zoeken in effecten", layout="wide")
+st.title("🔎 Zoeken in effecten van alle sessies")
+
+# --- Basischecks ---
+if "access_code" not in st.session_state:
+    st.error("Sessiecode ontbreekt. Ga terug naar de startpagina.")
+    st.stop()
+facilitator.require_facilitator()
+
+EXPORT_DIR = "export"
+POLARITY = {"Alle": None, "Positief": 1, "Negatief": -1}
+
+st.caption(
+    "Zoekt in de teksten van inzendingen en in de groepsfeedback van alle geëxporteerde sessies. "
+    "Woorden worden gestemd ('woningen' vindt ook 'woning'); alle woorden moeten voorkomen."
+)
+
+# =======================
+# Index
+# =======================
+with st.expander("🗂️ Zoekindex"):
+    if st.button("Index bijwerken"):
+        with st.spinner("Nieuwe sessies indexeren..."):
+            try:
+                done = search_index.build(EXPORT_DIR)
+            except Exception as e:
+                st.error(f"Bijwerken mislukt: {e}")
+            else:
+                st.success(f"{len(done)} sessies (her)geïndexeerd." if done else "Index is actueel.")
+
+index = search_index.cached_index(EXPORT_DIR)
+docs = index["docs"]
+if docs.empty:
+    st.info(f"De zoekindex is leeg. Exporteer eerst sessies naar `{EXPORT_DIR}/` en werk de index bij.")
+    st.stop()
+st.caption(f"{len(docs):,} documenten uit {docs['session'].nunique()} sessies".replace(",", "."))
+
+# =======================
+# Zoekvraag en filters
+# =======================
+query = st.text_input("Zoekwoorden", placeholder="bijv. parkeerdruk centrum")
+c1, c2, c3, c4 = st.columns(4)
+prov = c1.multiselect("Provincie", sorted(docs["prov"].cat.categories))
+domain = c2.multiselect("Domein", sorted(c for c in docs["domain"].cat.categories if c))
+polarity = c3.selectbox("Polariteit", list(POLARITY))
+source = c4.multiselect("Bron", list(search_index.SOURCES.values()))
+
+if not query.strip():
+    st.stop()
+
+start = time.perf_counter()
+found, total = search_index.search(
+    index, query, prov=prov, domain=domain, posneg=POLARITY[polarity], source=source, limit=500,
+)
+elapsed = (time.perf_counter() - start) * 1000
+
+st.write(f"**{total}** resultaten ({elapsed:.0f} ms)" + (f", de nieuwste {len(found)} getoond" if total > len(found) else ""))
+if found.empty:
+    st.stop()
+
+st.dataframe(
+    # Geen toegangscodes tonen: die zijn het wachtwoord van een sessie
+    found.assign(
+        sessie=search_index.session_label(found),
+        posneg=found["posneg"].map({1: "➕", -1: "➖"}).fillna(""),
+    )[["sessie", "prov", "source", "domain", "posneg", "text", "feedback"]],
+    column_config={
+        "sessie": "Sessie", "prov": "Provincie", "source": "Bron",
+        "domain": "Domein", "posneg": "", "text": "Effect", "feedback": "Feedback",
+    },
+    hide_index=True,
+    use_container_width=True,
+)
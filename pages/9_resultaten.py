@@ -7,6 +7,12 @@ import plotly.graph_objects as go
 from collections import defaultdict
 import uuid
 from nltk.corpus import stopwords
+
+import archive
+import database
+import score_aggregates
+import snapshots
+from session_cache import data_badge, session_cached
 #--- stopwords setup ---
 
 import os
@@ -95,20 +101,18 @@ HEADERS = {
 }
 
 def fetch_supabase_json(path: str, params: dict | None = None, *, timeout: int = 12):
-    """GET {BASE_URL}{path} with standard headers; ensure JSON back or stop with a helpful error."""
+    """GET {BASE_URL}{path} with standard headers; ensure JSON back or raise RuntimeError with a helpful message."""
     try:
-        r = requests.get(f"{BASE_URL}{path}", headers=HEADERS, params=params, timeout=timeout)
+        r = database.request("GET", f"{BASE_URL}{path}", headers=HEADERS, params=params, timeout=timeout)
     except requests.RequestException as e:
-        st.error(f"Kon geen verbinding maken met Supabase ({e.__class__.__name__}).")
-        st.stop()
+        raise RuntimeError(f"Kon geen verbinding maken met Supabase ({e.__class__.__name__}).") from e
 
     if r.status_code != 200:
         # show a concise server message to help debugging
         msg = r.text.strip()
         if len(msg) > 500:
             msg = msg[:500] + "..."
-        st.error(f"Supabase gaf {r.status_code} terug.\n\n{msg}")
-        st.stop()
+        raise RuntimeError(f"Supabase gaf {r.status_code} terug.\n\n{msg}")
 
     # Must be JSON
     try:
@@ -118,50 +122,92 @@ def fetch_supabase_json(path: str, params: dict | None = None, *, timeout: int =
         snippet = r.text.strip()
         if len(snippet) > 500:
             snippet = snippet[:500] + "..."
-        st.error("Onverwacht antwoord: geen geldige JSON van Supabase.\n\n"
-                 f"Content-Type: {r.headers.get('Content-Type')}\n\n"
-                 f"Body (eerste 500 chars):\n{snippet}")
-        st.stop()
-
-# Use params instead of hand-assembling the query string
-data = fetch_supabase_json(
-    "/rest/v1/submissions",
-    params={
-        "select": "*",
-        "order": "timestamp.desc",
-        "limit": 1000,
-        # You already filter later, but you can pre-filter here too:
-        # "session": f"eq.{st.session_state.access_code}",
-    },
-)
-
-if not data:
-    st.info("Nog geen inzendingen.")
+        raise RuntimeError("Onverwacht antwoord: geen geldige JSON van Supabase.\n\n"
+                           f"Content-Type: {r.headers.get('Content-Type')}\n\n"
+                           f"Body (eerste 500 chars):\n{snippet}")
+
+
+# Verlopen data komt meteen uit de cache en wordt op de achtergrond ververst (session_cache.py)
+@session_cached(ttl=15, shared=True, revalidate=True)
+def fetch_submissions(session):
+    # Alle inzendingen (niet alleen de nieuwste 1000): dezelfde bron als pages/14,
+    # zodat beide pagina's de score-aggregaten uit dezelfde data vullen
+    rows, offset = [], 0
+    while True:
+        page = fetch_supabase_json(
+            "/rest/v1/submissions",
+            params={
+                "select": "*",
+                "order": "timestamp.desc,id.asc",
+                "limit": database.PAGE_SIZE,
+                "offset": offset,
+                "session": f"eq.{session}",
+            },
+        )
+        rows.extend(page)
+        if len(page) < database.PAGE_SIZE:
+            return rows
+        offset += database.PAGE_SIZE
+
+# Gearchiveerde sessie (archive.py): eerst de lokale snapshot uit het archief maken
+try:
+    archive.ensure_snapshot(st.session_state.access_code)
+except RuntimeError as e:
+    st.error(f"Kon de gearchiveerde sessie niet laden: {e}")
     st.stop()
 
-# ✅ Parse data into DataFrame
-df = pd.DataFrame(data).drop_duplicates(subset=["name", "domain", "score", "text"])
+if snapshots.is_closed(st.session_state.access_code):
+    # Afgesloten sessie: lokale, memory-mapped snapshot in plaats van Supabase
+    raw = snapshots.load_frame(st.session_state.access_code, "submissions")
+    df = score_aggregates.dedupe(raw)
+    snapshots.restore_aggregates(st.session_state.access_code)
+    if df.empty:
+        st.info("Nog geen inzendingen.")
+        st.stop()
+else:
+    # Bij een lege cache hooguit RENDER_BUDGET seconden wachten; het ophalen loopt daarna door
+    fetched, errors = database.fetch_concurrently(
+        {"submissions": lambda: fetch_submissions(st.session_state.access_code)},
+        deadline=database.RENDER_BUDGET,
+    )
+    if errors:
+        if isinstance(errors["submissions"], TimeoutError):
+            st.info("⏳ De database is traag; de resultaten worden nog geladen.")
+        else:
+            st.error(str(errors["submissions"]))
+        if st.button("🔄 Opnieuw proberen"):
+            st.rerun()
+        st.stop()
+    data = fetched["submissions"]
+    data_badge(st.session_state.access_code, fetch_submissions.cache_key())
 
+    if not data:
+        st.info("Nog geen inzendingen.")
+        st.stop()
 
+    # ✅ Parse data into DataFrame
+    raw = pd.DataFrame(data)
+    df = score_aggregates.dedupe(raw)
 
 # ✅ Filter only this session's data
 df = df[df["session"] == st.session_state.access_code]
 
-# Compute signed score
-df["signed_score"] = df["score"] * df["posneg"]
+# Domain aggregates: (re)filled when the submissions change, kept up to date by the domain pages
+# (seed_session krijgt de inzendingen zoals opgehaald: de versie telt alle rijen)
+score_aggregates.seed_session(st.session_state.access_code, raw)
 
 domains = [
     "Welzijn", "Materiële welvaart", "Gezondheid", "Arbeid en vrije tijd",
     "Wonen", "Sociaal", "Veiligheid", "Milieu"
 ]
 
-# --- Filter data for user ---
-user_df = df[df["name"] == st.session_state.name]
+# --- General metrics (O(domains) from the running aggregates) ---
+total_score = score_aggregates.overall_mean(st.session_state.access_code)
+user_score = score_aggregates.overall_mean(st.session_state.access_code, st.session_state.name)
 
-# --- General metrics ---
 st.subheader(f"Gemiddelde score voor {st.session_state.description}")
-st.metric("Totaal score", f"{df['signed_score'].mean():.2f}")
-st.metric("Jouw score", f"{user_df['signed_score'].mean():.2f}" if not user_df.empty else "–")
+st.metric("Totaal score", f"{total_score:.2f}" if total_score is not None else "–")
+st.metric("Jouw score", f"{user_score:.2f}" if user_score is not None else "–")
 
 # --- Spider (polar) charts ---
 def make_polar_chart(values, title):
@@ -186,8 +232,8 @@ def make_polar_chart(values, title):
     return fig
 
 # Domain averages
-user_grouped = user_df.groupby("domain")["signed_score"].mean().reindex(domains, fill_value=0)
-group_grouped = df.groupby("domain")["signed_score"].mean().reindex(domains, fill_value=0)
+user_grouped = score_aggregates.domain_means(st.session_state.access_code, domains, st.session_state.name)
+group_grouped = score_aggregates.domain_means(st.session_state.access_code, domains)
 
 col1, col2 = st.columns(2)
 with col1:
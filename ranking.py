@@ -0,0 +1,153 @@
+# ranking.py
+"""
+Gedeelde ranglijst van effectgroepen per (sessie, groep).
+
+De ranglijst wordt één keer per versie van de stemdata en de effectgroepen
+berekend en daarna door alle groepsleden (pages 12 en 13) uit hetzelfde
+procesbrede geheugen gelezen.
+Tekst, domein en polariteit komen uit de canonieke tabel `effect_groups`.
+"""
+import threading
+
+import pandas as pd
+import streamlit as st
+
+import database
+import effect_groups
+from aggregation import aggregate_votes, as_posneg, vote_sums
+
+RANKING_COLUMNS = ["group_id", "votes", "posneg_resolved", "domein", "text"]
+
+
+@st.cache_resource
+def _ranking_store() -> dict:
+    """Procesbrede opslag: (sessie, groep) -> {"version": ..., "ranking": DataFrame}."""
+    return {"lock": threading.Lock(), "entries": {}}
+
+
+def group_prefix(session: str, group: str) -> str:
+    """Effectgroep-id's beginnen met '<sessie>_<groepnummer>_' (zie pages/11)."""
+    return f"{session}_{group}_"
+
+
+def like_prefix(prefix: str) -> str:
+    """PostgREST-filter 'begint met': `_` en `%` zijn in LIKE jokers en worden ge-escaped."""
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"like.{escaped}*"
+
+
+def _votes_filter(session: str, group: str) -> dict:
+    # Zonder escapes zou 'S_1_*' ook de stemmen van groep 10-19 ('S_10_...') meenemen
+    return {
+        "session": f"eq.{session}",
+        "group_id": like_prefix(group_prefix(session, group)),
+    }
+
+
+def votes_version(session: str, group: str) -> tuple | None:
+    """
+    Goedkope versie van de stemdata: (aantal stemmen, laatste last_updated).
+
+    Eén kleine request; de server telt, wij halen maximaal één rij op.
+    """
+    rows, total = database.fetch_rows_with_count(
+        "effect_votes",
+        {**_votes_filter(session, group), "select": "last_updated", "order": "last_updated.desc", "limit": 1},
+    )
+    if rows is None:
+        return None
+    latest = rows[0].get("last_updated") if rows else None
+    return (total if total is not None else len(rows), latest)
+
+
+def compute_ranking(df_votes: pd.DataFrame, df_effects: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Ranglijst van alle effectgroepen waarop gestemd is, meeste stemmen eerst.
+
+    Tekst, domein en polariteit komen uit `effect_groups` (zie effect_groups.py);
+    stemmen op id's die daar niet in staan vallen terug op de kopieën op de
+    stemmen zelf, zoals stemmen van vóór "Stemmen openen". Stemmen zonder tekst op
+    een onbekend id horen bij een effectgroep die bij opnieuw openen veranderd is:
+    die tellen niet meer mee.
+    """
+    if df_votes.empty or not {"group_id", "votes"}.issubset(df_votes.columns):
+        return pd.DataFrame(columns=RANKING_COLUMNS)
+    parts = []
+    known = pd.Series(False, index=df_votes.index)
+    if df_effects is not None and not df_effects.empty:
+        known = df_votes["group_id"].isin(df_effects["id"])
+        sums = vote_sums(df_votes[known])
+        canon = df_effects.astype({"id": object}).set_index("id").reindex(sums.index)
+        parts.append(pd.DataFrame({
+            "group_id": sums.index,
+            "votes": sums.to_numpy(),
+            "posneg_resolved": as_posneg(canon["posneg"]).to_numpy(),
+            "domein": canon["domain"].astype(object).to_numpy(),
+            "text": canon["text"].to_numpy(),
+        }))
+    legacy = df_votes[~known]
+    if "text" in legacy.columns:
+        legacy = legacy[legacy["text"].fillna("").astype(str).str.strip() != ""]
+    else:
+        legacy = legacy.iloc[0:0]
+    if not legacy.empty:
+        parts.append(aggregate_votes(legacy)[RANKING_COLUMNS])
+    if not parts:
+        return pd.DataFrame(columns=RANKING_COLUMNS)
+    agg = pd.concat(parts, ignore_index=True)
+    return agg[RANKING_COLUMNS].sort_values("votes", ascending=False).reset_index(drop=True)
+
+
+def get_group_ranking(session: str, group: str) -> pd.DataFrame | None:
+    """
+    Ranglijst voor (sessie, groep); alleen herberekend als de stemdata of de effectgroepen veranderd zijn.
+
+    De versie is (votes_version, generatie van de effectgroepen) en wordt vóór de
+    stemmen gelezen: een stem die daartussen binnenkomt zit dan wel in de
+    ranglijst maar niet in de versie, zodat de volgende aanroep opnieuw rekent
+    in plaats van een oude ranglijst onder een nieuwe versie te bewaren.
+    Geeft None als de stemdata niet opgehaald kon worden.
+    """
+    store = _ranking_store()
+    key = (str(session), str(group))
+    try:
+        effects = effect_groups.load(session)
+    except RuntimeError:
+        return None  # zonder effectgroepen zijn stemmen zonder tekst niet te plaatsen
+
+    # Meestal ongewijzigd: eerst alleen de goedkope versie-check
+    votes = votes_version(*key)
+    if votes is None:
+        return None
+    version = (votes, effect_groups.generation(effects))
+    with store["lock"]:
+        entry = store["entries"].get(key)
+        if entry is not None and entry["version"] == version:
+            return entry["ranking"]
+
+    rows = database.fetch_rows(
+        "effect_votes",
+        {**_votes_filter(*key), "select": "group_id,votes,text,domein,posneg"},
+    )
+    if rows is None:
+        return None
+    ranking = compute_ranking(pd.DataFrame(rows), effects)
+
+    with store["lock"]:
+        store["entries"][key] = {"version": version, "ranking": ranking}
+    return ranking
+
+
+def invalidate_group_ranking(session: str, group: str) -> None:
+    """Gooi de ranglijst weg, bijv. direct na een nieuwe stem in dit proces."""
+    store = _ranking_store()
+    with store["lock"]:
+        store["entries"].pop((str(session), str(group)), None)
+
+
+def invalidate_session_rankings(session: str) -> None:
+    """Alle ranglijsten van een sessie weg, bijv. na opnieuw "Stemmen openen"."""
+    store = _ranking_store()
+    with store["lock"]:
+        for key in [k for k in store["entries"] if k[0] == str(session)]:
+            del store["entries"][key]
@@ -0,0 +1,252 @@
+# replay.py
+"""
+Opgenomen workshopverkeer opnieuw afspelen als prestatietest.
+
+Opnemen: start de app met WERKSESSIE_RECORD_DIR=opnames (en een geheime
+WERKSESSIE_RECORD_KEY, zie database.anonymize); database.request schrijft dan per
+toegangscode (geanonimiseerd) de vorm en timing van elke request weg.
+
+Afspelen:
+    python replay.py opnames/3f2a9c0d1b7e.jsonl --speed 5
+    python replay.py opnames --speed 20 --capacity 10     # drukste opname in de map
+    python replay.py opnames/3f2a9c0d1b7e.jsonl --target https://staging.supabase.co
+
+Zonder --target draait een lokale stand-in van de Supabase REST-API (met instelbare
+servicetijd en capaciteit, daarboven 429). De requests gaan door dezelfde
+database.request als de app, dus inclusief begrenzer en retries van deze versie.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import database
+
+
+# =======================
+# Opnames lezen
+# =======================
+def load_recording(path) -> list:
+    """Regels van één opname, of van de opname met de meeste requests als `path` een map is."""
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(path.glob("*.jsonl"), key=lambda p: sum(1 for _ in p.open(encoding="utf-8")))
+        if not files:
+            raise FileNotFoundError(f"Geen opnames (*.jsonl) in {path}")
+        path = files[-1]
+    entries = [json.loads(line) for line in path.open(encoding="utf-8") if line.strip()]
+    return sorted(entries, key=lambda e: e["t"])
+
+
+def describe(entries: list) -> str:
+    if not entries:
+        return "lege opname"
+    duration = entries[-1]["t"] - entries[0]["t"]
+    per_second = defaultdict(int)
+    for e in entries:
+        per_second[int(e["t"])] += 1
+    return (f"{len(entries)} requests in {duration:.0f} s, "
+            f"piek {max(per_second.values())} requests/s, sessie {entries[0]['session']}")
+
+
+# =======================
+# Lokale stand-in voor Supabase
+# =======================
+def make_standin(service_ms: float, capacity: int) -> ThreadingHTTPServer:
+    """
+    Minimale PostgREST-stand-in: antwoordt met het opgenomen aantal rijen.
+
+    Meer dan `capacity` gelijktijdige requests krijgen direct een 429, zoals de
+    rate limit van Supabase.
+    """
+    state = {"lock": threading.Lock(), "active": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _respond(self, with_body: bool):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            with state["lock"]:
+                busy = state["active"] >= capacity
+                if not busy:
+                    state["active"] += 1
+            if busy:
+                self.send_response(429)
+                self.send_header("Retry-After", "0.2")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            try:
+                time.sleep(service_ms / 1000)
+                n = int(self.headers.get("X-Replay-Rows") or 0)
+                body = json.dumps([{"id": i} for i in range(n)]).encode()
+                self.send_response(200 if self.command in ("GET", "HEAD") else 201)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Range", f"0-{max(n - 1, 0)}/{n}")
+                self.send_header("Content-Length", str(len(body) if with_body else 0))
+                self.end_headers()
+                if with_body:
+                    self.wfile.write(body)
+            finally:
+                with state["lock"]:
+                    state["active"] -= 1
+
+        def do_GET(self):
+            self._respond(True)
+
+        def do_HEAD(self):
+            self._respond(False)
+
+        def do_POST(self):
+            self._respond(True)
+
+        def do_PATCH(self):
+            self._respond(True)
+
+        def do_DELETE(self):
+            self._respond(True)
+
+    return ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+
+# =======================
+# Afspelen
+# =======================
+def synthetic_request(entry: dict) -> dict:
+    """Parameters en body met dezelfde vorm als de opname, met nepwaarden."""
+    params = {}
+    for key, shape in entry["params"].items():
+        if key in ("select", "order", "limit", "offset", "on_conflict"):
+            params[key] = shape
+        elif key == "and":
+            params[key] = "(" + ",".join(["created_at.gte.2000-01-01"] * int(shape)) + ")"
+        elif str(shape).startswith("in:"):
+            params[key] = "in.(" + ",".join(f"x{i}" for i in range(int(shape[3:]))) + ")"
+        else:
+            params[key] = f"{shape}.x"
+    rows = [{field: "x" for field in entry["fields_in"]} for _ in range(entry["rows_in"])]
+    body = None if not rows else rows if entry["rows_in"] > 1 or entry["method"] == "POST" else rows[0]
+    return {"params": params, "json": body}
+
+
+def replay(entries: list, *, speed: float = 1.0, workers: int = 64) -> list:
+    """Speel de requests af op hun opgenomen tijdstip / speed; geeft per request een resultaat."""
+    results, lock = [], threading.Lock()
+    t0 = entries[0]["t"] if entries else 0.0
+
+    def send(entry, due):
+        req = synthetic_request(entry)
+        headers = database.headers(json_body=req["json"] is not None)
+        headers["X-Replay-Rows"] = str(entry.get("rows_out") or 0)
+        start = time.monotonic()
+        try:
+            r = database.request(entry["method"], database.table_url(entry["table"]), headers=headers, **req)
+            status = r.status_code
+        except Exception as e:
+            status = type(e).__name__
+        done = time.monotonic()
+        with lock:
+            results.append({
+                "key": f"{entry['method']} {entry['table']}",
+                "status": status,
+                "latency_ms": (done - start) * 1000,
+                "lag_ms": (start - due) * 1000,
+                "recorded_ms": entry.get("latency_ms"),
+            })
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for entry in entries:
+            due = start + (entry["t"] - t0) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, entry, due)
+    return results
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(results: list) -> dict:
+    """Latentie (p50/p95/p99) en foutpercentage per soort request en in totaal."""
+    groups = defaultdict(list)
+    for r in results:
+        groups[r["key"]].append(r)
+    groups["totaal"] = results
+    summary = {}
+    for key, rows in groups.items():
+        latencies = [r["latency_ms"] for r in rows]
+        errors = sum(1 for r in rows if not isinstance(r["status"], int) or r["status"] >= 400)
+        summary[key] = {
+            "n": len(rows),
+            "fouten %": round(100 * errors / len(rows), 2) if rows else 0.0,
+            "p50 ms": round(_percentile(latencies, 0.50), 1),
+            "p95 ms": round(_percentile(latencies, 0.95), 1),
+            "p99 ms": round(_percentile(latencies, 0.99), 1),
+        }
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Speel opgenomen workshopverkeer af als prestatietest.")
+    parser.add_argument("recording", help="opname (.jsonl) of map met opnames")
+    parser.add_argument("--speed", type=float, default=1.0, help="versnelling, bijv. 1 t/m 20")
+    parser.add_argument("--target", help="Supabase-URL om tegen te testen (standaard: lokale stand-in)")
+    parser.add_argument("--service-ms", type=float, default=30, help="servicetijd van de stand-in")
+    parser.add_argument("--capacity", type=int, default=20, help="gelijktijdige requests van de stand-in")
+    parser.add_argument("--max-error-rate", type=float, default=1.0, help="maximaal foutpercentage (exit 2)")
+    parser.add_argument("--max-p95-ms", type=float, help="maximale p95-latentie in ms (exit 2)")
+    args = parser.parse_args(argv)
+
+    if not 0 < args.speed <= 100:
+        parser.error("--speed moet tussen 0 en 100 liggen")
+    entries = load_recording(args.recording)
+    print(f"Opname: {describe(entries)}; afspelen op {args.speed:g}×")
+
+    database.RECORD_DIR = None  # de replay zelf niet opnieuw opnemen
+    server = None
+    if args.target:
+        os.environ["SUPABASE_URL"] = args.target
+    else:
+        server = make_standin(args.service_ms, args.capacity)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+        os.environ.setdefault("SUPABASE_KEY", "replay")
+
+    t0 = time.perf_counter()
+    results = replay(entries, speed=args.speed)
+    elapsed = time.perf_counter() - t0
+    if server is not None:
+        server.shutdown()
+
+    summary = report(results)
+    width = max(len(k) for k in summary)
+    print(f"Afgespeeld in {elapsed:.1f} s; begrenzer: {database.limiter_stats()}")
+    for key, row in sorted(summary.items(), key=lambda kv: (kv[0] == "totaal", kv[0])):
+        print(f"  {key:<{width}}  " + "  ".join(f"{k} {v}" for k, v in row.items()))
+
+    total = summary.get("totaal", {})
+    failed = total.get("fouten %", 0) > args.max_error_rate
+    if args.max_p95_ms is not None:
+        failed = failed or total.get("p95 ms", 0) > args.max_p95_ms
+    return 2 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
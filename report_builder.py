@@ -0,0 +1,354 @@
+# report_builder.py
+"""
+Groepsrapport van een werksessie: één keer opbouwen, in meerdere formaten renderen.
+
+`build_report()` zet de secties om in een tussenmodel (een lijst blokken). De
+renderers maken daar DOCX (op basis van template_spg.docx), PDF (fpdf2) of HTML
+van, volledig in het geheugen (BytesIO). Afbeeldingen worden pas gemaakt als een
+renderer ze nodig heeft en daarna hergebruikt. Deze module gebruikt geen
+Streamlit, zodat hij ook vanuit een script of procespool werkt.
+"""
+import base64
+import html
+import statistics
+import threading
+from datetime import date
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+
+TEMPLATE_PATH = Path(__file__).resolve().parent / "template_spg.docx"
+NLTK_DIR = Path(__file__).resolve().parent / ".nltk_data"
+
+DOMAINS = [
+    "Welzijn", "Materiële welvaart", "Gezondheid", "Arbeid en vrije tijd",
+    "Wonen", "Sociaal", "Veiligheid", "Milieu"
+]
+
+FORMATS = {
+    "docx": ("groepsrapport.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "pdf": ("groepsrapport.pdf", "application/pdf"),
+    "html": ("groepsrapport.html", "text/html"),
+}
+
+
+# =======================
+# Afbeeldingen (matplotlib OO-API: veilig buiten de hoofdthread)
+# =======================
+def _png(fig) -> bytes:
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    FigureCanvasAgg(fig)
+    buf = BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+def spider_chart_png(values: list, domains: list = DOMAINS) -> bytes:
+    """
+    Spider chart via Plotly (kaleido). Als dat faalt (bijv. kaleido ontbreekt)
+    valt hij terug op een matplotlib-staafdiagram zodat het rapport toch een beeld krijgt.
+    """
+    try:
+        import plotly.graph_objects as go
+
+        fig = go.Figure()
+        fig.add_trace(go.Barpolar(
+            r=[abs(v) for v in values],
+            theta=domains,
+            marker_color=["blue" if v >= 0 else "orange" for v in values],
+            opacity=0.85
+        ))
+        fig.update_layout(polar=dict(radialaxis=dict(visible=True)), showlegend=False, margin=dict(l=0, r=0, t=0, b=0))
+        return fig.to_image(format="png")
+    except Exception:
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(7, 4))
+        ax = fig.add_subplot()
+        colors = ["tab:blue" if v >= 0 else "tab:orange" for v in values]
+        ax.barh(list(domains), values, alpha=0.85, color=colors)
+        ax.axvline(0, linewidth=1)
+        fig.tight_layout()
+        return _png(fig)
+
+
+def wordcloud_png(text: str, stopwords: set) -> bytes:
+    from matplotlib.figure import Figure
+    from wordcloud import WordCloud
+
+    wc = WordCloud(width=800, height=400, background_color="white", stopwords=stopwords).generate(text)
+    fig = Figure(figsize=(10, 5))
+    ax = fig.add_subplot()
+    ax.imshow(wc, interpolation="bilinear")
+    ax.axis("off")
+    fig.tight_layout()
+    return _png(fig)
+
+
+def load_dutch_stopwords() -> set:
+    """Nederlandse stopwoorden uit de meegeleverde .nltk_data (voor gebruik buiten Streamlit)."""
+    import nltk
+
+    if str(NLTK_DIR) not in nltk.data.path:
+        nltk.data.path.insert(0, str(NLTK_DIR))
+    try:
+        from nltk.corpus import stopwords
+        return set(stopwords.words("dutch"))
+    except (LookupError, OSError):
+        return {
+            "de","het","een","en","of","maar","want","dat","die","dit","er","je","jij",
+            "u","we","wij","ze","zij","ik","hij","in","op","aan","met","voor",
+            "van","naar","bij","als","dan","niet","geen","wel","ook","om","te","tot",
+        }
+
+
+# =======================
+# Tussenmodel
+# =======================
+def _heading(text, level=1):
+    return {"type": "heading", "text": text, "level": level}
+
+
+def _paragraph(text):
+    return {"type": "paragraph", "text": text}
+
+
+def _image(make, width_in):
+    # `make` levert PNG-bytes; wordt pas aangeroepen door de eerste renderer die hem nodig heeft
+    return {"type": "image", "make": make, "width_in": width_in, "png": None, "lock": threading.Lock()}
+
+
+def _page_break():
+    return {"type": "page_break"}
+
+
+def image_bytes(block: dict) -> bytes:
+    with block["lock"]:
+        if block["png"] is None:
+            block["png"] = block["make"]()
+        return block["png"]
+
+
+def safe_int(val):
+    try:
+        return int(val)
+    except (ValueError, TypeError):
+        return None
+
+
+def format_stats(values):
+    if not values:
+        return "geen data"
+    return f"min: {min(values)} jaar, max: {max(values)} jaar, gemiddeld: {round(statistics.mean(values), 1)} jaar"
+
+
+def domain_means_from_frame(df_sub: pd.DataFrame, domains: list = DOMAINS) -> list:
+    """Gemiddelde score * posneg per domein rechtstreeks uit de inzendingen."""
+    signed = pd.to_numeric(df_sub["score"], errors="coerce") * pd.to_numeric(df_sub["posneg"], errors="coerce")
+    return signed.groupby(df_sub["domain"], observed=True).mean().reindex(domains, fill_value=0).fillna(0).tolist()
+
+
+def build_report(
+    df_sub: pd.DataFrame,
+    df_group: pd.DataFrame,
+    *,
+    description: str,
+    info: str,
+    stopwords: set,
+    domain_scores: list | None = None,
+    report_date: date | None = None,
+) -> dict:
+    """Bouw het tussenmodel van het groepsrapport voor één sessie."""
+    df_group = df_group.copy()
+    n_participants = df_sub["name"].nunique()
+    n_groups = df_group["group"].nunique()
+    grouped = domain_scores if domain_scores is not None else domain_means_from_frame(df_sub)
+    report_date = report_date or date.today()
+
+    # --- Top effects ---
+    # 'votes' = hoe vaak dezelfde tekst door groepen is teruggegeven
+    df_group["votes"] = df_group.groupby("text")["text"].transform("count")
+    df_group = df_group.sort_values("votes", ascending=False)
+    if "posneg" in df_group.columns:
+        posneg = pd.to_numeric(df_group["posneg"], errors="coerce")
+        df_pos, df_neg = df_group[posneg != -1], df_group[posneg == -1]
+    else:
+        df_pos, df_neg = df_group, df_group.iloc[0:0]
+
+    # --- Samenvatting wie/waar/wanneer uit de groepsfeedback ---
+    summary = {}
+    for label, group_df in [("Positief", df_pos), ("Negatief", df_neg)]:
+        records = group_df.to_dict(orient="records")
+        summary[label] = {
+            "groups": [r.get("feedback_group_impact", "") for r in records],
+            "places": [r.get("feedback_place_impact", "") for r in records],
+            "reach": [r.get("feedback_distance", "") for r in records],
+            "start": [v for v in (safe_int(r.get("feedback_start")) for r in records) if v is not None],
+        }
+
+    blocks = [
+        _heading(f"Verslag werksessie – {description or '–'}", 0),
+        _paragraph(f"Datum: {report_date.strftime('%d-%m-%Y')}"),
+        _paragraph(f"Thema: {description or '–'}"),
+        _paragraph(f"Informatie: {info or '–'}"),
+        _paragraph(f"Aantal deelnemers: {n_participants}"),
+        _paragraph(f"Aantal groepen: {n_groups}"),
+        _page_break(),
+        _heading("1. Gemiddelde scores per domein", 1),
+        _paragraph("In onderstaande grafiek zie je hoe positief of negatief elk domein is beoordeeld door de deelnemers. Blauwe balken zijn positief, oranje negatief."),
+        _image(lambda: spider_chart_png(grouped), 6),
+        _page_break(),
+        _heading("2. Hoogst gewaardeerde effecten", 1),
+    ]
+
+    top_n = max(1, n_groups * 3)
+    for label, group_df in [("Positief", df_pos), ("Negatief", df_neg)]:
+        blocks.append(_heading(f"{label} – meest genoemde effecten", 2))
+        for _, row in group_df.head(top_n).iterrows():
+            blocks.append(_paragraph(f"• {row['text']} ({row['votes']} stemmen)"))
+    blocks.append(_page_break())
+
+    blocks += [
+        _heading("3. Samenvatting wie waar wanneer", 1),
+        _paragraph("Hier zie je hoe de positieve en negatieve effecten geconcentreerd zijn bij groepen, plekken of in de tijd"),
+    ]
+    for label, title in [("Positief", "Positieve effecten"), ("Negatief", "Negatieve effecten")]:
+        s = summary[label]
+        blocks += [
+            _heading(title, 2),
+            _paragraph(f"• Groepen: {', '.join(filter(None, s['groups']))}"),
+            _paragraph(f"• Plaatsen: {', '.join(filter(None, s['places']))}"),
+            _paragraph(f"• Reikwijdte: {', '.join(filter(None, s['reach']))}"),
+            _paragraph(f"• Verwachte start effect: {format_stats(s['start'])}"),
+        ]
+    blocks.append(_page_break())
+
+    blocks.append(_heading("4. Groepsfeedback voor de belangrijkste effecten", 1))
+    for label, group_df in [("Positief", df_pos), ("Negatief", df_neg)]:
+        blocks.append(_heading(f"{label}e effecten", 2))
+        for _, row in group_df.iterrows():
+            blocks += [
+                _heading(f"Effect: {row['text']}", 3),
+                _paragraph(f"Groep: {row.get('group', '–')}"),
+                _paragraph(f"- Groepsimpact: {row.get('feedback_group_impact', '')}"),
+                _paragraph(f"- Plaatsimpact: {row.get('feedback_place_impact', '')}"),
+                _paragraph(f"- Reikwijdte: {row.get('feedback_distance', '')}"),
+                _paragraph(f"- Verbeteringen: {row.get('feedback_improvements', '')}"),
+            ]
+
+    blocks.append(_heading("5. Thema-analyse", 1))
+    for domain in DOMAINS:
+        domain_df = df_sub[df_sub["domain"] == domain]
+        blocks += [_heading(domain, 2), _paragraph(f"Aantal stemmen in dit domein: {len(domain_df)}")]
+        text = " ".join(domain_df["text"].astype(str)).strip()
+        if text:
+            blocks.append(_image(lambda text=text: wordcloud_png(text, stopwords), 5.5))
+        else:
+            blocks.append(_paragraph("⚠️ Geen tekst beschikbaar voor dit domein."))
+
+    return {"title": blocks[0]["text"], "blocks": blocks, "rendered": {}, "lock": threading.Lock()}
+
+
+# =======================
+# Renderers
+# =======================
+def render_docx(report: dict) -> bytes:
+    from docx import Document
+    from docx.shared import Inches
+
+    doc = Document(str(TEMPLATE_PATH)) if TEMPLATE_PATH.exists() else Document()
+    # Lege inhoud van de template weghalen; stijlen, kop- en voettekst blijven staan
+    body = doc.element.body
+    for el in list(body):
+        if not el.tag.endswith("}sectPr"):
+            body.remove(el)
+
+    for block in report["blocks"]:
+        kind = block["type"]
+        if kind == "heading":
+            doc.add_heading(block["text"], block["level"])
+        elif kind == "paragraph":
+            doc.add_paragraph(block["text"])
+        elif kind == "image":
+            doc.add_picture(BytesIO(image_bytes(block)), width=Inches(block["width_in"]))
+        elif kind == "page_break":
+            doc.add_page_break()
+
+    buf = BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+# Kernfonts van fpdf2 kennen alleen latin-1
+_PDF_REPLACEMENTS = {"–": "-", "—": "-", "•": "-", "‘": "'", "’": "'", "“": '"', "”": '"', "…": "...", "⚠️": "!", "⚠": "!"}
+
+
+def _pdf_text(text: str) -> str:
+    for old, new in _PDF_REPLACEMENTS.items():
+        text = text.replace(old, new)
+    return text.encode("latin-1", errors="replace").decode("latin-1")
+
+
+def render_pdf(report: dict) -> bytes:
+    from fpdf import FPDF
+
+    pdf = FPDF(format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    heading_sizes = {0: 20, 1: 16, 2: 13, 3: 11}
+    for block in report["blocks"]:
+        kind = block["type"]
+        if kind == "heading":
+            pdf.set_font("Helvetica", "B", heading_sizes.get(block["level"], 11))
+            pdf.multi_cell(0, 8, _pdf_text(block["text"]), new_x="LMARGIN", new_y="NEXT")
+            pdf.ln(1)
+        elif kind == "paragraph":
+            pdf.set_font("Helvetica", "", 10)
+            pdf.multi_cell(0, 5, _pdf_text(block["text"]), new_x="LMARGIN", new_y="NEXT")
+            pdf.ln(1)
+        elif kind == "image":
+            pdf.image(BytesIO(image_bytes(block)), w=min(pdf.epw, block["width_in"] * 25.4))
+        elif kind == "page_break":
+            pdf.add_page()
+    return bytes(pdf.output())
+
+
+def render_html(report: dict) -> bytes:
+    parts = [
+        "<!DOCTYPE html><html lang='nl'><head><meta charset='utf-8'>",
+        f"<title>{html.escape(report['title'])}</title>",
+        "<style>body{font-family:sans-serif;max-width:50rem;margin:2rem auto;padding:0 1rem}"
+        "img{max-width:100%}hr{border:0;border-top:1px solid #ddd;margin:2rem 0}</style>",
+        "</head><body>",
+    ]
+    for block in report["blocks"]:
+        kind = block["type"]
+        if kind == "heading":
+            level = min(block["level"] + 1, 6)
+            parts.append(f"<h{level}>{html.escape(block['text'])}</h{level}>")
+        elif kind == "paragraph":
+            parts.append(f"<p>{html.escape(block['text'])}</p>")
+        elif kind == "image":
+            data = base64.b64encode(image_bytes(block)).decode("ascii")
+            parts.append(f"<img alt='' src='data:image/png;base64,{data}'>")
+        elif kind == "page_break":
+            parts.append("<hr>")
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+RENDERERS = {"docx": render_docx, "pdf": render_pdf, "html": render_html}
+
+
+def render(report: dict, fmt: str) -> bytes:
+    """Render één formaat; het resultaat wordt per rapport bewaard en hergebruikt."""
+    with report["lock"]:
+        cached = report["rendered"].get(fmt)
+    if cached is not None:
+        return cached
+    data = RENDERERS[fmt](report)
+    with report["lock"]:
+        report["rendered"][fmt] = data
+    return data
@@ -0,0 +1,226 @@
+# score_aggregates.py
+"""
+Lopende sommen en aantallen van de gewogen score (score * posneg) per
+(sessie, domein) en per (sessie, naam, domein).
+
+De domeinpagina's werken de aggregaten bij bij opslaan, wijzigen en verwijderen;
+de resultaten- en rapportpagina lezen daarna O(domeinen) getallen in plaats van
+alle inzendingen opnieuw te doorlopen. Een sessie wordt gevuld vanuit de
+inzendingen uit de database (seed_session) en opnieuw gevuld zodra die
+inzendingen veranderen, zodat ook wijzigingen uit andere replica's en opslagen
+die tussen ophalen en vullen vielen binnenkomen. Of ze veranderd zijn volgt uit
+een goedkope telling op de server: het aantal rijen plus de laatste
+`last_updated` (migrations/0006), hoogstens eens per VERSION_TTL seconden.
+Daartussen houden de domeinpagina's de eigen wijzigingen van dit proces bij.
+Per rij wordt onthouden wat ze bijdraagt, zodat apply_change idempotent is: een
+opslag die ook al in een nieuwe vulling zat, telt niet dubbel. Alle pagina's
+vullen vanuit dezelfde ontdubbelde inzendingen (dedupe).
+"""
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+import database
+
+VERSION_TTL = 5  # seconden; zo lang geldt een gecontroleerde versie zonder nieuwe telling
+SNAPSHOT_VERSION = "snapshot"  # versie van een uit een snapshot teruggezette stand
+
+
+@st.cache_resource
+def _aggregate_store() -> dict:
+    return {"lock": threading.Lock(), "sessions": {}}
+
+
+def signed_score(score, posneg) -> float | None:
+    """score * posneg, of None als een van beide ontbreekt of niet numeriek is."""
+    try:
+        return float(score) * float(posneg)
+    except (TypeError, ValueError):
+        return None
+
+
+def _add(bucket: dict, key, value: float, sign: int) -> None:
+    total, count = bucket.get(key, (0.0, 0))
+    total, count = total + sign * value, count + sign
+    if count <= 0:
+        bucket.pop(key, None)
+    else:
+        bucket[key] = (total, count)
+
+
+DEDUPE_COLUMNS = ["name", "domain", "score", "text"]
+
+
+def dedupe(df: pd.DataFrame) -> pd.DataFrame:
+    """Inzendingen zonder dubbele (naam, domein, score, tekst), zoals pages/9 ze toont."""
+    subset = [c for c in DEDUPE_COLUMNS if c in df.columns]
+    return df.drop_duplicates(subset=subset) if subset and not df.empty else df
+
+
+def server_version(session: str) -> tuple | None:
+    """(aantal rijen, laatste last_updated) van de inzendingen volgens de server; None bij een fout."""
+    count = database.count_rows("submissions", {"session": f"eq.{session}"})
+    latest = database.fetch_rows("submissions", {
+        "select": "last_updated", "session": f"eq.{session}", "order": "last_updated.desc", "limit": 1,
+    })
+    if count is None or latest is None:
+        return None
+    return count, str(latest[0].get("last_updated")) if latest else None
+
+
+def frame_version(df: pd.DataFrame) -> tuple:
+    """Dezelfde versie als server_version, maar van een opgehaald (niet ontdubbeld) frame."""
+    if df.empty or "last_updated" not in df.columns:
+        return len(df), None
+    latest = df["last_updated"].dropna()
+    return len(df), str(latest.astype(str).max()) if not latest.empty else None
+
+
+def is_seeded(session: str) -> bool:
+    return str(session) in _aggregate_store()["sessions"]
+
+
+def compute_state(df: pd.DataFrame) -> dict:
+    """
+    Aggregaten van een sessie uit alle inzendingen: {"domain": {...}, "user": {naam: {...}}}.
+
+    "rows" houdt per rij-id bij wat die rij bijdraagt (naam, domein, gewogen score).
+    """
+    state = {"domain": {}, "user": {}, "rows": {}}
+    if not df.empty and {"domain", "score", "posneg"}.issubset(df.columns):
+        signed = pd.to_numeric(df["score"], errors="coerce") * pd.to_numeric(df["posneg"], errors="coerce")
+        frame = pd.DataFrame({
+            "id": df["id"] if "id" in df.columns else None,
+            "name": df["name"] if "name" in df.columns else None,
+            "domain": df["domain"],
+            "signed": signed,
+        }).dropna(subset=["domain", "signed"])
+        with_id = frame.dropna(subset=["id"])
+        state["rows"] = {
+            str(row_id): (name if pd.notna(name) else None, domain, float(value))
+            for row_id, name, domain, value in zip(with_id["id"], with_id["name"], with_id["domain"], with_id["signed"])
+        }
+        per_domain = frame.groupby("domain", observed=True)["signed"].agg(["sum", "count"])
+        state["domain"] = {d: (float(r["sum"]), int(r["count"])) for d, r in per_domain.iterrows()}
+        per_user = frame.dropna(subset=["name"]).groupby(["name", "domain"], observed=True)["signed"].agg(["sum", "count"])
+        for (name, domain), r in per_user.iterrows():
+            state["user"].setdefault(name, {})[domain] = (float(r["sum"]), int(r["count"]))
+    return state
+
+
+def _still_current(session: str, version) -> bool:
+    """Hoort de huidige vulling bij `version`? Zo ja, dan geldt ze weer VERSION_TTL seconden."""
+    store = _aggregate_store()
+    with store["lock"]:
+        current = store["sessions"].get(session)
+        if current is None or current.get("version") != version:
+            return False
+        current["checked"] = time.monotonic()
+        return True
+
+
+def seed_session(session: str, df: pd.DataFrame) -> None:
+    """
+    Vul de aggregaten van een sessie vanuit alle inzendingen, opnieuw als die veranderd zijn.
+
+    `df` zijn de opgehaalde inzendingen van de sessie, nog niet ontdubbeld. Zolang
+    de versie op de server gelijk blijft blijven de aggregaten (met de eigen
+    wijzigingen van dit proces via apply_change) staan en wordt `df` niet gelezen.
+    Is `df` ouder dan de server (een verlopen cache), dan krijgt de vulling de
+    versie van `df`, zodat een volgende aanroep met verse data opnieuw vult.
+    Een uit een snapshot teruggezette stand blijft staan.
+    """
+    store = _aggregate_store()
+    session = str(session)
+    with store["lock"]:
+        current = store["sessions"].get(session)
+        if current is not None and (current.get("version") == SNAPSHOT_VERSION
+                                    or time.monotonic() - current.get("checked", 0.0) < VERSION_TTL):
+            return
+    server = server_version(session)
+    if _still_current(session, server):
+        return
+    local = frame_version(df)  # alleen nodig als de server iets nieuws heeft
+    if _still_current(session, local):
+        return
+    state = compute_state(dedupe(df))
+    state["version"] = server if server == local else local
+    state["checked"] = time.monotonic()
+    with store["lock"]:
+        store["sessions"][session] = state
+
+
+def restore_session(session: str, state: dict) -> None:
+    """Vul de aggregaten vanuit een eerder berekende stand (bijv. een snapshot), zonder inzendingen."""
+    store = _aggregate_store()
+    with store["lock"]:
+        store["sessions"].setdefault(str(session), {
+            "domain": {d: tuple(v) for d, v in state.get("domain", {}).items()},
+            "user": {n: {d: tuple(v) for d, v in b.items()} for n, b in state.get("user", {}).items()},
+            "rows": {},
+            "version": SNAPSHOT_VERSION,
+        })
+
+
+def apply_change(session: str, row_id, new: dict | None) -> None:
+    """
+    Verwerk één opgeslagen, gewijzigde of verwijderde inzending (rij `row_id`).
+
+    `new` is een dict met name, domain, score en posneg, of None bij verwijderen.
+    De vorige bijdrage van de rij gaat er eerst af, dus twee keer dezelfde
+    wijziging (of een wijziging die al in de vulling zat) telt één keer.
+    """
+    store = _aggregate_store()
+    with store["lock"]:
+        state = store["sessions"].get(str(session))
+        if state is None or row_id is None:
+            return
+        rows = state.setdefault("rows", {})
+        old = rows.pop(str(row_id), None)
+        if old is not None:
+            name, domain, value = old
+            _add(state["domain"], domain, value, -1)
+            if name:
+                _add(state["user"].setdefault(name, {}), domain, value, -1)
+        value = signed_score(new.get("score"), new.get("posneg")) if new else None
+        if value is None or not new.get("domain"):
+            return
+        _add(state["domain"], new["domain"], value, +1)
+        if new.get("name"):
+            _add(state["user"].setdefault(new["name"], {}), new["domain"], value, +1)
+        rows[str(row_id)] = (new.get("name"), new["domain"], value)
+
+
+def invalidate_session(session: str) -> None:
+    """Vergeet de aggregaten; de volgende lezer vult ze opnieuw vanuit de database."""
+    store = _aggregate_store()
+    with store["lock"]:
+        store["sessions"].pop(str(session), None)
+
+
+def _buckets(session: str, name: str | None) -> dict:
+    state = _aggregate_store()["sessions"].get(str(session), {"domain": {}, "user": {}})
+    return dict(state["domain"] if name is None else state["user"].get(name, {}))
+
+
+def _means(buckets: dict, domains: list) -> list:
+    return [buckets[d][0] / buckets[d][1] if d in buckets else 0 for d in domains]
+
+
+def domain_means(session: str, domains: list, name: str | None = None) -> list:
+    """Gemiddelde gewogen score per domein (0 als er niets is), in de volgorde van `domains`."""
+    return _means(_buckets(session, name), domains)
+
+
+def state_domain_means(state: dict, domains: list) -> list:
+    """Als domain_means, maar uit een stand van compute_state (buiten de procesbrede store)."""
+    return _means(state["domain"], domains)
+
+
+def overall_mean(session: str, name: str | None = None) -> float | None:
+    """Gemiddelde gewogen score over alle domeinen, of None zonder inzendingen."""
+    buckets = _buckets(session, name).values()
+    count = sum(c for _, c in buckets)
+    return sum(t for t, _ in buckets) / count if count else None
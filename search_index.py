@@ -0,0 +1,311 @@
+# search_index.py
+"""
+Zoeken in effecten en groepsfeedback over alle sessies heen.
+
+Werkt, net als analytics.py, op de export van columnar_export.py (ook
+gearchiveerde sessies). Per sessie worden `submissions.text` en de feedback
+uit `group_results` één keer geanalyseerd (kleine letters, Nederlandse stopwoorden uit .nltk_data weg,
+Snowball-stemmer, accenten weg) en als partitie weggeschreven:
+    <export>/_search/session=<code>.parquet
+Alleen sessies waarvan de export veranderd is worden opnieuw geanalyseerd.
+Bij het laden worden alle partities samengevoegd tot één inverted index in het
+geheugen (term -> gesorteerde doc-id's); een zoekvraag is daarna een paar
+doorsneden van numpy-arrays plus filters op provincie, domein en polariteit.
+
+    python search_index.py build --export export
+    python search_index.py query parkeerdruk --prov DR --posneg -1
+"""
+import argparse
+import bisect
+import functools
+import re
+import sys
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import analytics
+import columnar_export
+import database
+import report_builder
+
+SEARCH_DIR = "_search"
+FEEDBACK_FIELDS = ["feedback_group_impact", "feedback_place_impact", "feedback_improvements"]
+DOC_COLUMNS = ["session", "description", "prov", "created_at", "source", "domain", "posneg", "text", "feedback",
+               "terms"]
+SOURCES = {"submissions": "inzending", "group_results": "feedback"}
+MAX_PREFIX_TERMS = 50  # zoekwoorden worden ook als prefix gezocht ('parkeer' -> parkeerdruk, parkeerplaats)
+
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+# =======================
+# Tekstanalyse
+# =======================
+@functools.lru_cache(maxsize=1)
+def _analyzer() -> tuple:
+    from nltk.stem.snowball import SnowballStemmer
+
+    return SnowballStemmer("dutch"), frozenset(report_builder.load_dutch_stopwords())
+
+
+def _fold(word: str) -> str:
+    folded = unicodedata.normalize("NFKD", word)
+    return "".join(c for c in folded if not unicodedata.combining(c))
+
+
+@functools.lru_cache(maxsize=200_000)
+def _stem(word: str) -> str:
+    # Woordenschat is veel kleiner dan het aantal woorden: elke vorm één keer stemmen
+    stemmer, _ = _analyzer()
+    return _fold(stemmer.stem(word))
+
+
+def _words(text) -> list:
+    if not isinstance(text, str) or not text:
+        return []
+    _, stopwords = _analyzer()
+    return [w for w in _WORD.findall(text.lower()) if len(w) > 1 and w not in stopwords]
+
+
+def analyze(text) -> list:
+    """Tekst -> lijst met stammen (stopwoorden en losse letters weg)."""
+    return [_stem(w) for w in _words(text)]
+
+
+# =======================
+# Index bouwen (incrementeel per sessie)
+# =======================
+def _partition_path(out_dir, session: str) -> Path:
+    return Path(out_dir) / SEARCH_DIR / f"session={quote(str(session), safe='')}.parquet"
+
+
+def indexed_sessions(out_dir) -> dict:
+    """Sessies in de zoekindex met de wijzigingstijd van de export waaruit ze gebouwd zijn."""
+    root = Path(out_dir) / SEARCH_DIR
+    if not root.exists():
+        return {}
+    return {
+        unquote(p.stem.split("=", 1)[1]): float(pd.read_parquet(p, columns=["source_mtime"])["source_mtime"].max())
+        for p in root.glob("session=*.parquet")
+    }
+
+
+def _documents(df: pd.DataFrame, source: str, domain_col: str, feedback_cols: list) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame(columns=["session", "source", "domain", "posneg", "text", "feedback"])
+    feedback = (
+        df[feedback_cols].astype("string").fillna("").agg(" · ".join, axis=1).str.strip(" ·")
+        if feedback_cols else pd.Series("", index=df.index)
+    )
+    return pd.DataFrame({
+        "session": df["session"].astype(str),
+        "source": source,
+        "domain": df[domain_col].astype("string").fillna("") if domain_col in df else "",
+        "posneg": pd.to_numeric(df.get("posneg"), errors="coerce").fillna(0).astype("int8"),
+        "text": df["text"].astype("string").fillna(""),
+        "feedback": feedback,
+    })
+
+
+def build(out_dir, *, fmt: str = "parquet", refresh: bool = False) -> list:
+    """
+    Werk de zoekindex bij voor nieuwe of opnieuw geëxporteerde sessies; geeft die sessies terug.
+
+    De wijzigingstijd van een sessie is de laatste van haar partities in submissions en group_results.
+    """
+    sources = {}
+    for table in SOURCES:
+        for session, mtime in analytics.exported_sessions(out_dir, table).items():
+            sources[session] = max(sources.get(session, 0.0), mtime)
+    known = {} if refresh else indexed_sessions(out_dir)
+    todo = [s for s, mtime in sources.items() if known.get(s) != mtime]
+    if not todo:
+        return []
+
+    meta = pd.DataFrame(
+        database.fetch_session_meta(todo, select="access_code,description,prov,created_at"),
+        columns=["access_code", "description", "prov", "created_at"],
+    ).set_index("access_code")
+
+    parts = []
+    if (Path(out_dir) / "submissions").exists():
+        subs = columnar_export.load_table(out_dir, "submissions", todo, fmt=fmt).to_pandas()
+        parts.append(_documents(subs, SOURCES["submissions"], "domain", []))
+    if (Path(out_dir) / "group_results").exists():
+        results = columnar_export.load_table(out_dir, "group_results", todo, fmt=fmt).to_pandas()
+        parts.append(_documents(results, SOURCES["group_results"], "domein", FEEDBACK_FIELDS))
+    docs = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=DOC_COLUMNS)
+    docs = docs[(docs["text"] != "") | (docs["feedback"] != "")]
+
+    docs = docs.assign(
+        description=docs["session"].map(meta["description"]).fillna("").astype(str),
+        prov=docs["session"].map(meta["prov"]).fillna("?").astype(str),
+        created_at=pd.to_datetime(docs["session"].map(meta["created_at"]), errors="coerce", utc=True),
+        terms=[" ".join(dict.fromkeys(analyze(f"{t} {f}"))) for t, f in zip(docs["text"], docs["feedback"])],
+    )
+    root = Path(out_dir) / SEARCH_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    for session in todo:
+        part = docs[docs["session"] == session][DOC_COLUMNS].assign(source_mtime=sources[session])
+        part.to_parquet(_partition_path(out_dir, session), index=False, compression="zstd")
+    return todo
+
+
+# =======================
+# Index laden en zoeken
+# =======================
+def load_index(out_dir) -> dict:
+    """Alle partities samengevoegd tot één index in het geheugen."""
+    files = sorted((Path(out_dir) / SEARCH_DIR).glob("session=*.parquet"))
+    docs = (pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+            if files else pd.DataFrame(columns=DOC_COLUMNS))
+    docs = docs.drop(columns=["source_mtime"], errors="ignore")
+    if "description" not in docs:  # partities van vóór de beschrijving; `build --refresh` vult ze aan
+        docs["description"] = ""
+
+    # (term, doc) paren -> per term een gesorteerde array doc-id's
+    terms = docs["terms"].fillna("").str.split()
+    lengths = terms.str.len().to_numpy()
+    doc_ids = np.repeat(np.arange(len(docs), dtype=np.int64), lengths)
+    flat = np.fromiter((t for ts in terms for t in ts), dtype=object, count=int(lengths.sum()))
+    codes, vocab = pd.factorize(flat, sort=True)
+    order = np.lexsort((doc_ids, codes))
+    codes, doc_ids = codes[order], doc_ids[order]
+    bounds = np.searchsorted(codes, np.arange(len(vocab) + 1))
+    postings = {term: doc_ids[bounds[i]:bounds[i + 1]] for i, term in enumerate(vocab)}
+
+    docs = docs.drop(columns=["terms"])
+    for col in ("prov", "domain", "source", "session"):
+        docs[col] = docs[col].astype("category")
+    return {"docs": docs, "postings": postings, "vocab": list(vocab)}
+
+
+def _matching(index: dict, term: str) -> np.ndarray:
+    """Doc-id's voor een stam, inclusief (hooguit MAX_PREFIX_TERMS) langere termen met die stam als prefix."""
+    vocab = index["vocab"]
+    start = bisect.bisect_left(vocab, term)
+    hits = []
+    for t in vocab[start:start + MAX_PREFIX_TERMS]:
+        if not t.startswith(term):
+            break
+        hits.append(index["postings"][t])
+    if not hits:
+        return np.empty(0, dtype=np.int64)
+    return hits[0] if len(hits) == 1 else np.unique(np.concatenate(hits))
+
+
+def session_label(docs: pd.DataFrame) -> pd.Series:
+    """'beschrijving (jjjj-mm-dd)' per document: de toegangscode zelf is geheim en wordt niet getoond."""
+    date = docs["created_at"].dt.strftime("%Y-%m-%d").fillna("?")
+    return docs["description"].astype(str).where(docs["description"].astype(str) != "", "sessie") + " (" + date + ")"
+
+
+def search(index: dict, query: str, *, prov=None, domain=None, posneg=None, source=None,
+           limit: int = 100) -> tuple:
+    """
+    Documenten die alle zoekwoorden bevatten, nieuwste sessies eerst: (DataFrame, totaal).
+
+    `prov`, `domain` en `source` mogen een waarde of een lijst zijn; `posneg` is -1, 0 of 1.
+    """
+    docs = index["docs"]
+    words = list(dict.fromkeys(_words(query)))
+    if not words:
+        return docs.iloc[0:0], 0
+    candidates = []
+    for word in words:
+        # De stam van een afgebroken woord is niet altijd een prefix ('parkeer' -> 'parker'),
+        # dus het woord zelf ook als prefix proberen
+        stem, folded = _stem(word), _fold(word)
+        hits = _matching(index, stem)
+        if folded != stem:
+            hits = np.union1d(hits, _matching(index, folded))
+        candidates.append(hits)
+    candidates.sort(key=len)
+    ids = candidates[0]
+    for other in candidates[1:]:
+        if not len(ids):
+            break
+        ids = np.intersect1d(ids, other, assume_unique=True)
+
+    keep = np.ones(len(ids), dtype=bool)
+    for col, wanted in (("prov", prov), ("domain", domain), ("source", source)):
+        if wanted:
+            values = [wanted] if isinstance(wanted, str) else list(wanted)
+            keep &= np.isin(docs[col].to_numpy()[ids].astype(object), values)
+    if posneg is not None:
+        keep &= docs["posneg"].to_numpy()[ids] == int(posneg)
+    ids = ids[keep]
+
+    found = docs.iloc[ids]
+    found = found.sort_values("created_at", ascending=False, na_position="last", kind="stable")
+    return found.head(limit).reset_index(drop=True), len(ids)
+
+
+@st.cache_resource
+def _index_store() -> dict:
+    # export-map -> {"version": tuple(mtimes), "index": dict}
+    return {"lock": threading.Lock(), "indexes": {}}
+
+
+def cached_index(out_dir) -> dict:
+    """De index van `out_dir`, per proces één keer geladen en opnieuw als er partities veranderd zijn."""
+    files = sorted((Path(out_dir) / SEARCH_DIR).glob("session=*.parquet"))
+    version = tuple((f.name, f.stat().st_mtime) for f in files)
+    store = _index_store()
+    key = str(Path(out_dir).resolve())
+    with store["lock"]:
+        entry = store["indexes"].get(key)
+        if entry is not None and entry["version"] == version:
+            return entry["index"]
+    index = load_index(out_dir)
+    with store["lock"]:
+        store["indexes"][key] = {"version": version, "index": index}
+    return index
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Zoekindex over effecten en groepsfeedback van alle sessies.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="zoekindex bijwerken vanuit de export")
+    p_build.add_argument("--export", default="export", help="map van columnar_export.py")
+    p_build.add_argument("--format", choices=list(columnar_export.FORMATS), default="parquet")
+    p_build.add_argument("--refresh", action="store_true", help="alle sessies opnieuw analyseren")
+
+    p_query = sub.add_parser("query", help="zoeken")
+    p_query.add_argument("words", nargs="+", help="zoekwoorden (alle moeten voorkomen)")
+    p_query.add_argument("--export", default="export", help="map van columnar_export.py")
+    p_query.add_argument("--prov", help="provincie, bijv. DR of GR")
+    p_query.add_argument("--domain", help="domein, bijv. Wonen")
+    p_query.add_argument("--posneg", type=int, choices=[-1, 0, 1], help="polariteit")
+    p_query.add_argument("--source", choices=list(SOURCES.values()), help="alleen inzendingen of feedback")
+    p_query.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        done = build(args.export, fmt=args.format, refresh=args.refresh)
+        print(f"{len(done)} sessies (her)geïndexeerd in {time.perf_counter() - start:.1f} s")
+        return 0
+
+    index = load_index(args.export)
+    start = time.perf_counter()
+    found, total = search(index, " ".join(args.words), prov=args.prov, domain=args.domain,
+                          posneg=args.posneg, source=args.source, limit=args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{total} resultaten in {elapsed:.1f} ms (van {len(index['docs'])} documenten)")
+    if not found.empty:
+        found = found.assign(sessie=session_label(found))
+        print(found[["sessie", "prov", "source", "domain", "posneg", "text"]].to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
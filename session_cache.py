@@ -0,0 +1,382 @@
+# session_cache.py
+"""
+Procesbrede cache per sessie (toegangscode) met een globaal geheugenbudget.
+
+Eén Streamlit-proces kan meerdere werksessies tegelijk bedienen. Anders dan
+`st.cache_data` houdt deze cache per sessie bij hoeveel geheugen de entries
+innemen, ruimt hij bij overschrijding van het budget eerst de sessies op die het
+langst niet gebruikt zijn (LRU) en kan een afgesloten sessie in één keer worden
+vrijgegeven.
+
+Met `shared=True` ligt daaronder de gedeelde cache van shared_cache.py, zodat
+meerdere replica's een sessie maar één keer ophalen; invalidaties uit andere
+replica's worden hier bij de volgende lookup verwerkt.
+
+Met `revalidate=True` (stale-while-revalidate) krijgt een lezer na het verlopen
+van de TTL meteen de laatst goede waarde, terwijl één achtergrondthread hem
+ververst. Zo wacht een pagina niet op een trage database zolang er data van
+hooguit MAX_STALE_SECONDS oud is; de pagina toont met data_badge hoe oud.
+
+Elke invalidatie verhoogt de generatie van de sessie. Een load die daarvóór
+begon geeft zijn waarde nog aan de eigen aanroeper, maar bewaart haar niet meer
+(lokaal noch gedeeld): ze kan van vóór de invalidatie zijn. Wie op zo'n load
+wachtte, laadt opnieuw.
+
+De grootte van een entry wordt bij het opslaan geschat. Een waarde die daarna
+in-place groeit (het rapportmodel vult zijn PNG's en gerenderde bestanden pas bij
+de eerste download) moet na zo'n vulling met remeasure opnieuw gemeten worden.
+
+Buiten het budget vallen de kleinere procesbrede stores, elk met een eigen grens:
+    ranking.py            één ranglijst per (sessie, groep): alleen de gestemde effectgroepen
+    score_aggregates.py   sommen en aantallen per domein en per deelnemer, bijdrage per rij
+    change_feed.py        tellers en de laatste RECENT_EVENTS gebeurtenissen per sessie
+    similar_index.py      trigrammen van de effectteksten per (sessie, domein)
+    search_index.py       één index per exportmap (alleen pages/16, facilitator)
+De eerste vier zijn per sessie; pages/15 geeft ze samen met deze cache vrij.
+"""
+import functools
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+import database
+import shared_cache
+
+# Globaal budget in bytes; via de omgeving aan te passen per host
+CACHE_BUDGET_BYTES = int(os.environ.get("WERKSESSIE_CACHE_BYTES", 256 * 1024 * 1024))
+# Hoe oud een verlopen waarde nog mag zijn om (tijdens het verversen) te tonen
+MAX_STALE_SECONDS = float(os.environ.get("WERKSESSIE_MAX_STALE", 600))
+
+
+@st.cache_resource
+def _cache_store() -> dict:
+    # sessions: sessie -> {"entries": {key: (waarde, bytes, verloopt_op, geladen_om)}, "bytes": int, "last_used": float}
+    # loading: (sessie, key) -> {"done": Event, "error": Exception | None} voor loads die nu lopen
+    # generations: sessie -> aantal invalidaties; een load bewaart alleen als het getal niet veranderd is
+    return {"lock": threading.Lock(), "sessions": OrderedDict(), "bytes": 0, "loading": {}, "generations": {}}
+
+
+def _members(value) -> list:
+    if isinstance(value, dict):
+        return list(value.values())
+    return list(value) if isinstance(value, (tuple, list)) else []
+
+
+def estimate_size(value) -> int:
+    """
+    Geschatte geheugengrootte in bytes (DataFrames inclusief hun object-kolommen).
+
+    DataFrames via memory_usage, al het andere met één pickle.dumps. Alleen een
+    container met DataFrames erin, of een die niet te pickelen is (het rapportmodel
+    met figuren), wordt per element geschat, één niveau per keer.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True, index=True))
+    members = _members(value)
+    if not any(isinstance(m, (pd.DataFrame, pd.Series)) for m in members):
+        try:
+            return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            pass
+    return sys.getsizeof(value) + sum(estimate_size(m) for m in members)
+
+
+def _drop_entry(store: dict, session: str, key) -> None:
+    bucket = store["sessions"].get(session)
+    if bucket is None or key not in bucket["entries"]:
+        return
+    _, nbytes, _, _ = bucket["entries"].pop(key)
+    bucket["bytes"] -= nbytes
+    store["bytes"] -= nbytes
+
+
+def _drop_session(store: dict, session: str) -> None:
+    bucket = store["sessions"].pop(session, None)
+    if bucket is not None:
+        store["bytes"] -= bucket["bytes"]
+
+
+def _evict(store: dict, keep: str) -> None:
+    """Ruim verlopen entries en daarna de minst recent gebruikte sessies op totdat het budget klopt."""
+    if store["bytes"] <= CACHE_BUDGET_BYTES:
+        return
+    now = time.monotonic()
+    for session, bucket in list(store["sessions"].items()):
+        for key, (_, _, expires, _) in list(bucket["entries"].items()):
+            if expires is not None and expires <= now:
+                _drop_entry(store, session, key)
+    for session in list(store["sessions"]):
+        if store["bytes"] <= CACHE_BUDGET_BYTES:
+            return
+        if session != keep:
+            _drop_session(store, session)
+
+
+def _bump_generation(store: dict, session: str) -> None:
+    """Nieuwe generatie (aanroepen met store["lock"]): lopende loads van de sessie bewaren niet meer."""
+    store["generations"][session] = store["generations"].get(session, 0) + 1
+    for claimed in [k for k in store["loading"] if k[0] == session]:
+        store["loading"].pop(claimed)  # nieuwe lezers wachten niet op een verouderde load
+
+
+def _apply_remote_invalidations(store: dict) -> None:
+    """Ruim lokale entries op die een andere replica ongeldig heeft gemaakt."""
+    events = shared_cache.poll_invalidations()
+    if not events:
+        return
+    with store["lock"]:
+        for session, key_hash in events:
+            _bump_generation(store, session)
+            if key_hash is None:
+                _drop_session(store, session)
+                continue
+            bucket = store["sessions"].get(session)
+            for key in [k for k in (bucket or {}).get("entries", {}) if shared_cache.key_id(k) == key_hash]:
+                _drop_entry(store, session, key)
+
+
+def _load(session: str, key, loader, ttl: float | None, shared: bool) -> tuple:
+    """(waarde, resterende ttl, geladen_om, uit de gedeelde cache): eerst gedeeld, anders via `loader()`."""
+    hit = shared_cache.get(session, key) if shared else None
+    if hit is not None:
+        value, remaining = hit
+        age = max(0.0, ttl - remaining) if ttl is not None and remaining is not None else 0.0
+        return value, remaining, time.time() - age, True
+    return loader(), ttl, time.time(), False
+
+
+def _store_entry(store: dict, session: str, key, value, ttl: float | None, loaded_at: float,
+                 generation: int | None = None) -> bool:
+    """Bewaar een entry; False (niets bewaard) als de sessie sinds `generation` ongeldig is gemaakt."""
+    now = time.monotonic()
+    nbytes = estimate_size(value)
+    expires = now + ttl if ttl is not None else None
+    with store["lock"]:
+        if generation is not None and store["generations"].get(session, 0) != generation:
+            return False
+        bucket = store["sessions"].setdefault(session, {"entries": {}, "bytes": 0, "last_used": now})
+        store["sessions"].move_to_end(session)
+        _drop_entry(store, session, key)
+        bucket["entries"][key] = (value, nbytes, expires, loaded_at)
+        bucket["bytes"] += nbytes
+        store["bytes"] += nbytes
+        _evict(store, keep=session)
+    return True
+
+
+def remeasure(session: str, key) -> None:
+    """Meet een entry opnieuw nadat de waarde in-place gegroeid is, en houd het budget aan."""
+    store = _cache_store()
+    session = str(session)
+    with store["lock"]:
+        entry = (store["sessions"].get(session) or {"entries": {}})["entries"].get(key)
+    if entry is None:
+        return
+    nbytes = estimate_size(entry[0])  # buiten de lock: kan even duren
+    with store["lock"]:
+        bucket = store["sessions"].get(session)
+        if bucket is None or bucket["entries"].get(key) is not entry:
+            return  # intussen vervangen of verdrongen
+        bucket["entries"][key] = (entry[0], nbytes, entry[2], entry[3])
+        bucket["bytes"] += nbytes - entry[1]
+        store["bytes"] += nbytes - entry[1]
+        _evict(store, keep=session)
+
+
+def _claim(store: dict, session: str, key) -> tuple:
+    """(load, eigenaar): één lopende load per (sessie, key); wie niet de eigenaar is wacht erop."""
+    with store["lock"]:
+        load = store["loading"].get((session, key))
+        if load is not None:
+            return load, False
+        load = store["loading"][(session, key)] = {
+            "done": threading.Event(), "error": None, "generation": store["generations"].get(session, 0),
+        }
+        return load, True
+
+
+def _run_load(store: dict, session: str, key, loader, ttl: float | None, shared: bool, load: dict):
+    try:
+        value, remaining, loaded_at, from_shared = _load(session, key, loader, ttl, shared)
+        kept = _store_entry(store, session, key, value, remaining, loaded_at, load["generation"])
+        if kept and shared and not from_shared:
+            shared_cache.put(session, key, value, ttl=ttl)
+        return value
+    except Exception as e:
+        load["error"] = e
+        raise
+    finally:
+        with store["lock"]:
+            if store["loading"].get((session, key)) is load:
+                store["loading"].pop((session, key))
+        load["done"].set()
+
+
+def _refresh_in_background(store: dict, session: str, key, loader, ttl: float | None, shared: bool) -> None:
+    """Ververs één entry op de achtergrond, tenzij hij al geladen wordt."""
+    load, owner = _claim(store, session, key)
+    if not owner:
+        return
+
+    def refresh():
+        try:
+            _run_load(store, session, key, loader, ttl, shared, load)
+        except Exception:
+            pass  # de oude waarde blijft staan; de volgende lezer probeert het opnieuw
+
+    database.submit(refresh, background=True)
+
+
+def _lookup(store: dict, session: str, key):
+    now = time.monotonic()
+    with store["lock"]:
+        bucket = store["sessions"].get(session)
+        if bucket is None:
+            return None
+        bucket["last_used"] = now
+        store["sessions"].move_to_end(session)
+        return bucket["entries"].get(key)
+
+
+def get_or_load(session: str, key, loader, *, ttl: float | None = None, shared: bool = False,
+                revalidate: bool = False):
+    """
+    Waarde voor (sessie, key) uit de cache, of laad hem met `loader()` en bewaar hem.
+
+    Met `shared` wordt bij een lokale misser eerst de gedeelde cache (andere
+    replica's) geprobeerd en een nieuw geladen waarde daar ook bewaard.
+    Met `revalidate` komt een verlopen (maar niet te oude) waarde meteen terug en
+    wordt hij op de achtergrond ververst; `loader` moet dan bij een fout een
+    exception gooien in plaats van een lege waarde terug te geven.
+    Per (sessie, key) loopt hooguit één load: wie tegelijk mist wacht op die load
+    (en krijgt bij een fout dezelfde exception) in plaats van er nog een te starten.
+    Lezers delen hetzelfde object: pas een DataFrame niet in-place aan maar maak een kopie.
+    """
+    store = _cache_store()
+    session = str(session)
+    _apply_remote_invalidations(store)
+    while True:
+        hit = _lookup(store, session, key)
+        if hit is not None:
+            value, _, expires, loaded_at = hit
+            if expires is None or expires > time.monotonic():
+                return value
+            if revalidate and time.time() - loaded_at <= MAX_STALE_SECONDS:
+                _refresh_in_background(store, session, key, loader, ttl, shared)
+                return value
+
+        load, owner = _claim(store, session, key)
+        if owner:
+            return _run_load(store, session, key, loader, ttl, shared, load)
+        load["done"].wait()
+        if load["error"] is not None:
+            raise load["error"]
+        # anders staat de waarde nu in de cache (of is ze meteen weer verdrongen: opnieuw)
+
+
+def loaded_at(session: str, *keys) -> tuple:
+    """
+    (geladen_om, verlopen) over de gegeven keys: het tijdstip van de oudste waarde
+    (time.time(), None als er geen is) en of er één na zijn TTL getoond wordt.
+    """
+    store = _cache_store()
+    now = time.monotonic()
+    with store["lock"]:
+        bucket = store["sessions"].get(str(session)) or {"entries": {}}
+        hits = [bucket["entries"][k] for k in keys if k in bucket["entries"]]
+    if not hits:
+        return None, False
+    return min(h[3] for h in hits), any(h[2] is not None and h[2] <= now for h in hits)
+
+
+def data_badge(session: str, *keys) -> None:
+    """Toon 'data van hh:mm:ss' voor de oudste van de gegeven cache-entries."""
+    stamp, stale = loaded_at(session, *keys)
+    if stamp is None:
+        return
+    text = f"🕒 data van {datetime.fromtimestamp(stamp).strftime('%H:%M:%S')}"
+    if database.breaker_state()["state"] != "dicht":
+        text += " · de database reageert niet, dit is de laatst bekende stand"
+    elif stale:
+        text += " · wordt ververst"
+    st.caption(text)
+
+
+def session_cached(ttl: float | None = None, *, shared: bool = False, revalidate: bool = False):
+    """
+    Decorator in de stijl van st.cache_data voor functies met de sessie als eerste argument.
+
+    De cache-key is (bestand, functienaam, overige argumenten), zodat gelijknamige
+    functies op verschillende pagina's elkaar niet overschrijven. Het bestand staat
+    er relatief in, zodat de key in elke replica hetzelfde is; `fn.cache_key(*args)`
+    geeft hem terug (bijv. voor data_badge).
+    """
+    def decorator(fn):
+        origin = (os.path.basename(fn.__code__.co_filename), fn.__qualname__)
+
+        @functools.wraps(fn)
+        def wrapper(session, *args):
+            return get_or_load(session, (*origin, args), lambda: fn(session, *args), ttl=ttl, shared=shared,
+                               revalidate=revalidate)
+
+        wrapper.cache_key = lambda *args: (*origin, args)
+        return wrapper
+    return decorator
+
+
+def download(session: str, key, loader, *, ttl: float | None = None, shared: bool = False, grows=None):
+    """
+    Callable voor st.download_button(data=...) die de bytes via get_or_load maakt.
+
+    Streamlit roept hem pas later aan, in een thread zonder ScriptRunContext waarin
+    st.session_state leeg is: de sessie wordt hier al vastgelegd. `grows` is de key
+    van een entry die tijdens het laden in-place groeit en daarna opnieuw gemeten wordt.
+    """
+    session = str(session)
+
+    def data() -> bytes:
+        value = get_or_load(session, key, loader, ttl=ttl, shared=shared)
+        if grows is not None:
+            remeasure(session, grows)
+        return value
+
+    return data
+
+
+def invalidate(session: str, key=None, *, shared: bool = True) -> None:
+    """
+    Gooi één entry of (zonder key) alles van een sessie weg, bijv. als de sessie sluit.
+
+    Standaard ook in de gedeelde cache en dus in alle replica's; `shared=False`
+    geeft alleen het geheugen van dit proces vrij.
+    """
+    store = _cache_store()
+    with store["lock"]:
+        _bump_generation(store, str(session))
+        if key is None:
+            _drop_session(store, str(session))
+        else:
+            _drop_entry(store, str(session), key)
+    if shared:
+        shared_cache.invalidate(session, key)
+
+
+def usage() -> dict:
+    """Residente cachegrootte in bytes per sessie, grootste eerst."""
+    store = _cache_store()
+    with store["lock"]:
+        sizes = {s: b["bytes"] for s, b in store["sessions"].items()}
+    return dict(sorted(sizes.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def total_bytes() -> int:
+    return _cache_store()["bytes"]
@@ -0,0 +1,343 @@
+# shared_cache.py
+"""
+Gedeelde cache tussen meerdere Streamlit-replica's.
+
+`session_cache` en `st.cache_resource` leven per proces: met meerdere replica's
+achter een load balancer haalt elke replica dezelfde sessie opnieuw op en
+clustert hij opnieuw. Deze module legt een tweede laag onder session_cache die
+alle replica's delen. Het backend wordt gekozen met WERKSESSIE_SHARED_CACHE:
+    (leeg)                      uit; alleen de cache per proces
+    redis://host:6379/0         Redis (pakket `redis`)
+    sqlite:///pad/cache.db      lokaal SQLite-bestand, voor replica's op één host
+                                of als stand-in voor Redis bij het testen
+
+Keys zijn geversioneerd: <prefix>:<formaat>:<sessie>:<generatie>:<hash van de key>.
+Een sessie ongeldig maken verhoogt alleen haar generatie; oude waarden worden dan
+niet meer gelezen en verlopen vanzelf. Elke invalidatie wordt ook als bericht
+gepubliceerd, zodat de andere replica's hun eigen session_cache opruimen. Een
+replica leest de generatie bovendien hooguit POLL_INTERVAL oud: een gemist
+bericht (herstart van Redis, volle wachtrij) wordt zo toch opgemerkt en ook dan
+wordt de session_cache van die sessie opgeruimd.
+Fouten in het gedeelde backend worden geteld maar breken nooit een pagina af.
+
+Waarden zijn pickles, en pickle.loads kan willekeurige code uitvoeren: wie in het
+backend kan schrijven, kan code draaien in elke replica. Het backend moet dus
+vertrouwd en privé zijn (niet publiek bereikbaar, eigen wachtwoord). Met
+WERKSESSIE_SHARED_CACHE_KEY (in alle replica's gelijk) wordt elke waarde bovendien
+met een HMAC ondertekend; waarden met een onjuiste handtekening worden niet ingelezen.
+"""
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+SHARED_CACHE_URL = os.environ.get("WERKSESSIE_SHARED_CACHE", "")
+KEY_PREFIX = os.environ.get("WERKSESSIE_SHARED_PREFIX", "werksessie")
+# Verhogen als de vorm van gecachete waarden verandert; pandas-versie erbij
+# zodat replica's tijdens een uitrol geen pickles van een andere versie lezen.
+FORMAT_VERSION = f"1-pd{pd.__version__}"
+DEFAULT_TTL = 3600            # seconden; ook waarden zonder ttl verlopen ooit
+MAX_VALUE_BYTES = 32 * 1024 * 1024
+POLL_INTERVAL = 1.0           # seconden tussen twee checks op invalidatieberichten
+CHANNEL = f"{KEY_PREFIX}:invalidate"
+# Geheime sleutel voor de handtekening op gedeelde waarden; leeg: niet ondertekenen
+SIGNING_KEY = os.environ.get("WERKSESSIE_SHARED_CACHE_KEY", "").encode("utf-8")
+ORIGIN = uuid.uuid4().hex  # eigen berichten niet nog een keer verwerken
+
+
+# =======================
+# Backends
+# =======================
+class SQLiteBackend:
+    """Gedeeld SQLite-bestand (WAL); invalidatieberichten in een tabel met oplopend id."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                          "body TEXT, created REAL)")
+        with self.lock:
+            self.last_message = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+
+    def get(self, key: str) -> bytes | None:
+        with self.lock:
+            row = self.conn.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        now = time.time()
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, value, now + ttl))
+            # Af en toe verlopen waarden en oude berichten opruimen
+            if hash(key) % 50 == 0:
+                self.conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+                self.conn.execute("DELETE FROM messages WHERE created <= ?", (now - DEFAULT_TTL,))
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def get_counter(self, key: str) -> int:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, key: str) -> int:
+        with self.lock:
+            self.conn.execute("INSERT INTO counters VALUES (?, 1) "
+                              "ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,))
+            return self.conn.execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()[0]
+
+    def publish(self, body: str) -> None:
+        with self.lock:
+            self.conn.execute("INSERT INTO messages (body, created) VALUES (?, ?)", (body, time.time()))
+
+    def messages(self) -> list:
+        with self.lock:
+            rows = self.conn.execute("SELECT id, body FROM messages WHERE id > ? ORDER BY id",
+                                     (self.last_message,)).fetchall()
+            if rows:
+                self.last_message = rows[-1][0]
+        return [body for _, body in rows]
+
+
+class RedisBackend:
+    """Redis (of een protocol-compatibele server) met pub/sub voor invalidaties."""
+
+    def __init__(self, url: str):
+        import redis  # alleen nodig als Redis echt gebruikt wordt
+
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(CHANNEL)
+        self.lock = threading.Lock()  # pubsub-verbinding is niet thread-safe
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(key, value, ex=max(1, int(ttl)))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def get_counter(self, key: str) -> int:
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(key))
+
+    def publish(self, body: str) -> None:
+        self.client.publish(CHANNEL, body)
+
+    def messages(self) -> list:
+        bodies = []
+        with self.lock:
+            while (message := self.pubsub.get_message(timeout=0)) is not None:
+                data = message.get("data")
+                bodies.append(data.decode("utf-8") if isinstance(data, bytes) else str(data))
+        return bodies
+
+
+def make_backend(url: str):
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    return SQLiteBackend(url.removeprefix("sqlite:///") if url.startswith("sqlite:///") else url)
+
+
+# =======================
+# Procesbrede toestand
+# =======================
+@st.cache_resource
+def _shared_store() -> dict:
+    # generations: sessie -> (generatie zoals dit proces haar kent, time.monotonic() van het lezen)
+    # missed: sessies waarvan een hogere generatie gelezen is dan de berichten meldden
+    store = {"lock": threading.Lock(), "backend": None, "generations": {}, "missed": [],
+             "last_poll": 0.0, "stats": Counter()}
+    try:
+        store["backend"] = make_backend(SHARED_CACHE_URL)
+    except Exception:
+        store["stats"]["fouten"] += 1
+    return store
+
+
+def enabled() -> bool:
+    return _shared_store()["backend"] is not None
+
+
+def key_id(key) -> str:
+    """Stabiele hash van een cache-key (tuple, string, ...) die in elke replica gelijk is."""
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+
+
+def _set_generation(store: dict, session: str, generation: int) -> None:
+    """Onthoud een (niet lagere) generatie (aanroepen met store["lock"])."""
+    current = store["generations"].get(session, (0, 0.0))[0]
+    store["generations"][session] = (max(current, generation), time.monotonic())
+
+
+def _generation(store: dict, session: str) -> int:
+    """De generatie van een sessie; hooguit POLL_INTERVAL oud, anders opnieuw uit het backend gelezen."""
+    with store["lock"]:
+        known = store["generations"].get(session)
+    if known is not None and time.monotonic() - known[1] < POLL_INTERVAL:
+        return known[0]
+    generation = store["backend"].get_counter(f"{KEY_PREFIX}:gen:{session}")
+    with store["lock"]:
+        if known is not None and generation > store["generations"].get(session, known)[0]:
+            store["missed"].append(session)  # geen bericht gezien: lokale cache ook opruimen
+        _set_generation(store, session, generation)
+        return store["generations"][session][0]
+
+
+def versioned_key(session: str, key) -> str:
+    store = _shared_store()
+    return f"{KEY_PREFIX}:{FORMAT_VERSION}:{session}:{_generation(store, session)}:{key_id(key)}"
+
+
+def _signature(key: str, payload: bytes) -> bytes:
+    # De key zit in de handtekening, zodat een waarde niet onder een andere key te zetten is
+    return hmac.new(SIGNING_KEY, key.encode("utf-8") + b"\0" + payload, hashlib.sha256).digest()
+
+
+def _seal(key: str, payload: bytes) -> bytes:
+    return _signature(key, payload) + payload if SIGNING_KEY else payload
+
+
+def _unseal(key: str, data: bytes) -> bytes | None:
+    """De pickle uit `data`, of None als de handtekening niet klopt."""
+    if not SIGNING_KEY:
+        return data
+    signature, payload = data[:32], data[32:]
+    return payload if hmac.compare_digest(signature, _signature(key, payload)) else None
+
+
+def get(session: str, key) -> tuple | None:
+    """
+    (waarde, resterende ttl) uit de gedeelde cache, of None (ook als het backend uit staat of faalt).
+
+    De resterende ttl is None voor waarden zonder ttl; zo wordt een waarde die een
+    andere replica al even bewaarde lokaal niet langer bewaard dan bedoeld.
+    """
+    store = _shared_store()
+    if store["backend"] is None:
+        return None
+    try:
+        vkey = versioned_key(str(session), key)
+        data = store["backend"].get(vkey)
+        payload = _unseal(vkey, data) if data is not None else None
+        if data is not None and payload is None:
+            store["stats"]["ongeldig"] += 1
+            return None
+        hit = pickle.loads(payload) if payload is not None else None
+    except Exception:
+        store["stats"]["fouten"] += 1
+        return None
+    store["stats"]["hits" if hit is not None else "misses"] += 1
+    if hit is None:
+        return None
+    expires, value = hit
+    return value, (None if expires is None else max(0.0, expires - time.time()))
+
+
+def put(session: str, key, value, *, ttl: float | None = None) -> None:
+    store = _shared_store()
+    if store["backend"] is None:
+        return
+    try:
+        expires = time.time() + ttl if ttl is not None else None
+        data = pickle.dumps((expires, value), protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > MAX_VALUE_BYTES:
+            store["stats"]["te groot"] += 1
+            return
+        vkey = versioned_key(str(session), key)
+        store["backend"].set(vkey, _seal(vkey, data), ttl or DEFAULT_TTL)
+        store["stats"]["geschreven"] += 1
+    except Exception:
+        store["stats"]["fouten"] += 1
+
+
+def invalidate(session: str, key=None) -> None:
+    """
+    Maak één key of (zonder key) de hele sessie in alle replica's ongeldig.
+
+    Eén key wordt verwijderd; voor een hele sessie gaat de generatie omhoog.
+    """
+    store = _shared_store()
+    if store["backend"] is None:
+        return
+    session = str(session)
+    try:
+        if key is None:
+            generation = store["backend"].incr(f"{KEY_PREFIX}:gen:{session}")
+            with store["lock"]:
+                _set_generation(store, session, generation)
+            message = {"origin": ORIGIN, "session": session, "generation": generation}
+        else:
+            store["backend"].delete(versioned_key(session, key))
+            message = {"origin": ORIGIN, "session": session, "key": key_id(key)}
+        store["backend"].publish(json.dumps(message))
+    except Exception:
+        store["stats"]["fouten"] += 1
+
+
+def poll_invalidations() -> list:
+    """
+    Nieuwe invalidaties van andere replica's (hooguit één keer per POLL_INTERVAL).
+
+    Geeft (sessie, key-hash of None) terug; de generatie per sessie wordt hier al bijgewerkt.
+    Sessies waarvan _generation een gemiste invalidatie zag, komen mee als (sessie, None).
+    """
+    store = _shared_store()
+    if store["backend"] is None:
+        return []
+    now = time.monotonic()
+    with store["lock"]:
+        if now - store["last_poll"] < POLL_INTERVAL:
+            return []
+        store["last_poll"] = now
+        events = [(session, None) for session in dict.fromkeys(store["missed"])]
+        store["missed"].clear()
+    try:
+        bodies = store["backend"].messages()
+    except Exception:
+        store["stats"]["fouten"] += 1
+        return events
+    for body in bodies:
+        try:
+            message = json.loads(body)
+        except ValueError:
+            continue
+        session = str(message.get("session"))
+        if message.get("origin") == ORIGIN:
+            continue
+        if "generation" in message:
+            with store["lock"]:
+                _set_generation(store, session, int(message["generation"]))
+        events.append((session, message.get("key")))
+    store["stats"]["invalidaties ontvangen"] += len(events)
+    return events
+
+
+def stats() -> dict:
+    store = _shared_store()
+    backend = store["backend"]
+    return {"backend": type(backend).__name__ if backend else "uit", **store["stats"]}
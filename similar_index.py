@@ -0,0 +1,183 @@
+# similar_index.py
+"""
+Suggesties van vergelijkbare effecten tijdens het typen op de domeinpagina's.
+
+Per (sessie, domein) staat een inverted index van letter-trigrammen in het
+procesbrede geheugen. Hij wordt gevuld vanuit alle effecten in de database
+(gepagineerd) en daarna bij elk opslaan of verwijderen incrementeel bijgewerkt.
+Elke REFRESH_TTL seconden wordt hij opnieuw gevuld, zodat ook effecten uit
+andere replica's meedoen. Tijdens het vullen blijft de vorige index antwoorden;
+wijzigingen die dan binnenkomen worden bijgehouden en na het vullen opnieuw
+toegepast, zodat ze niet verloren gaan. Een zoekvraag telt
+alleen de documenten op de postings van de trigrammen uit de zoektekst en
+scoort die met de Dice-coëfficiënt; er wordt niets met alle teksten vergeleken.
+"""
+import threading
+import time
+from collections import Counter
+
+import streamlit as st
+
+import database
+from aggregation import norm_text
+
+NGRAM = 3
+MIN_QUERY_CHARS = 4  # kortere teksten geven vooral ruis
+MIN_SIMILARITY = 0.35
+REFRESH_TTL = 60  # seconden; daarna wordt een index bij de volgende seed opnieuw gevuld
+
+
+@st.cache_resource
+def _index_store() -> dict:
+    # indexes: (sessie, domein) -> {"docs": {id: (tekst, genormaliseerd, grams)}, "postings": {gram: set(id)},
+    #                              "loaded_at": float}
+    # refreshing: (sessie, domein) -> wijzigingen [(id, tekst of None)] tijdens een lopende vulling
+    return {"lock": threading.Lock(), "indexes": {}, "refreshing": {}}
+
+
+def ngrams(norm: str) -> frozenset:
+    """Letter-trigrammen van een genormaliseerde tekst, met spatie als woordgrens."""
+    if not norm:
+        return frozenset()
+    padded = f" {norm} "
+    return frozenset(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+
+
+def _put(index: dict, doc_id, text: str, norm: str | None = None) -> None:
+    _drop(index, doc_id)
+    norm = norm_text(text) if norm is None else norm
+    grams = ngrams(norm)
+    if not grams:
+        return
+    index["docs"][doc_id] = (text, norm, grams)
+    for g in grams:
+        index["postings"].setdefault(g, set()).add(doc_id)
+
+
+def _drop(index: dict, doc_id) -> None:
+    doc = index["docs"].pop(doc_id, None)
+    if doc is None:
+        return
+    for g in doc[2]:
+        ids = index["postings"].get(g)
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del index["postings"][g]
+
+
+def _apply(index: dict, doc_id, text: str | None) -> None:
+    """Eén wijziging: opslaan met `text`, of verwijderen als `text` None is."""
+    if text is None:
+        _drop(index, doc_id)
+    else:
+        _put(index, doc_id, text)
+
+
+def _key(session, domain) -> tuple:
+    return str(session), str(domain)
+
+
+def is_seeded(session: str, domain: str) -> bool:
+    return _key(session, domain) in _index_store()["indexes"]
+
+
+def seed(session: str, domain: str) -> None:
+    """
+    Vul de index met alle effecten van deze sessie en dit domein, opnieuw na REFRESH_TTL seconden.
+
+    Hooguit één vulling per index tegelijk; de anderen gebruiken zolang de vorige index.
+    """
+    store = _index_store()
+    key = _key(session, domain)
+    with store["lock"]:
+        index = store["indexes"].get(key)
+        if index is not None and time.monotonic() - index["loaded_at"] < REFRESH_TTL:
+            return
+        if key in store["refreshing"]:
+            return
+        store["refreshing"][key] = []
+    try:
+        rows = database.fetch_all(
+            "submissions",
+            {"select": "id,text", "session": f"eq.{session}", "domain": f"eq.{domain}", "order": "id.asc"},
+        )
+    except RuntimeError:
+        with store["lock"]:
+            store["refreshing"].pop(key, None)
+        return  # later opnieuw proberen; zonder index zijn er alleen geen suggesties
+    index = {"docs": {}, "postings": {}, "loaded_at": time.monotonic()}
+    texts = [row.get("text") or "" for row in rows]
+    for row, text, norm in zip(rows, texts, norm_text(texts)):
+        _put(index, row.get("id"), text, norm)
+    with store["lock"]:
+        # Wat tijdens het ophalen is opgeslagen of verwijderd, kan in `rows` ontbreken
+        for doc_id, text in store["refreshing"].pop(key, []):
+            _apply(index, doc_id, text)
+        store["indexes"][key] = index
+
+
+def _change(session: str, domain: str, doc_id, text: str | None) -> None:
+    store = _index_store()
+    key = _key(session, domain)
+    with store["lock"]:
+        if key in store["refreshing"]:
+            store["refreshing"][key].append((doc_id, text))
+        index = store["indexes"].get(key)
+        if index is not None:
+            _apply(index, doc_id, text)
+
+
+def add(session: str, domain: str, doc_id, text: str) -> None:
+    """Verwerk een opgeslagen of gewijzigd effect (genegeerd zolang de index niet gevuld is)."""
+    if doc_id is not None:
+        _change(session, domain, doc_id, text or "")
+
+
+def remove(session: str, domain: str, doc_id) -> None:
+    _change(session, domain, doc_id, None)
+
+
+def forget(session: str) -> None:
+    """Geef de indexen van alle domeinen van een sessie vrij; ze worden zo nodig opnieuw gevuld."""
+    store = _index_store()
+    with store["lock"]:
+        for key in [k for k in store["indexes"] if k[0] == str(session)]:
+            del store["indexes"][key]
+
+
+def similar(session: str, domain: str, text: str, *, limit: int = 3,
+            min_similarity: float = MIN_SIMILARITY, exclude=None) -> list:
+    """
+    Bestaande effecten die op `text` lijken, meest vergelijkbare eerst.
+
+    Geeft dicts met text, similarity en count (hoe vaak dezelfde tekst al is ingevoerd).
+    """
+    query_norm = norm_text(text)
+    if len(query_norm) < MIN_QUERY_CHARS:
+        return []
+    query = ngrams(query_norm)
+    store = _index_store()
+    with store["lock"]:
+        index = store["indexes"].get(_key(session, domain))
+        if index is None:
+            return []
+        shared = Counter()
+        for g in query:
+            shared.update(index["postings"].get(g, ()))
+        scored = {}
+        for doc_id, n in shared.items():
+            if doc_id == exclude:
+                continue
+            doc_text, norm, grams = index["docs"][doc_id]
+            similarity = 2 * n / (len(query) + len(grams))
+            if similarity < min_similarity:
+                continue
+            # Identieke teksten (na normalisatie) één keer tonen
+            best = scored.get(norm)
+            if best is None:
+                scored[norm] = {"text": doc_text.strip(), "similarity": similarity, "count": 1}
+            else:
+                best["count"] += 1
+                best["similarity"] = max(best["similarity"], similarity)
+    return sorted(scored.values(), key=lambda s: (-s["similarity"], -s["count"]))[:limit]
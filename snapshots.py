@@ -0,0 +1,219 @@
+# snapshots.py
+"""
+Onveranderlijke lokale snapshots van afgesloten sessies.
+
+Na afloop van een werksessie verandert haar data niet meer. "Sessie afsluiten"
+(pages/15 of `python snapshots.py CODE`) schrijft alle tabellen van de sessie als
+Arrow IPC-bestanden weg, plus de voorberekende scoreaggregaten, in een nieuwe map
+per versie; daarna wijst het manifest in één keer (os.replace) naar die versie:
+    <SNAPSHOT_DIR>/<code>/manifest.json                        {"dir": "v...", ...}
+    <SNAPSHOT_DIR>/<code>/v<tijdstip>/submissions.arrow, ..., aggregates.json
+Lezers zien dus altijd een volledige snapshot: de oude tot het manifest omgaat,
+daarna de nieuwe. De vorige versie blijft staan voor lezers die haar nog open
+hebben; oudere versies worden opgeruimd. (Snapshots van vóór de versiemappen
+hebben geen "dir" en staan direct in <code>/.)
+Latere bezoeken aan pages/9 en pages/14 lezen die bestanden via memory-mapping:
+geen netwerk, en Arrow-kolommen hoeven niet geparsed te worden.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+import columnar_export
+import database
+import score_aggregates
+import session_cache
+
+SNAPSHOT_DIR = Path(os.environ.get("WERKSESSIE_SNAPSHOT_DIR", "snapshots"))
+SNAPSHOT_TABLES = tuple(columnar_export.TABLES)
+FORMAT_VERSION = 1
+
+
+@st.cache_resource
+def _mapped_tables() -> dict:
+    # (sessie, versie, tabel) -> pyarrow.Table op een memory-mapped bestand
+    return {"lock": threading.Lock(), "tables": {}}
+
+
+def snapshot_dir(session: str, root=None) -> Path:
+    return Path(root or SNAPSHOT_DIR) / quote(str(session), safe="")
+
+
+def is_closed(session: str, root=None) -> bool:
+    return (snapshot_dir(session, root) / "manifest.json").exists()
+
+
+def manifest(session: str, root=None) -> dict | None:
+    path = snapshot_dir(session, root) / "manifest.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def data_dir(session: str, root=None) -> Path:
+    """De map met de bestanden van de huidige versie van de snapshot."""
+    info = manifest(session, root) or {}
+    return snapshot_dir(session, root) / info.get("dir", ".")
+
+
+def _prune(target: Path, keep: set) -> None:
+    """Ruim versiemappen op behalve `keep` (de huidige en de vorige)."""
+    for path in target.iterdir():
+        if path.is_dir() and path.name.startswith("v") and path.name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _fetch_session(session: str) -> dict:
+    """Alle tabellen van een sessie tegelijk en volledig (gepagineerd) ophalen."""
+    def loader(table):
+        params = {
+            "select": ",".join(["session"] + [name for name, _ in columnar_export.TABLES[table]["fields"]]),
+            "session": f"eq.{session}",
+            "order": columnar_export.TABLES[table]["order"],
+        }
+        return lambda: database.fetch_all(table, params)
+
+    loaders = {table: loader(table) for table in SNAPSHOT_TABLES}
+    loaders["session_meta"] = lambda: database.fetch_session_meta([session])
+    fetched, errors = database.fetch_concurrently(loaders, deadline=120)
+    if errors:
+        raise RuntimeError("; ".join(f"{name}: {e}" for name, e in errors.items()))
+    return fetched
+
+
+def write_snapshot(session: str, tables: dict, meta: dict | None = None, *, root=None) -> Path:
+    """
+    Schrijf een snapshot uit reeds opgehaalde rijen ({tabel: [rij, ...]}).
+
+    Eerst naar een tijdelijke map, die als nieuwe versie wordt hernoemd; daarna
+    wijst het manifest in één keer naar die versie, zodat lezers nooit een halve
+    of ontbrekende snapshot zien. Geeft de map van de nieuwe versie.
+    """
+    target = snapshot_dir(session, root)
+    previous = (manifest(session, root) or {}).get("dir")
+    version = datetime.now(timezone.utc).strftime("v%Y%m%dT%H%M%S%fZ")
+    tmp = target / f".{version}.tmp"
+    tmp.mkdir(parents=True)
+
+    counts = {}
+    for table in SNAPSHOT_TABLES:
+        rows = tables.get(table) or []
+        schema = columnar_export.table_schema(table)
+        data = pa.Table.from_batches([columnar_export.rows_to_batch(rows, table)], schema=schema)
+        with pa.OSFile(str(tmp / f"{table}.arrow"), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            writer.write_table(data)
+        counts[table] = len(rows)
+
+    # Uit de ontdubbelde inzendingen, net als pages/9 en score_aggregates.seed_session
+    state = score_aggregates.compute_state(score_aggregates.dedupe(pd.DataFrame(tables.get("submissions") or [])))
+    (tmp / "aggregates.json").write_text(
+        json.dumps({"domain": state["domain"], "user": state["user"]}, ensure_ascii=False), encoding="utf-8"
+    )
+    os.replace(tmp, target / version)
+
+    manifest_tmp = target / "manifest.json.tmp"
+    manifest_tmp.write_text(json.dumps({
+        "session": str(session),
+        "format_version": FORMAT_VERSION,
+        "closed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "dir": version,
+        "rows": counts,
+        "meta": meta or {},
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(manifest_tmp, target / "manifest.json")
+    _prune(target, {version, previous})
+    return target / version
+
+
+def close_session(session: str, *, root=None) -> dict:
+    """Haal de sessie op, schrijf de snapshot en laat de pagina's voortaan de snapshot lezen."""
+    fetched = _fetch_session(session)
+    meta = (fetched.pop("session_meta") or [{}])[0]
+    write_snapshot(session, fetched, meta, root=root)
+    forget(session)
+    return manifest(session, root)
+
+
+def forget(session: str) -> None:
+    """Gooi de live-caches van een sessie weg (na afsluiten of opnieuw openen)."""
+    session_cache.invalidate(session)
+    score_aggregates.invalidate_session(session)
+    store = _mapped_tables()
+    with store["lock"]:
+        for key in [k for k in store["tables"] if k[0] == str(session)]:
+            del store["tables"][key]
+
+
+def read_table(session: str, table: str, *, root=None) -> pa.Table:
+    """De Arrow-tabel van een afgesloten sessie, memory-mapped en per proces één keer per versie geopend."""
+    store = _mapped_tables()
+    directory = data_dir(session, root)
+    key = (str(session), directory.name, table)
+    with store["lock"]:
+        cached = store["tables"].get(key)
+    if cached is not None:
+        return cached
+    source = pa.memory_map(str(directory / f"{table}.arrow"), "r")
+    data = pa.ipc.open_file(source).read_all()
+    with store["lock"]:
+        store["tables"].setdefault(key, data)
+    return data
+
+
+def load_frame(session: str, table: str, *, root=None) -> pd.DataFrame:
+    """
+    Zelfde vorm als een frame uit Supabase (met de sessiekolom), dictionaries als categoricals.
+
+    Eén keer per proces en per versie omgezet en in session_cache bewaard (gedeeld
+    object: niet in-place aanpassen). Een nieuwe snapshot uit een andere replica
+    krijgt zo vanzelf een nieuwe key.
+    """
+    def load():
+        df = read_table(session, table, root=root).to_pandas()
+        df.insert(0, "session", pd.Categorical([str(session)] * len(df)))
+        return df
+
+    return session_cache.get_or_load(session, ("snapshot", data_dir(session, root).name, table), load)
+
+
+def restore_aggregates(session: str, *, root=None) -> None:
+    """Zet de voorberekende scoreaggregaten terug in score_aggregates (zonder inzendingen te lezen)."""
+    if score_aggregates.is_seeded(session):
+        return
+    path = data_dir(session, root) / "aggregates.json"
+    score_aggregates.restore_session(session, json.loads(path.read_text(encoding="utf-8")))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sluit sessies af in een lokale, onveranderlijke snapshot.")
+    parser.add_argument("codes", nargs="+", help="toegangscodes van de sessies")
+    parser.add_argument("--dir", default=str(SNAPSHOT_DIR), help="map voor de snapshots")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for code in args.codes:
+        try:
+            fetched = _fetch_session(code)
+            meta = (fetched.pop("session_meta") or [{}])[0]
+            target = write_snapshot(code, fetched, meta, root=args.dir)
+        except Exception as e:
+            print(f"  ✗ {code}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        rows = manifest(code, args.dir)["rows"]
+        print(f"  ✓ {code}: {sum(rows.values())} rijen → {target}")
+    return 0 if not failed else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
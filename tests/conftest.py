@@ -0,0 +1,159 @@
+# De modules staan plat in de root van de repo
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import database  # noqa: E402
+
+
+# =======================
+# Nep-PostgREST in het geheugen
+# =======================
+def _value(raw: str):
+    raw = raw.strip('"')
+    try:
+        return int(raw)
+    except ValueError:
+        return raw
+
+
+def _compare(x, op: str, raw: str) -> bool:
+    if op == "is":
+        return x is None if raw == "null" else str(x).lower() == raw
+    if x is None:
+        return False
+    if op == "in":
+        return str(x) in [v.strip('"') for v in re.findall(r'"[^"]*"|[^,]+', raw.strip("()"))]
+    if op == "like":
+        pattern = re.escape(raw).replace(r"\*", ".*").replace(r"\\_", "_").replace(r"\\\\", r"\\")
+        return re.fullmatch(pattern, str(x)) is not None
+    y = _value(raw)
+    if isinstance(y, int) and not isinstance(x, int):
+        try:
+            x = int(x)
+        except (TypeError, ValueError):
+            y = str(y)
+    elif isinstance(x, int) and not isinstance(y, int):
+        x = str(x)
+    return {"eq": x == y, "neq": x != y, "lt": x < y, "lte": x <= y, "gt": x > y, "gte": x >= y}[op]
+
+
+def _condition(row: dict, column: str, expr: str) -> bool:
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, raw = expr.split(".", 1)
+    return _compare(row.get(column), op, raw) != negate
+
+
+def _or(row: dict, expr: str) -> bool:
+    parts = re.findall(r'[^,(]+\.[a-z]+\.(?:"[^"]*"|[^,)]+)', expr.strip("()"))
+    return any(_condition(row, *part.split(".", 1)) for part in parts)
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body=None, headers=None):
+        self.status_code = status_code
+        self._body = body
+        self.headers = headers or {}
+        self.text = "" if body is None else str(body)
+
+    def json(self):
+        return self._body
+
+
+class FakePostgrest:
+    """Genoeg PostgREST voor de modules hier: filters, order, limit/offset, upsert, count en DELETE."""
+
+    PLAIN = {"select", "order", "limit", "offset", "on_conflict"}
+
+    def __init__(self):
+        self.tables = {}
+        self.next_id = 1
+        self.calls = []
+        self.fail = {}  # (methode, tabel) -> statuscode of exception
+
+    def insert(self, table: str, *rows) -> list:
+        out = []
+        for row in rows:
+            row = dict(row)
+            if "id" not in row:
+                row["id"] = self.next_id
+                self.next_id += 1
+            self.tables.setdefault(table, []).append(row)
+            out.append(row)
+        return out
+
+    def rows(self, table: str) -> list:
+        return self.tables.get(table, [])
+
+    def _match(self, row: dict, params: dict) -> bool:
+        for key, expr in params.items():
+            if key in self.PLAIN:
+                continue
+            if key == "or":
+                if not _or(row, expr):
+                    return False
+            elif key == "and":
+                if not all(_condition(row, *p.split(".", 1)) for p in expr.strip("()").split(",")):
+                    return False
+            elif not _condition(row, key, str(expr)):
+                return False
+        return True
+
+    def _select(self, table: str, params: dict) -> list:
+        found = [row for row in self.rows(table) if self._match(row, params)]
+        for part in reversed([p for p in params.get("order", "").split(",") if p]):
+            column, _, direction = part.partition(".")
+            found.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=direction.startswith("desc"))
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        found = found[offset:offset + int(limit)] if limit is not None else found[offset:]
+        columns = [c for c in params.get("select", "*").split(",") if c != "*"]
+        return [{c: row.get(c) for c in columns} if columns else dict(row) for row in found]
+
+    def request(self, method: str, url: str, *, headers=None, params=None, json=None, **kwargs):
+        table = url.rstrip("/").rsplit("/", 1)[-1]
+        params = {k: str(v) for k, v in (params or {}).items()}
+        self.calls.append((method, table, params))
+        failure = self.fail.get((method, table))
+        if isinstance(failure, Exception):
+            raise failure
+        if failure is not None:
+            return FakeResponse(failure, "fout")
+        prefer = (headers or {}).get("Prefer", "")
+        if method in ("GET", "HEAD"):
+            found = self._select(table, params)
+            total = len([r for r in self.rows(table) if self._match(r, params)])
+            headers = {"Content-Range": f"0-{max(len(found) - 1, 0)}/{total}"}
+            return FakeResponse(200, found if method == "GET" else None, headers)
+        if method == "POST":
+            keys = params.get("on_conflict", "id").split(",")
+            for row in json if isinstance(json, list) else [json]:
+                existing = [r for r in self.rows(table) if all(k in row and r.get(k) == row[k] for k in keys)]
+                if existing:
+                    existing[0].update(row)
+                else:
+                    self.insert(table, row)
+            return FakeResponse(201, json if "return=representation" in prefer else None)
+        if method == "DELETE":
+            gone = [r for r in self.rows(table) if self._match(r, params)]
+            self.tables[table] = [r for r in self.rows(table) if not self._match(r, params)]
+            if "return=representation" in prefer:
+                return FakeResponse(200, [dict(r) for r in gone])
+            return FakeResponse(204)
+        raise AssertionError(f"onbekende methode {method}")
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Vervang de Supabase-requests van database.py door een nep-PostgREST in het geheugen."""
+    db = FakePostgrest()
+    monkeypatch.setattr(database, "base_url", lambda: "http://nep")
+    monkeypatch.setattr(database, "headers", lambda prefer="", json_body=False: {"Prefer": prefer})
+    monkeypatch.setattr(database, "request", lambda method, url, **kw: db.request(method, url, **kw))
+    return db
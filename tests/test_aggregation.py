@@ -0,0 +1,296 @@
+"""
+Equivalentie van aggregation.py met de helpers die vóór de gedeelde module in
+pages/11, 12 en 13 stonden. De oude implementaties staan hieronder letterlijk
+(als referentie) en worden met vaste en willekeurige invoer vergeleken.
+"""
+import math
+import random
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import (
+    aggregate_votes,
+    majority_posneg,
+    majority_sign,
+    norm_text,
+    text_polarity,
+    top_by_polarity,
+)
+
+
+# =======================
+# Oude implementaties (referentie)
+# =======================
+def old_majority_posneg_11(series):
+    """pages/11: meerderheid van {-1, 0, 1}; bij gelijkstand/geen waarden -> 0."""
+    if series is None or len(series) == 0:
+        return 0
+    vals = []
+    for v in series.tolist():
+        if pd.isna(v) or str(v).strip() == "":
+            continue
+        try:
+            vv = int(float(v))
+            if vv in (-1, 1):
+                vals.append(vv)
+            elif vv == 0:
+                vals.append(0)
+        except Exception:
+            continue
+    if not vals:
+        return 0
+    cnt = Counter(vals)
+    mc = cnt.most_common()
+    if len(mc) >= 2 and mc[0][1] == mc[1][1]:
+        return 0
+    return mc[0][0] if mc[0][0] in (-1, 0, 1) else 0
+
+
+def old_majority_posneg_12(series):
+    """pages/12 en 13: meerderheid van {-1, 1}; bij gelijkstand/geen waarden -> None."""
+    if series is None or len(series) == 0:
+        return None
+    vals = []
+    for v in series:
+        if pd.isna(v):
+            continue
+        try:
+            vv = int(float(v))
+            if vv in (-1, 1):
+                vals.append(vv)
+        except Exception:
+            continue
+    if not vals:
+        return None
+    cnt = Counter(vals)
+    mc = cnt.most_common()
+    if len(mc) >= 2 and mc[0][1] == mc[1][1]:
+        return None
+    return mc[0][0]
+
+
+def old_as_posneg_int(val):
+    try:
+        if val is None or (isinstance(val, float) and math.isnan(val)):
+            return None
+        v = int(val)
+        return v if v in (-1, 1) else None
+    except Exception:
+        return None
+
+
+def old_norm_text_11(s):
+    if not isinstance(s, str):
+        return ""
+    return re.sub(r"\s+", " ", s.strip().lower())
+
+
+def old_norm_text_12(s):
+    if s is None:
+        return ""
+    s = str(s).strip().lower()
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def old_pipeline_13(df_votes, df_sub, n):
+    """Ranglijst zoals pages/13 (en met n=3 pages/12) die berekende."""
+    df_sub = df_sub.copy()
+    df_sub["text_norm"] = df_sub["text"].map(old_norm_text_12)
+    sub_agg = (
+        df_sub.groupby("text_norm", dropna=False)["posneg"]
+        .apply(old_majority_posneg_12)
+        .reset_index(name="posneg_majority")
+    )
+    posneg_from_sub = {
+        row["text_norm"]: row["posneg_majority"]
+        for _, row in sub_agg.iterrows()
+        if row["text_norm"] != ""
+    }
+    agg = (
+        df_votes.groupby("group_id", dropna=False)
+        .agg(
+            votes=("votes", "sum"),
+            text=("text", "first"),
+            domein=("domein", "first"),
+            posneg_votes=("posneg", old_majority_posneg_12),
+        )
+        .reset_index()
+    )
+    agg["text_norm"] = agg["text"].map(old_norm_text_12)
+    agg["posneg_from_sub"] = agg["text_norm"].map(posneg_from_sub)
+
+    def pick_polarity(row):
+        if pd.notna(row.get("posneg_from_sub")):
+            return old_as_posneg_int(row["posneg_from_sub"])
+        return old_as_posneg_int(row.get("posneg_votes"))
+
+    agg["posneg_resolved"] = agg.apply(pick_polarity, axis=1)
+    top_pos = agg[agg["posneg_resolved"] == 1].sort_values("votes", ascending=False).head(n).reset_index(drop=True)
+    top_neg = agg[agg["posneg_resolved"] == -1].sort_values("votes", ascending=False).head(n).reset_index(drop=True)
+    unknown = agg[agg["posneg_resolved"].isna()].sort_values("votes", ascending=False).reset_index(drop=True)
+    return top_pos, top_neg, unknown
+
+
+def new_pipeline_13(df_votes, df_sub, n):
+    posneg_from_sub = text_polarity(df_sub["text"], df_sub["posneg"], majority=majority_sign)
+    return top_by_polarity(aggregate_votes(df_votes, posneg_from_sub), n)
+
+
+# =======================
+# Testdata
+# =======================
+POSNEG_SAMPLES = [1, -1, 0, "1", "-1", "0", 1.0, -1.0, 0.7, -1.9, 2, "x", "", " ", None, np.nan]
+# Alleen strings: ontbrekende teksten zijn een bewuste gedragswijziging (zie onder)
+TEXTS = ["Meer groen", "meer  groen ", "MEER GROEN", "Minder verkeer", "minder verkeer", "", "  "]
+
+
+def random_frames(rng: random.Random, n_votes=40, n_sub=30):
+    groups = [f"S_1_{i}" for i in range(8)]
+    texts = {g: rng.choice(TEXTS) for g in groups}
+    votes = pd.DataFrame({
+        "group_id": [rng.choice(groups) for _ in range(n_votes)],
+        "votes": [rng.choice([0, 1, 1, 2]) for _ in range(n_votes)],
+        "domein": [rng.choice(["Wonen", "Milieu"]) for _ in range(n_votes)],
+        "posneg": [rng.choice([1, -1, None, 0]) for _ in range(n_votes)],
+    })
+    votes["text"] = votes["group_id"].map(texts)
+    sub = pd.DataFrame({
+        "text": [rng.choice(TEXTS) for _ in range(n_sub)],
+        "posneg": [rng.choice(POSNEG_SAMPLES) for _ in range(n_sub)],
+    })
+    return votes, sub
+
+
+def _ids(frame):
+    return frame["group_id"].tolist()
+
+
+def _resolved(frame):
+    return [None if pd.isna(v) else int(v) for v in frame["posneg_resolved"]]
+
+
+# =======================
+# Normalisatie
+# =======================
+@pytest.mark.parametrize("value", ["  Meer   Groen\t", "a\nb", "", "ÉÉN", "x y"])
+def test_norm_text_strings_match_old(value):
+    assert norm_text(value) == old_norm_text_11(value) == old_norm_text_12(value)
+
+
+def test_norm_text_series_matches_scalar():
+    s = pd.Series(["  A  b", None, 3, "c"])
+    assert norm_text(s).tolist() == [norm_text(v) for v in s]
+
+
+@pytest.mark.parametrize("value", [3, 1.5, True])
+def test_norm_text_non_string_is_empty(value):
+    # Bewuste gedragswijziging: de oude helper van pages/12 en 13 deed str(value);
+    # nu geldt overal de regel van pages/11: niet-strings worden ''.
+    assert norm_text(value) == "" == old_norm_text_11(value)
+    assert old_norm_text_12(value) == str(value).lower()
+
+
+def test_norm_text_missing_is_empty():
+    for value in (None, np.nan):
+        assert norm_text(value) == "" == old_norm_text_11(value)
+
+
+# =======================
+# Polariteit
+# =======================
+@pytest.mark.parametrize("values", [
+    [],
+    [1, -1],                # gelijkstand
+    [1, -1, 0],             # drievoudige gelijkstand
+    [1, 1, -1, 0, 0],       # gelijkstand 1 en 0
+    [0, 0, 1],
+    ["1", "-1", "-1"],
+    [0.7, -1.9, "x", None, ""],
+    [2, 2, 2, -1],          # 2 telt niet mee
+])
+def test_majority_posneg_matches_page_11(values):
+    series = pd.Series(values, dtype=object)
+    assert majority_posneg(series) == old_majority_posneg_11(series)
+
+
+@pytest.mark.parametrize("values", [
+    [],
+    [1, -1],                # gelijkstand -> geen meerderheid
+    [1, 1, -1],
+    [0, 0, -1],             # 0 telt niet mee
+    ["-1", -1.0, 1],
+    [None, "", "x"],
+])
+def test_majority_sign_matches_pages_12_13(values):
+    series = pd.Series(values, dtype=object)
+    assert majority_sign(series) == old_majority_posneg_12(series)
+
+
+def test_grouped_majorities_match_old_randomized():
+    rng = random.Random(0)
+    for _ in range(50):
+        n = rng.randint(1, 40)
+        df = pd.DataFrame({
+            "key": [rng.choice("abcd") for _ in range(n)],
+            "posneg": [rng.choice(POSNEG_SAMPLES) for _ in range(n)],
+        })
+        old_11 = df.groupby("key")["posneg"].apply(old_majority_posneg_11)
+        new_11 = majority_posneg(df["posneg"], by=df["key"])
+        assert new_11.sort_index().tolist() == old_11.sort_index().tolist()
+
+        old_12 = df.groupby("key")["posneg"].apply(old_majority_posneg_12)
+        new_12 = majority_sign(df["posneg"], by=df["key"])
+        assert [None if pd.isna(v) else int(v) for v in new_12.sort_index()] == \
+            [None if pd.isna(v) else int(v) for v in old_12.sort_index()]
+
+
+# =======================
+# Ranglijst pages/12 en 13
+# =======================
+def test_pipeline_ties_keep_old_order():
+    votes = pd.DataFrame({
+        "group_id": ["S_1_a", "S_1_b", "S_1_c", "S_1_d", "S_1_e"],
+        "votes": [2, 2, 2, 1, 2],
+        "text": ["Meer groen", "Minder verkeer", "Meer bomen", "Stilte", "Schone lucht"],
+        "domein": ["Milieu"] * 5,
+        "posneg": [1, 1, 1, -1, -1],
+    })
+    sub = pd.DataFrame({"text": ["meer groen", "MEER GROEN", "stilte"], "posneg": [1, -1, -1]})
+    for n in (1, 2, 3):
+        for old, new in zip(old_pipeline_13(votes, sub, n), new_pipeline_13(votes, sub, n)):
+            assert _ids(new) == _ids(old)
+            assert new["votes"].tolist() == old["votes"].tolist()
+            assert _resolved(new) == _resolved(old)
+
+
+def test_pipeline_matches_old_randomized():
+    rng = random.Random(1)
+    for _ in range(100):
+        votes, sub = random_frames(rng)
+        n = rng.choice([1, 3, 5])
+        for old, new in zip(old_pipeline_13(votes, sub, n), new_pipeline_13(votes, sub, n)):
+            assert _ids(new) == _ids(old)
+            assert new["votes"].tolist() == old["votes"].tolist()
+            assert _resolved(new) == _resolved(old)
+
+
+def test_pipeline_missing_text_no_longer_matches_nan():
+    # Bewuste gedragswijziging: de oude pages/12 en 13 maakten van een ontbrekende
+    # tekst 'nan' en koppelden zo stemmen zonder tekst aan inzendingen zonder tekst.
+    votes = pd.DataFrame({
+        "group_id": ["S_1_a", "S_1_a", "S_1_b"],
+        "votes": [1, 1, 3],
+        "text": [None, None, "Meer groen"],
+        "domein": ["Milieu"] * 3,
+        "posneg": [-1, -1, 1],
+    })
+    sub = pd.DataFrame({"text": [np.nan, "meer groen"], "posneg": [1, 1]})
+    old_pos, old_neg, _ = old_pipeline_13(votes, sub, 3)
+    new_pos, new_neg, _ = new_pipeline_13(votes, sub, 3)
+    assert _ids(old_pos) == ["S_1_b", "S_1_a"] and _ids(old_neg) == []
+    assert _ids(new_pos) == ["S_1_b"] and _ids(new_neg) == ["S_1_a"]
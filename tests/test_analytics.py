@@ -0,0 +1,49 @@
+"""Samenvattingen van analytics.py op een export van columnar_export.py."""
+import pandas as pd
+
+import analytics
+import columnar_export
+
+
+def _export(out_dir, table, session, rows):
+    schema = columnar_export.table_schema(table)
+    path = columnar_export.partition_dir(out_dir, table, session) / "part-0.parquet"
+    writer = columnar_export._PartitionWriter(path, schema, "parquet")
+    writer.write(columnar_export.rows_to_batch(rows, table))
+    writer.close()
+
+
+def test_top_effects_take_text_from_effect_groups(tmp_path):
+    # Nieuwe sessie: stemmen hebben alleen group_id en votes
+    _export(tmp_path, "effect_votes", "NEW", [
+        {"id": 1, "group": "1", "group_id": "NEW_1_wonen_aaa", "votes": 2},
+        {"id": 2, "group": "1", "group_id": "NEW_1_wonen_aaa", "votes": 1},
+        {"id": 3, "group": "1", "group_id": "NEW_1_milieu_bbb", "votes": 1},
+    ])
+    _export(tmp_path, "effect_groups", "NEW", [
+        {"id": "NEW_1_wonen_aaa", "group": "1", "domain": "Wonen", "text": "Meer woningen", "posneg": 1},
+        {"id": "NEW_1_milieu_bbb", "group": "1", "domain": "Milieu", "text": "Meer verkeer", "posneg": -1},
+    ])
+    # Oude sessie: de kopieën op de stemmen zelf
+    _export(tmp_path, "effect_votes", "OLD", [
+        {"id": 4, "group": "1", "group_id": "OLD_1_0", "votes": 3, "text": "Oud effect", "domein": "Sociaal",
+         "posneg": -1},
+    ])
+    votes = columnar_export.load_table(tmp_path, "effect_votes").to_pandas()
+    effects = columnar_export.load_table(tmp_path, "effect_groups").to_pandas()
+
+    top = analytics.summarize_top_effects(votes, effects)
+    rows = {r.text: (r.session, r.domein, int(r.posneg), int(r.votes)) for r in top.itertuples()}
+    assert rows == {
+        "Meer woningen": ("NEW", "Wonen", 1, 3),
+        "Meer verkeer": ("NEW", "Milieu", -1, 1),
+        "Oud effect": ("OLD", "Sociaal", -1, 3),
+    }
+    assert top["text"].notna().all()
+
+
+def test_top_effects_without_effect_groups_export():
+    votes = pd.DataFrame({"session": ["S"], "group_id": ["S_1_0"], "votes": [1],
+                          "text": ["t"], "domein": ["Wonen"], "posneg": [1]})
+    top = analytics.summarize_top_effects(votes)
+    assert top[["text", "domein", "votes"]].values.tolist() == [["t", "Wonen", 1]]
@@ -0,0 +1,46 @@
+"""archive.py: gearchiveerde sessies blijven leesbaar voor de hulpmiddelen over sessies heen."""
+import archive
+import batch_report
+import columnar_export
+
+
+def _sub(row_id, session, name, score=3):
+    return {"id": row_id, "session": session, "name": name, "domain": "Wonen", "score": score, "posneg": 1,
+            "text": f"tekst {row_id}", "timestamp": "2026-01-01T10:00:00Z"}
+
+
+def _archive(fake_db, session, status, rows):
+    fake_db.insert("archived_sessions", {"session": session, "status": status})
+    for row in rows:
+        fake_db.insert("archived_rows", {"source": "submissions", "id": str(row["id"]), "session": session,
+                                         "data": row})
+
+
+def test_fetch_all_reads_hot_and_archived_sessions(fake_db):
+    fake_db.insert("submissions", _sub(1, "LIVE", "anna"))
+    _archive(fake_db, "OUD", archive.ARCHIVED, [_sub(10, "OUD", "bob"), _sub(9, "OUD", "carl")])
+
+    rows = archive.fetch_all("submissions", ["LIVE", "OUD"], {"select": "id,name", "order": "id.asc"})
+
+    assert rows == [{"id": 1, "name": "anna"}, {"id": 9, "name": "carl"}, {"id": 10, "name": "bob"}]
+
+
+def test_half_archived_session_prefers_the_hot_row(fake_db):
+    _archive(fake_db, "HALF", archive.PENDING, [_sub(1, "HALF", "anna", score=1), _sub(2, "HALF", "bob")])
+    fake_db.insert("submissions", _sub(1, "HALF", "anna", score=5))  # 2 is al uit de hete tabel
+
+    rows = archive.fetch_all("submissions", ["HALF"], {"select": "id,score"})
+
+    assert rows == [{"id": 1, "score": 5}, {"id": 2, "score": 3}]
+
+
+def test_export_and_batch_report_include_archived_sessions(fake_db, tmp_path):
+    fake_db.insert("submissions", _sub(1, "LIVE", "anna"))
+    _archive(fake_db, "OUD", archive.ARCHIVED, [_sub(10, "OUD", "bob")])
+
+    counts = columnar_export.export_table("submissions", ["LIVE", "OUD"], tmp_path)
+    df_sub, _ = batch_report.fetch_session_data(["LIVE", "OUD"])
+
+    assert counts == {"LIVE": 1, "OUD": 1}
+    assert set(columnar_export.load_table(tmp_path, "submissions").column("session").to_pylist()) == {"LIVE", "OUD"}
+    assert sorted(df_sub["session"].astype(str)) == ["LIVE", "OUD"]
@@ -0,0 +1,21 @@
+"""batch_report.py: dezelfde domeinscores als pages/14, uit ontdubbelde inzendingen."""
+import batch_report
+import frames
+import report_builder
+
+
+def test_render_session_scores_deduped_submissions(monkeypatch, tmp_path):
+    rows = [
+        {"id": 1, "session": "S", "name": "anna", "domain": "Wonen", "score": 4, "posneg": 1, "text": "a"},
+        {"id": 2, "session": "S", "name": "anna", "domain": "Wonen", "score": 4, "posneg": 1, "text": "a"},
+        {"id": 3, "session": "S", "name": "bob", "domain": "Wonen", "score": 1, "posneg": 1, "text": "b"},
+    ]
+    df_sub = frames.to_frame(rows, "submissions")
+    seen = {}
+    monkeypatch.setattr(report_builder, "build_report", lambda *a, **kw: seen.update(kw))
+    monkeypatch.setattr(report_builder, "load_dutch_stopwords", lambda: set())
+
+    batch_report.render_session("S", {}, df_sub, df_sub, [], str(tmp_path))
+
+    scores = dict(zip(report_builder.DOMAINS, seen["domain_scores"]))
+    assert scores["Wonen"] == 2.5  # de dubbele inzending van anna telt één keer
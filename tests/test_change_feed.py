@@ -0,0 +1,53 @@
+"""change_feed.py: delta's op de cursor, kopieën voor de dashboards en een begrensde `seen`."""
+import pytest
+
+import change_feed
+
+
+@pytest.fixture(autouse=True)
+def fresh_feed():
+    change_feed._feed_store.clear()
+    yield
+    change_feed._feed_store.clear()
+
+
+def _submit(fake_db, row_id, name, timestamp):
+    fake_db.insert("submissions", {"id": row_id, "session": "S", "name": name, "domain": "Wonen",
+                                   "timestamp": timestamp})
+
+
+def test_poll_counts_rows_on_the_cursor_once(fake_db):
+    _submit(fake_db, 1, "anna", "2026-01-01T10:00:00Z")
+    _submit(fake_db, 2, "bob", "2026-01-01T10:00:00Z")
+    change_feed.poll("S", force=True)
+    _submit(fake_db, 3, "carl", "2026-01-01T10:00:00Z")  # zelfde tijdstip als de cursor
+    state = change_feed.poll("S", force=True)
+
+    assert state["per_minute"]["2026-01-01T10:00"] == 3
+    assert state["participants"]["Wonen"] == {"anna", "bob", "carl"}
+
+
+def test_seen_only_keeps_ids_on_the_cursor(fake_db):
+    for i in range(20):
+        _submit(fake_db, i, f"p{i}", f"2026-01-01T10:{i:02d}:00Z")
+    change_feed.poll("S", force=True)
+
+    state = change_feed._feed_store()["sessions"]["S"]
+    assert state["seen"]["submissions"] == {19}
+
+
+def test_poll_returns_a_copy(fake_db):
+    _submit(fake_db, 1, "anna", "2026-01-01T10:00:00Z")
+    snapshot = change_feed.poll("S", force=True)
+    snapshot["participants"]["Wonen"] = frozenset()
+    snapshot["events"].clear()
+
+    again = change_feed.poll("S")
+    assert again["participants"]["Wonen"] == {"anna"} and again["events"]
+    assert again is not snapshot
+
+
+def test_forget_drops_the_session(fake_db):
+    change_feed.poll("S", force=True)
+    change_feed.forget("S")
+    assert "S" not in change_feed._feed_store()["sessions"]
@@ -0,0 +1,164 @@
+"""database.py: AIMD-begrenzer, retries en circuit breaker, zonder echte Supabase."""
+import threading
+import time
+
+import pytest
+import requests
+
+import database
+
+
+class Response:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code, self.headers = status_code, headers or {}
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    database._limiter.clear()
+    database._breaker.clear()
+    monkeypatch.setattr(database, "_backoff", lambda attempt, retry_after=None: 0)
+    yield
+    database._limiter.clear()
+    database._breaker.clear()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Antwoorden (status of exception) in volgorde; de aanroepen worden bijgehouden."""
+    calls, answers = [], []
+
+    def fake_request(method, url, **kwargs):
+        calls.append(method)
+        answer = answers.pop(0) if answers else 200
+        if isinstance(answer, Exception):
+            raise answer
+        return Response(answer)
+
+    monkeypatch.setattr(database.requests, "request", fake_request)
+    return calls, answers
+
+
+# =======================
+# AIMD-begrenzer
+# =======================
+def test_window_halves_on_overload_and_grows_additively():
+    lim = database._limiter()
+    for _ in range(3):
+        database._acquire(time.monotonic() + 1)
+        database._release(0.1, overloaded=True)
+    assert lim["window"] == database.MAX_CONCURRENCY / 8
+
+    before = lim["window"]
+    database._acquire(time.monotonic() + 1)
+    database._release(0.1, overloaded=False)
+    assert lim["window"] == pytest.approx(before + 1 / before)
+
+
+def test_slow_answers_count_as_overload():
+    database._acquire(time.monotonic() + 1)
+    database._release(database.LATENCY_TARGET + 1, overloaded=False)
+    assert database.limiter_stats()["overbelast"] == 1
+
+
+def test_window_never_drops_below_one_request():
+    for _ in range(20):
+        database._acquire(time.monotonic() + 1)
+        database._release(0.1, overloaded=True)
+    assert database._limiter()["window"] == 1.0
+
+
+def test_acquire_gives_up_at_the_deadline_when_the_window_is_full():
+    lim = database._limiter()
+    lim["window"], lim["in_flight"] = 1.0, 1
+    assert database._acquire(time.monotonic() + 0.05) is False
+    assert database.limiter_stats()["afgewezen"] == 1
+
+
+# =======================
+# Retries
+# =======================
+def test_get_is_retried_on_503(server):
+    calls, answers = server
+    answers.extend([503, 503, 200])
+    assert database.request("GET", "https://db/rest/v1/t").status_code == 200
+    assert len(calls) == 3 and database.limiter_stats()["retries"] == 2
+
+
+def test_plain_post_is_not_retried_after_a_dropped_connection(server):
+    calls, answers = server
+    answers.append(requests.ConnectionError("weg"))
+    with pytest.raises(requests.ConnectionError):
+        database.request("POST", "https://db/rest/v1/t", json={})
+    assert calls == ["POST"]
+
+
+def test_upsert_is_retried_after_a_dropped_connection(server):
+    calls, answers = server
+    answers.append(requests.ConnectionError("weg"))
+    r = database.request("POST", "https://db/rest/v1/t", headers={"Prefer": "resolution=merge-duplicates"}, json={})
+    assert r.status_code == 200 and calls == ["POST", "POST"]
+
+
+# =======================
+# Circuit breaker
+# =======================
+def test_breaker_opens_after_repeated_failures_and_probes_after_cooldown(server, monkeypatch):
+    calls, answers = server
+    monkeypatch.setattr(database, "MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(database, "BREAKER_COOLDOWN", 0.05)
+    answers.extend([500] * database.BREAKER_FAILURES)
+    for _ in range(database.BREAKER_FAILURES):
+        database.request("GET", "https://db/rest/v1/t")
+    assert database.breaker_state()["state"] == "open"
+
+    with pytest.raises(database.CircuitOpenError):
+        database.request("GET", "https://db/rest/v1/t")
+    assert len(calls) == database.BREAKER_FAILURES  # niet verstuurd
+    assert database.limiter_stats()["kortgesloten"] == 1
+
+    time.sleep(0.06)
+    assert database.breaker_state()["state"] == "half-open"
+    assert database.request("GET", "https://db/rest/v1/t").status_code == 200  # proefrequest
+    assert database.breaker_state() == {"state": "dicht", "failures": 0, "retry_in": 0.0}
+
+
+def test_client_errors_do_not_open_the_breaker(server):
+    calls, answers = server
+    answers.extend([404] * (database.BREAKER_FAILURES + 1))
+    for _ in range(database.BREAKER_FAILURES + 1):
+        database.request("GET", "https://db/rest/v1/t")
+    assert database.breaker_state()["state"] == "dicht"
+
+
+# =======================
+# fetch_concurrently
+# =======================
+def test_work_running_past_the_deadline_is_counted():
+    release = threading.Event()
+    results, errors = database.fetch_concurrently(
+        {"snel": lambda: 1, "traag": lambda: release.wait(5)}, deadline=0.1,
+    )
+    release.set()
+    assert results == {"snel": 1}
+    assert isinstance(errors["traag"], TimeoutError)
+    assert database.limiter_stats()["doorgelopen"] == 1
+
+
+def test_counters_are_exact_under_concurrency(server, monkeypatch):
+    calls, answers = server
+    monkeypatch.setattr(database, "BREAKER_FAILURES", 0)  # altijd open: elk request wordt kortgesloten
+    monkeypatch.setattr(database, "BREAKER_COOLDOWN", 60)
+    database._breaker()["open_until"] = time.monotonic() + 60
+
+    def hammer():
+        for _ in range(200):
+            with pytest.raises(database.CircuitOpenError):
+                database.request("GET", "https://db/rest/v1/t")
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert database.limiter_stats()["kortgesloten"] == 1_600 and not calls
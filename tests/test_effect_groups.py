@@ -0,0 +1,79 @@
+"""effect_groups.py: stabiele id's en "Stemmen openen" tegen een nep-PostgREST."""
+import pandas as pd
+import pytest
+
+import effect_groups
+import group_assignment
+import session_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    session_cache._cache_store.clear()
+    yield
+    session_cache._cache_store.clear()
+
+
+@pytest.fixture
+def groups(monkeypatch):
+    members = pd.DataFrame({"name": ["anna", "bob"], "group": ["1", "1"]})
+    monkeypatch.setattr(group_assignment, "invalidate_snapshot", lambda session: None)
+    monkeypatch.setattr(group_assignment, "groups_snapshot", lambda session: members)
+    return members
+
+
+def _submit(fake_db, name, domain, text, posneg=1):
+    fake_db.insert("submissions", {"session": "S", "name": name, "domain": domain, "score": 3,
+                                   "text": text, "posneg": posneg, "timestamp": "2026-01-01T00:00:00Z"})
+
+
+def test_effect_id_ignores_member_order():
+    a = effect_groups.effect_id("S", 1, "Wonen", ["Meer huizen", "meer  woningen"])
+    b = effect_groups.effect_id("S", 1, "Wonen", ["Meer woningen", "meer huizen "])
+    assert a == b and a.startswith("S_1_wonen_")
+
+
+def test_reopen_replaces_generation_and_keeps_unchanged_ids(fake_db, groups):
+    _submit(fake_db, "anna", "Wonen", "Meer woningen")
+    _submit(fake_db, "bob", "Milieu", "Schone lucht")
+    first = {r["domain"]: r["id"] for r in effect_groups.open_voting("S")}
+
+    _submit(fake_db, "bob", "Milieu", "Minder verkeer op straat")
+    second = effect_groups.open_voting("S")
+    loaded = effect_groups.load("S")
+
+    assert first["Wonen"] in {r["id"] for r in second}  # onveranderd: zelfde id, stemmen blijven
+    assert set(loaded["id"]) == {r["id"] for r in second}
+    assert {r["id"] for r in fake_db.rows("effect_groups")} == {r["id"] for r in second}
+    # Opruimen filtert op de generatie, niet op een lijst van alle id's in de URL
+    deletes = [params for method, table, params in fake_db.calls if method == "DELETE"]
+    assert deletes and all("id" not in params and len(str(params)) < 200 for params in deletes)
+
+
+def test_failed_cleanup_never_mixes_generations(fake_db, groups):
+    _submit(fake_db, "anna", "Wonen", "Meer woningen")
+    old = effect_groups.open_voting("S")
+    _submit(fake_db, "bob", "Wonen", "Meer woningen bouwen")  # zelfde cluster, nieuw id
+    fake_db.fail[("DELETE", "effect_groups")] = 500
+
+    new = effect_groups.open_voting("S")
+    effect_groups.invalidate("S")
+
+    assert {r["id"] for r in old}.isdisjoint(r["id"] for r in new)
+    assert len(fake_db.rows("effect_groups")) == len(old) + len(new)  # oude rijen staan er nog
+    assert set(effect_groups.load("S")["id"]) == {r["id"] for r in new}
+
+
+def test_open_without_submissions_clears_session(fake_db, groups):
+    _submit(fake_db, "anna", "Wonen", "Meer woningen")
+    effect_groups.open_voting("S")
+    fake_db.tables["submissions"] = []
+    assert effect_groups.open_voting("S") == []
+    assert fake_db.rows("effect_groups") == []
+
+
+def test_failed_upsert_raises(fake_db, groups):
+    _submit(fake_db, "anna", "Wonen", "Meer woningen")
+    fake_db.fail[("POST", "effect_groups")] = 500
+    with pytest.raises(RuntimeError):
+        effect_groups.open_voting("S")
@@ -0,0 +1,34 @@
+"""group_assignment.assign_groups: gelijke groepen, bestaande keuzes en reproduceerbaarheid."""
+from collections import Counter
+
+import group_assignment
+
+NAMES = [f"deelnemer {i}" for i in range(23)]
+
+
+def test_group_sizes_differ_by_at_most_one():
+    sizes = Counter(group_assignment.assign_groups(NAMES, 5, seed=1).values())
+    assert set(sizes) == {group_assignment.group_label(g) for g in range(1, 6)}
+    assert max(sizes.values()) - min(sizes.values()) <= 1
+    assert sum(sizes.values()) == len(NAMES)
+
+
+def test_same_seed_gives_same_assignment():
+    assert group_assignment.assign_groups(NAMES, 4, seed=7) == group_assignment.assign_groups(NAMES, 4, seed=7)
+
+
+def test_existing_choices_are_kept_while_the_group_has_room():
+    existing = {"Deelnemer 0 ": "Groep 2", "deelnemer 1": "2", "deelnemer 2": "Groep 9"}  # 9 bestaat niet
+    out = group_assignment.assign_groups(NAMES[:6], 3, existing=existing, seed=3)
+    assert out["deelnemer 0"] == out["deelnemer 1"] == "Groep 2"
+    assert out["deelnemer 2"] in {"Groep 1", "Groep 3"}
+
+
+def test_existing_choices_never_overfill_a_group():
+    existing = {name: "Groep 1" for name in NAMES[:10]}
+    sizes = Counter(group_assignment.assign_groups(NAMES[:10], 2, existing=existing, seed=5).values())
+    assert sizes == {"Groep 1": 5, "Groep 2": 5}
+
+
+def test_at_least_one_group():
+    assert set(group_assignment.assign_groups(["a", "b"], 0).values()) == {"Groep 1"}
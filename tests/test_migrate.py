@@ -0,0 +1,69 @@
+"""migrate.py en de migraties zelf, op een tijdelijke SQLite-database."""
+import sqlite3
+
+import migrate
+
+
+def _rows(db, sql):
+    conn = sqlite3.connect(str(db))
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def _insert(db, sql, rows):
+    conn = sqlite3.connect(str(db))
+    try:
+        conn.executemany(sql, rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_statements_split_per_dialect():
+    path = migrate.MIGRATIONS_DIR / "0002_indexen.sql"
+    postgres, sqlite = migrate.statements(path, "postgres"), migrate.statements(path, "sqlite")
+    assert any("text_pattern_ops" in s for s in postgres)
+    assert not any("text_pattern_ops" in s for s in sqlite)
+    assert not any(s.startswith("--") for s in postgres + sqlite)
+
+
+def test_migrations_are_applied_once(tmp_path):
+    db = tmp_path / "werksessie.db"
+    done = migrate.migrate_sqlite(db)
+    assert done == [f"{v}_{n}" for v, n, _ in migrate.migrations()]
+    assert migrate.migrate_sqlite(db) == []
+
+
+def test_group_results_dedupe_keeps_rows_without_group_id(tmp_path):
+    db = tmp_path / "werksessie.db"
+    migrate.migrate_sqlite(db, until="0002")
+    _insert(db, 'insert into group_results (session, "group", group_id, text) values (?, ?, ?, ?)', [
+        ("S", "1", None, "oud 1"),
+        ("S", "1", None, "oud 2"),
+        ("S", "1", None, "oud 3"),
+        ("S", None, "S_1_a", "zonder groep"),
+        ("S", None, "S_1_a", "zonder groep 2"),
+        ("S", "1", "S_1_a", "eerste"),
+        ("S", "1", "S_1_a", "nieuwste"),
+        ("S", "2", "S_1_a", "andere groep"),
+    ])
+    migrate.migrate_sqlite(db)
+
+    texts = sorted(t for (t,) in _rows(db, "select text from group_results"))
+    # Net als in Postgres: alleen echte dubbelen weg, de nieuwste (hoogste id) blijft
+    assert texts == sorted(["oud 1", "oud 2", "oud 3", "zonder groep", "zonder groep 2",
+                            "nieuwste", "andere groep"])
+
+
+def test_groups_dedupe_keeps_newest(tmp_path):
+    db = tmp_path / "werksessie.db"
+    migrate.migrate_sqlite(db, until="0001")
+    _insert(db, 'insert into groups (session, name, "group") values (?, ?, ?)', [
+        ("S", "anna", "1"), ("S", "anna", "2"), ("S", "bob", "1"), ("T", "anna", "3"),
+    ])
+    migrate.migrate_sqlite(db)
+    assert sorted(_rows(db, 'select session, name, "group" from groups')) == [
+        ("S", "anna", "2"), ("S", "bob", "1"), ("T", "anna", "3"),
+    ]
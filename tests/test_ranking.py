@@ -0,0 +1,62 @@
+"""ranking.py: versie vóór de stemmen en een nieuwe ranglijst na opnieuw "Stemmen openen"."""
+import pandas as pd
+import pytest
+
+import effect_groups
+import ranking
+import session_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_stores():
+    ranking._ranking_store.clear()
+    session_cache._cache_store.clear()
+    yield
+    ranking._ranking_store.clear()
+    session_cache._cache_store.clear()
+
+
+def _effect(fake_db, effect_id, text, opened_at):
+    fake_db.insert("effect_groups", {"id": effect_id, "session": "S", "group": "1", "domain": "Wonen",
+                                     "text": text, "posneg": 1, "opened_at": opened_at})
+
+
+def _vote(fake_db, group_id, votes, stamp="2026-01-01T10:00:00Z"):
+    fake_db.insert("effect_votes", {"session": "S", "group": "1", "group_id": group_id, "votes": votes,
+                                    "last_updated": stamp})
+
+
+def test_compute_ranking_uses_canonical_text_and_drops_orphans():
+    votes = pd.DataFrame({"group_id": ["a", "a", "b", "weg"], "votes": [1, 2, 1, 5],
+                          "text": [None, None, None, ""]})
+    effects = pd.DataFrame({"id": ["a", "b"], "text": ["Meer groen", "Minder auto's"],
+                            "domain": ["Milieu", "Milieu"], "posneg": [1, -1]})
+
+    out = ranking.compute_ranking(votes, effects)
+
+    assert out["group_id"].tolist() == ["a", "b"]
+    assert out["votes"].tolist() == [3, 1]
+    assert out["text"].tolist() == ["Meer groen", "Minder auto's"]
+
+
+def test_version_is_read_before_the_votes(fake_db):
+    _effect(fake_db, "S_1_wonen_a", "Meer woningen", "2026-01-01T09:00:00Z")
+    _vote(fake_db, "S_1_wonen_a", 2)
+
+    ranking.get_group_ranking("S", "1")
+
+    reads = [params.get("select") for method, table, params in fake_db.calls if table == "effect_votes"]
+    assert reads == ["last_updated", "group_id,votes,text,domein,posneg"]
+
+
+def test_reopening_voting_recomputes_the_ranking(fake_db):
+    _effect(fake_db, "S_1_wonen_a", "Meer woningen", "2026-01-01T09:00:00Z")
+    _vote(fake_db, "S_1_wonen_a", 2)
+    first = ranking.get_group_ranking("S", "1")
+
+    fake_db.rows("effect_groups")[0].update(text="Meer betaalbare woningen", opened_at="2026-01-01T11:00:00Z")
+    effect_groups.invalidate("S")
+    second = ranking.get_group_ranking("S", "1")
+
+    assert first["text"].tolist() == ["Meer woningen"]
+    assert second["text"].tolist() == ["Meer betaalbare woningen"]
@@ -0,0 +1,68 @@
+"""score_aggregates.py: vullen op de serverversie en idempotente wijzigingen per rij."""
+import pandas as pd
+import pytest
+
+import score_aggregates
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(monkeypatch):
+    score_aggregates._aggregate_store.clear()
+    monkeypatch.setattr(score_aggregates, "VERSION_TTL", 0)
+    yield
+    score_aggregates._aggregate_store.clear()
+
+
+def _submit(fake_db, row_id, name, score, posneg=1, stamp="2026-01-01T10:00:00Z"):
+    row = {"id": row_id, "session": "S", "name": name, "domain": "Wonen", "score": score, "posneg": posneg,
+           "text": f"tekst {row_id}", "last_updated": stamp}
+    fake_db.insert("submissions", row)
+    return row
+
+
+def _frame(fake_db):
+    return pd.DataFrame(fake_db.rows("submissions"))
+
+
+def test_seed_skips_the_frame_while_the_server_version_is_unchanged(fake_db):
+    _submit(fake_db, 1, "anna", 4)
+    score_aggregates.seed_session("S", _frame(fake_db))
+
+    class Untouchable(pd.DataFrame):
+        def __getitem__(self, key):
+            raise AssertionError("frame gelezen")
+
+    score_aggregates.seed_session("S", Untouchable(_frame(fake_db)))
+    assert score_aggregates.domain_means("S", ["Wonen"]) == [4.0]
+
+
+def test_seed_refills_when_another_replica_edits(fake_db):
+    _submit(fake_db, 1, "anna", 4)
+    score_aggregates.seed_session("S", _frame(fake_db))
+    fake_db.rows("submissions")[0].update(score=2, last_updated="2026-01-01T10:05:00Z")
+
+    score_aggregates.seed_session("S", _frame(fake_db))
+    assert score_aggregates.domain_means("S", ["Wonen"]) == [2.0]
+
+
+def test_apply_change_counts_a_seeded_save_once(fake_db):
+    _submit(fake_db, 1, "anna", 4)
+    saved = _submit(fake_db, 2, "bob", 2)
+    score_aggregates.seed_session("S", _frame(fake_db))  # de vulling zag de opslag van bob al
+
+    score_aggregates.apply_change("S", 2, saved)
+    score_aggregates.apply_change("S", 2, saved)
+    assert score_aggregates.domain_means("S", ["Wonen"]) == [3.0]
+
+    score_aggregates.apply_change("S", 2, {**saved, "score": 5, "posneg": -1})
+    assert score_aggregates.domain_means("S", ["Wonen"]) == [-0.5]
+    score_aggregates.apply_change("S", 2, None)
+    assert score_aggregates.domain_means("S", ["Wonen"]) == [4.0]
+    assert score_aggregates.overall_mean("S", "bob") is None
+
+
+def test_seed_keeps_a_restored_snapshot_state(fake_db):
+    score_aggregates.restore_session("S", {"domain": {"Wonen": [6.0, 2]}, "user": {}})
+    score_aggregates.seed_session("S", pd.DataFrame([{"id": 1, "name": "x", "domain": "Wonen", "score": 1,
+                                                       "posneg": 1}]))
+    assert score_aggregates.domain_means("S", ["Wonen"]) == [3.0]
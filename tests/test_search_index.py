@@ -0,0 +1,45 @@
+"""search_index.py: bouwen uit de export en zoeken met stammen, prefixen en filters."""
+import pytest
+
+import columnar_export
+import search_index
+
+
+@pytest.fixture
+def index(fake_db, tmp_path):
+    fake_db.insert("session_meta", {"access_code": "A", "description": "Centrum", "prov": "DR",
+                                    "created_at": "2026-03-01T10:00:00Z"})
+    fake_db.insert("session_meta", {"access_code": "B", "description": "Haven", "prov": "GR",
+                                    "created_at": "2026-05-01T10:00:00Z"})
+    for row_id, session, domain, text, posneg in [
+        (1, "A", "Wonen", "Meer parkeerplaatsen bij de woningen", 1),
+        (2, "A", "Veiligheid", "Parkeerdruk maakt de straat onveilig", -1),
+        (3, "B", "Wonen", "De parkeerdruk in de wijken neemt toe", -1),
+        (4, "B", "Milieu", "Meer bomen in het park", 1),
+    ]:
+        fake_db.insert("submissions", {"id": row_id, "session": session, "name": "x", "domain": domain,
+                                       "score": 3, "posneg": posneg, "text": text})
+    columnar_export.export_sessions(["A", "B"], tmp_path, tables=("submissions",))
+    assert sorted(search_index.build(tmp_path)) == ["A", "B"]
+    return search_index.load_index(tmp_path)
+
+
+def test_search_matches_stems_and_prefixes(index):
+    found, total = search_index.search(index, "parkeer")
+    assert total == 3
+    # Nieuwste sessie eerst
+    assert found["session"].astype(str).tolist()[0] == "B"
+
+    found, total = search_index.search(index, "wijk parkeerdruk")
+    assert total == 1 and found["text"].tolist() == ["De parkeerdruk in de wijken neemt toe"]
+
+
+def test_search_filters_on_province_domain_and_polarity(index):
+    assert search_index.search(index, "parkeerdruk", prov="DR")[1] == 1
+    assert search_index.search(index, "parkeer", domain=["Wonen"])[1] == 2
+    assert search_index.search(index, "parkeer", posneg=1)[1] == 1
+    assert search_index.search(index, "de het", prov="DR")[1] == 0  # alleen stopwoorden
+
+
+def test_build_skips_unchanged_sessions(index, tmp_path):
+    assert search_index.build(tmp_path) == []
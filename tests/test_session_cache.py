@@ -0,0 +1,137 @@
+"""Gedrag van session_cache.py."""
+import threading
+
+import pytest
+import streamlit as st
+
+import report_builder
+import session_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    session_cache._cache_store.clear()
+    yield
+    session_cache._cache_store.clear()
+
+
+def _in_thread(fn):
+    """Roep `fn` aan zoals Streamlit een download-callable aanroept: in een thread zonder ScriptRunContext."""
+    out = {}
+
+    def run():
+        try:
+            out["value"] = fn()
+        except Exception as e:  # pragma: no cover - alleen bij een fout
+            out["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    if "error" in out:
+        raise out["error"]
+    return out["value"]
+
+
+# =======================
+# Downloads (pages/14)
+# =======================
+def test_session_state_is_empty_outside_the_script_run():
+    # De reden voor session_cache.download: hier bestaat access_code niet
+    with pytest.raises(AttributeError):
+        _in_thread(lambda: st.session_state.access_code)
+
+
+def test_download_renders_outside_the_script_run():
+    blk = report_builder._image(lambda: b"x" * 50_000, 5)
+    report = {"title": "t", "blocks": [blk], "rendered": {}, "lock": threading.Lock()}
+    session_cache.get_or_load("S", ("report", 1), lambda: report)
+    before = session_cache.total_bytes()
+
+    data = session_cache.download("S", ("render", "html", 1), lambda: report_builder.render(report, "html"),
+                                  grows=("report", 1))
+    html = _in_thread(data)
+
+    assert html.startswith(b"<!DOCTYPE html>")
+    assert _in_thread(data) is html  # tweede klik: uit de cache
+    # Het model is na het renderen opnieuw gemeten (PNG en HTML zitten er nu in)
+    assert session_cache.usage()["S"] - len(html) > before + 50_000
+
+
+
+# =======================
+# Budget en levensduur
+# =======================
+def test_budget_evicts_least_recently_used_session(monkeypatch):
+    monkeypatch.setattr(session_cache, "CACHE_BUDGET_BYTES", 2_500)
+    session_cache.get_or_load("A", "k", lambda: b"a" * 1_000)
+    session_cache.get_or_load("B", "k", lambda: b"b" * 1_000)
+    session_cache.get_or_load("A", "k", lambda: pytest.fail("A hoort nog in de cache te staan"))
+    session_cache.get_or_load("C", "k", lambda: b"c" * 1_000)
+    assert set(session_cache.usage()) == {"A", "C"}
+    assert session_cache.total_bytes() <= 2_500
+
+
+def test_single_load_for_concurrent_misses():
+    calls = []
+    started, release = threading.Event(), threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "waarde"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(session_cache.get_or_load("S", "k", loader)))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1] and results == ["waarde"] * 5
+
+
+def test_revalidate_returns_stale_value_and_refreshes(monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(session_cache.database, "submit", lambda fn, background=False: refreshed.append(fn))
+    session_cache.get_or_load("S", "k", lambda: "oud", ttl=0, revalidate=True)
+
+    assert session_cache.get_or_load("S", "k", lambda: "nieuw", ttl=60, revalidate=True) == "oud"
+    assert len(refreshed) == 1
+    refreshed[0]()  # de achtergrondverversing
+    assert session_cache.get_or_load("S", "k", lambda: pytest.fail("al ververst"), ttl=60) == "nieuw"
+
+
+# =======================
+# Grootte en invalidatie
+# =======================
+def test_estimate_size_pickles_plain_values_once(monkeypatch):
+    calls = []
+    dumps = session_cache.pickle.dumps
+    monkeypatch.setattr(session_cache.pickle, "dumps", lambda v, **kw: calls.append(1) or dumps(v, **kw))
+    rows = [{"id": i, "text": f"effect nummer {i}"} for i in range(1_000)]
+
+    assert session_cache.estimate_size(rows) > 15_000
+    assert len(calls) == 1
+
+
+def test_invalidate_during_a_load_drops_its_result():
+    started, release = threading.Event(), threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return "oud"
+
+    thread = threading.Thread(target=lambda: session_cache.get_or_load("S", "k", slow_loader))
+    thread.start()
+    started.wait(5)
+    session_cache.invalidate("S", shared=False)
+    release.set()
+    thread.join(5)
+
+    assert session_cache.get_or_load("S", "k", lambda: "nieuw") == "nieuw"
@@ -0,0 +1,36 @@
+"""shared_cache.py: generaties die een gemist invalidatiebericht toch opmerken."""
+import pytest
+
+import session_cache
+import shared_cache
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    monkeypatch.setattr(shared_cache, "SHARED_CACHE_URL", f"sqlite:///{tmp_path / 'cache.db'}")
+    shared_cache._shared_store.clear()
+    session_cache._cache_store.clear()
+    yield shared_cache._shared_store()["backend"]
+    shared_cache._shared_store.clear()
+    session_cache._cache_store.clear()
+
+
+def test_missed_invalidation_is_noticed_after_the_poll_interval(backend, monkeypatch):
+    shared_cache.put("S", "k", "oud")
+    session_cache.get_or_load("S", "k", lambda: "oud", shared=True)
+    # Een andere replica verhoogt de generatie, maar het bericht komt nooit aan
+    backend.incr(f"{shared_cache.KEY_PREFIX}:gen:S")
+    assert shared_cache.get("S", "k") is not None  # binnen POLL_INTERVAL: de bekende generatie
+
+    monkeypatch.setattr(shared_cache, "POLL_INTERVAL", 0)
+    assert shared_cache.get("S", "k") is None
+    assert shared_cache.poll_invalidations() == [("S", None)]
+
+
+def test_missed_invalidation_clears_the_local_session_cache(backend, monkeypatch):
+    session_cache.get_or_load("S", "k", lambda: "oud", shared=True)
+    backend.incr(f"{shared_cache.KEY_PREFIX}:gen:S")
+    monkeypatch.setattr(shared_cache, "POLL_INTERVAL", 0)
+
+    shared_cache.get("S", "ander")  # leest de generatie opnieuw
+    assert session_cache.get_or_load("S", "k", lambda: "nieuw", shared=True) == "nieuw"
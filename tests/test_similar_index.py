@@ -0,0 +1,72 @@
+"""similar_index.py: alle effecten in de index, wijzigingen tijdens het vullen en snelle suggesties."""
+import random
+import time
+
+import pytest
+
+import database
+import similar_index
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    similar_index._index_store.clear()
+    yield
+    similar_index._index_store.clear()
+
+
+def _submit(fake_db, row_id, text, domain="Wonen"):
+    fake_db.insert("submissions", {"id": row_id, "session": "S", "domain": domain, "text": text})
+
+
+def test_seed_reads_past_the_first_page(fake_db):
+    for i in range(database.PAGE_SIZE + 5):
+        _submit(fake_db, i, f"effect {i}")
+    _submit(fake_db, 10_000, "Meer betaalbare huurwoningen")
+
+    similar_index.seed("S", "Wonen")
+
+    assert similar_index.similar("S", "Wonen", "betaalbare huurwoning")[0]["text"] == "Meer betaalbare huurwoningen"
+
+
+def test_changes_during_a_refresh_are_kept(fake_db, monkeypatch):
+    _submit(fake_db, 1, "Meer groen in de wijk")
+    fetch_all = database.fetch_all
+
+    def slow_fetch(table, params):
+        rows = fetch_all(table, params)
+        similar_index.add("S", "Wonen", 2, "Meer speelplekken voor kinderen")  # opslag tijdens het ophalen
+        similar_index.remove("S", "Wonen", 1)
+        return rows
+
+    monkeypatch.setattr(database, "fetch_all", slow_fetch)
+    similar_index.seed("S", "Wonen")
+
+    assert similar_index.similar("S", "Wonen", "speelplekken voor kinderen")
+    assert not similar_index.similar("S", "Wonen", "groen in de wijk")
+
+
+def test_index_is_refreshed_after_the_ttl(fake_db, monkeypatch):
+    similar_index.seed("S", "Wonen")
+    _submit(fake_db, 1, "Meer fietspaden langs de dijk")  # uit een andere replica
+    similar_index.seed("S", "Wonen")
+    assert not similar_index.similar("S", "Wonen", "fietspaden langs de dijk")
+
+    monkeypatch.setattr(similar_index, "REFRESH_TTL", 0)
+    similar_index.seed("S", "Wonen")
+    assert similar_index.similar("S", "Wonen", "fietspaden langs de dijk")
+
+
+def test_lookup_stays_under_20_ms(fake_db):
+    rng = random.Random(1)
+    vocab = ["".join(rng.choice("abdegiklmnoprstuvw") for _ in range(rng.randint(4, 9))) for _ in range(300)]
+    for i in range(3_000):
+        _submit(fake_db, i, " ".join(rng.choice(vocab) for _ in range(rng.randint(3, 8))))
+    similar_index.seed("S", "Wonen")
+    query = " ".join(vocab[:4])
+
+    similar_index.similar("S", "Wonen", query)  # opwarmen
+    start = time.perf_counter()
+    for _ in range(20):
+        similar_index.similar("S", "Wonen", query)
+    assert (time.perf_counter() - start) / 20 < 0.020
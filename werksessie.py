@@ -1,9 +1,10 @@
 import streamlit as st
-import requests
 from supabase import create_client, Client
 import pandas as pd
 from streamlit_extras.switch_page_button import switch_page
 
+import database
+
 
 
 st.set_page_config(page_title="Brede Welvaart Werksessie", layout="centered")
@@ -13,7 +14,7 @@ url = st.secrets["supabase_url"]
 key = st.secrets["supabase_key"]
 
 # Fetch session metadata from Supabase
-response = requests.get(
+response = database.request("GET",
     f"{url}/rest/v1/session_meta?select=*&order=created_at.desc&limit=1000",
     headers={
         "apikey": key,